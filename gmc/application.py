@@ -10,6 +10,7 @@ class GMCArguments(TypedDict):
     src_dir: str | None
     dst_dir: str | None
     external_schemas: list[str]
+    storage: str  # "files" or "jsonl", see `utils.storage`
 
 
 def _sigint(signum: int, _: None) -> None:
@@ -45,8 +46,11 @@ def application(args: GMCArguments):
 
     try:
         from .main_window import MainWindow
+        from .utils.storage import set_storage
         from . import __version__
 
+        set_storage(args.get("storage") or "files")
+
         main_window = MainWindow(__version__, app, args)
         signal.signal(signal.SIGINT, _sigint)
     except Exception:
@@ -80,12 +84,23 @@ def parse_args(external: Sequence[str]) -> GMCArguments:
         default=[],
         help="list of files/directories to treat like a schema",
     )
+    parser.add_argument(
+        "--storage",
+        choices=("files", "jsonl"),
+        default="files",
+        help="markup storage: json file per image (default) or "
+        "one json lines file per directory",
+    )
     args = parser.parse_args()
     args.external_schemas.extend(external)
     return cast(GMCArguments, vars(args))
 
 
 def main(external: Sequence[str] = ()):
+    if sys.argv[1:2] == ["batch"]:
+        from .batch import main as batch_main
+
+        sys.exit(batch_main(sys.argv[2:]))
     app = application(parse_args(external))
     if app:
         exit(app[0].exec_())
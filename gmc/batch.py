@@ -0,0 +1,329 @@
+"""
+Markup operations without user interface, for servers::
+
+    run-gmc batch validate DST
+    run-gmc batch unique-tag DST
+    run-gmc batch paste SRC DST OBJECTS_JSON
+    run-gmc batch interpolate SRC DST [--tags TAG,...] [--every]
+
+Work is split by directories and done in a process pool. Progress is
+printed to stderr and the summary to stdout, as json.
+"""
+
+from __future__ import annotations
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from fnmatch import fnmatch
+from typing import Any, Callable, Sequence
+from .utils.storage import STORAGES, set_storage, storage
+
+Result = dict[str, Any]  # counters and "errors"
+
+
+def _new_result() -> Result:
+    return {"files": 0, "changed_files": 0, "added_objects": 0, "errors": []}
+
+
+def _merge(summary: Result, result: Result) -> None:
+    for key, value in result.items():
+        summary[key] += value
+
+
+def _error(result: Result, path: str, error: Any) -> None:
+    result["errors"].append({"path": path, "error": str(error)})
+
+
+def _init_worker(storage_name: str) -> None:
+    set_storage(storage_name)
+
+
+def _write(path: str, markup: dict[str, Any]) -> None:
+    markup_storage = storage()
+    markup_storage.write(path, markup_storage.serialize(markup))
+
+
+# operations on one directory, called in worker processes
+
+
+def validate_markup(data: Any) -> list[str]:
+    """:returns: problems of parsed markup, empty when it is fine"""
+    if not isinstance(data, dict):
+        return ["markup is not an object"]
+    problems: list[str] = []
+    size = data.get("size")
+    if size is not None and not (
+        isinstance(size, list)
+        and len(size) == 2
+        and all(isinstance(v, (int, float)) for v in size)
+    ):
+        problems.append(f"invalid size {size!r}")
+    objects = data.get("objects", [])
+    if not isinstance(objects, list):
+        return problems + ["objects is not a list"]
+    for idx, obj in enumerate(objects):
+        if not isinstance(obj, dict):
+            problems.append(f"object {idx} is not an object")
+            continue
+        if not isinstance(obj.get("type"), str):
+            problems.append(f"object {idx} has no type")
+        if "data" not in obj:
+            problems.append(f"object {idx} has no data")
+        tags = obj.get("tags", [])
+        if not isinstance(tags, list) or not all(
+            isinstance(tag, str) for tag in tags
+        ):
+            problems.append(f"object {idx} has invalid tags {tags!r}")
+    return problems
+
+
+def _validate_dir(markup_paths: list[str]) -> Result:
+    result = _new_result()
+    for path in markup_paths:
+        result["files"] += 1
+        try:
+            data = json.loads(storage().read(path))
+        except (OSError, ValueError) as e:
+            _error(result, path, e)
+            continue
+        for problem in validate_markup(data):
+            _error(result, path, problem)
+    return result
+
+
+def _paste_dir(
+    paths: list[tuple[str, str]], objects: list[dict[str, Any]]
+) -> Result:
+    from .utils.paste import paste_into
+
+    result = _new_result()
+    for image_path, markup_path in paths:
+        result["files"] += 1
+        added, error = paste_into(image_path, markup_path, objects, _write)
+        if error is not None:
+            _error(result, markup_path, error)
+        elif added:
+            result["changed_files"] += 1
+            result["added_objects"] += added
+    storage().close()
+    return result
+
+
+def _interpolate_dir(
+    paths: list[tuple[str, str]], tags: list[str] | None, every: bool
+) -> Result:
+    from .utils.interpolation import interpolate_markup
+
+    result = _new_result()
+    result["files"] = len(paths)
+    image_paths = [image_path for image_path, _ in paths]
+    markup_paths = [markup_path for _, markup_path in paths]
+    before = {}
+    for path in markup_paths:
+        try:
+            before[path] = len(json.loads(storage().read(path))["objects"])
+        except (OSError, ValueError, KeyError, TypeError):
+            before[path] = 0
+    tags_filter = None if tags is None else (tags, all if every else any)
+    save = interpolate_markup(image_paths, markup_paths, tags_filter)
+    for path, markup in save.items():
+        _write(path, markup)
+        result["changed_files"] += 1
+        result["added_objects"] += len(markup["objects"]) - before[path]
+    storage().close()
+    return result
+
+
+# listing
+
+
+def _hidden(name: str) -> bool:
+    return name.startswith(".")
+
+
+def _images_by_dir(src: str, dst: str) -> dict[str, list[tuple[str, str]]]:
+    """:returns: (image path, markup path) pairs of every directory"""
+    from .schemas import MarkupSchema
+
+    filters = MarkupSchema.DATA_FILTERS
+    by_dir: dict[str, list[tuple[str, str]]] = {}
+    for directory, dirnames, filenames in os.walk(src):
+        dirnames[:] = [name for name in dirnames if not _hidden(name)]
+        names = [
+            name
+            for name in filenames
+            if any(fnmatch(name.lower(), f) for f in filters)
+        ]
+        if not names:
+            continue
+        names.sort(key=str.lower)  # frame order for interpolation
+        rel_dir = os.path.relpath(directory, src)
+        by_dir[directory] = [
+            (
+                os.path.join(directory, name),
+                os.path.normpath(os.path.join(dst, rel_dir, name + ".json")),
+            )
+            for name in names
+        ]
+    return by_dir
+
+
+def _markup_by_dir(root: str) -> dict[str, list[str]]:
+    by_dir: dict[str, list[str]] = {}
+    for path, _version in storage().scan(root, recursive=True):
+        by_dir.setdefault(os.path.dirname(path), []).append(path)
+    return by_dir
+
+
+# running
+
+
+def _progress(done: int, total: int, what: str) -> None:
+    end = "\r" if sys.stderr.isatty() and done < total else "\n"
+    print(f"{done}/{total} {what}", end=end, file=sys.stderr, flush=True)
+
+
+def _run(
+    jobs: dict[str, tuple[Callable[..., Result], tuple[Any, ...]]],
+    args: argparse.Namespace,
+) -> Result:
+    """
+    :param jobs: function and its arguments by directory, first argument
+                 is the list of files
+    """
+    summary = _new_result()
+    total = sum(len(job_args[0]) for _func, job_args in jobs.values())
+    done = 0
+    with ProcessPoolExecutor(
+        args.jobs, initializer=_init_worker, initargs=(args.storage,)
+    ) as pool:
+        futures = {
+            pool.submit(func, *job_args): (directory, len(job_args[0]))
+            for directory, (func, job_args) in jobs.items()
+        }
+        for future in as_completed(futures):
+            directory, count = futures[future]
+            try:
+                _merge(summary, future.result())
+            except Exception as e:
+                summary["files"] += count
+                _error(summary, directory, e)
+            done += count
+            _progress(done, total, "files")
+    return summary
+
+
+def _validate(args: argparse.Namespace) -> Result:
+    by_dir = _markup_by_dir(args.dst)
+    jobs = {d: (_validate_dir, (paths,)) for d, paths in by_dir.items()}
+    return _run(jobs, args)
+
+
+def _paste(args: argparse.Namespace) -> Result:
+    with open(args.objects, "r", encoding="utf-8") as inp:
+        objects = json.load(inp)
+    if isinstance(objects, dict):  # markup file
+        objects = objects.get("objects", [])
+    by_dir = _images_by_dir(args.src, args.dst)
+    jobs = {d: (_paste_dir, (pairs, objects)) for d, pairs in by_dir.items()}
+    return _run(jobs, args)
+
+
+def _interpolate(args: argparse.Namespace) -> Result:
+    tags = None
+    if args.tags is not None:
+        tags = [tag.strip() for tag in args.tags.split(",")]
+    by_dir = _images_by_dir(args.src, args.dst)
+    jobs = {
+        d: (_interpolate_dir, (pairs, tags, args.every))
+        for d, pairs in by_dir.items()
+    }
+    return _run(jobs, args)
+
+
+def _unique_tag(args: argparse.Namespace) -> Result:
+    from .utils.markup_index import MarkupIndex, unique_tag
+
+    print("indexing...", file=sys.stderr, flush=True)
+    index = MarkupIndex(args.dst)
+    try:
+        with ProcessPoolExecutor(
+            args.jobs, initializer=_init_worker, initargs=(args.storage,)
+        ) as pool:
+            index.refresh(executor=pool)
+        return {"files": len(index), "tag": unique_tag(index.used_tags())}
+    finally:
+        index.close()
+
+
+def parse_args(argv: Sequence[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        "run-gmc batch", description="Markup operations without GUI"
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument("--storage", choices=STORAGES, default="files")
+    subparsers = parser.add_subparsers(dest="operation", required=True)
+
+    validate = subparsers.add_parser(
+        "validate", help="check that markup files are valid"
+    )
+    validate.add_argument("dst", help="root of markup dir")
+    validate.set_defaults(func=_validate)
+
+    unique = subparsers.add_parser(
+        "unique-tag", help="print a tag, not used in the markup tree"
+    )
+    unique.add_argument("dst", help="root of markup dir")
+    unique.set_defaults(func=_unique_tag)
+
+    paste = subparsers.add_parser(
+        "paste", help="add objects to markup of every image"
+    )
+    paste.add_argument("src", help="root of images dir")
+    paste.add_argument("dst", help="root of markup dir")
+    paste.add_argument("objects", help="json file with a list of objects")
+    paste.set_defaults(func=_paste)
+
+    interpolate = subparsers.add_parser(
+        "interpolate",
+        help="interpolate objects between frames, every directory is "
+        "a sequence",
+    )
+    interpolate.add_argument("src", help="root of images dir")
+    interpolate.add_argument("dst", help="root of markup dir")
+    interpolate.add_argument(
+        "--tags", help="comma separated, interpolate objects with any tag"
+    )
+    interpolate.add_argument(
+        "--every",
+        action="store_true",
+        help="interpolate objects with every tag of `--tags`",
+    )
+    interpolate.set_defaults(func=_interpolate)
+    return parser.parse_args(argv)
+
+
+def main(argv: Sequence[str]) -> int:
+    """:returns: exit code, 1 when there were errors"""
+    args = parse_args(argv)
+    set_storage(args.storage)
+    try:
+        summary = args.func(args)
+    finally:
+        storage().close()
+    json.dump(
+        {"operation": args.operation, **summary},
+        sys.stdout,
+        ensure_ascii=False,
+        indent=1,
+    )
+    print()
+    return 1 if summary.get("errors") else 0
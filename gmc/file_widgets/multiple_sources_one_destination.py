@@ -1,6 +1,8 @@
 from __future__ import annotations
 from PyQt5 import QtCore, QtWidgets, QtGui
 from ..utils import separator, get_icon, tr
+from ..utils.markup_index import MarkupIndex
+from ..utils.save_queue import save_queue
 from ..views.filesystem_widget import (
     MultipleFilesystemWidget,
     SingleFilesystemWidget,
@@ -251,6 +253,7 @@ class MultipleSourcesOneDestinationMarkupWindow(QtWidgets.QWidget):
     ) -> None:
         """The function is "public" only because it fixes focus issue."""
         self._dst_dir = dst_dir
+        MarkupIndex.open(dst_dir.absolutePath())
         self._all_files[view_idx] = all_files
         self._src_dir[view_idx] = src_dir
 
@@ -288,3 +291,7 @@ class MultipleSourcesOneDestinationMarkupWindow(QtWidgets.QWidget):
         self._prev_actions[view_idx].setEnabled(prev_enabled)
         next_enabled = n > 1 and cur_idx < n - 1
         self._next_actions[view_idx].setEnabled(next_enabled)
+
+    def closeEvent(self, event: QtGui.QCloseEvent) -> None:
+        save_queue.drain()
+        self._schema.close_markup()
@@ -2,9 +2,12 @@ from __future__ import annotations
 from typing import Sequence
 from PyQt5 import QtCore, QtWidgets, QtGui
 from ..utils import separator, new_action, tr
+from ..utils.markup_index import MarkupIndex
+from ..utils.save_queue import save_queue
 from ..views.filesystem_widget import SingleFilesystemWidget, FilesystemTitle
 from ..settings import settings
 from ..application import GMCArguments
+from .prefetch import Prefetcher
 
 Qt = QtCore.Qt
 MB = QtWidgets.QMessageBox
@@ -191,6 +194,9 @@ class OneSourceOneDestinationMarkupWindow(QtWidgets.QWidget):
         self._all_files = all_files
         rel_path = src_dir.relativeFilePath(file_path)
         self._idx = all_files.index(rel_path)
+        self._direction = 1  # for prefetching, changes with `_go`
+        MarkupIndex.open(dst_dir.absolutePath())
+        self._prefetcher = Prefetcher(self)
 
     def _get_default_actions(self):
         """:returns: actions, every markup window should have"""
@@ -245,11 +251,27 @@ class OneSourceOneDestinationMarkupWindow(QtWidgets.QWidget):
         src_data_path = self._src_dir.filePath(current_path)
         self._schema.open_markup(src_data_path, self._dst_markup_path)
         self._schema.set_selected(src_data_path, self._dst_markup_path)
+        self._prefetch(markup_ext)
+
+    def _prefetch(self, markup_ext: str) -> None:
+        paths: list[tuple[str, str]] = []
+        for idx in self._prefetcher.neighbours(
+            self._idx, len(self._all_files), self._direction
+        ):
+            path = self._all_files[idx]
+            paths.append(
+                (
+                    self._src_dir.filePath(path),
+                    self._dst_dir.filePath(path + markup_ext),
+                )
+            )
+        self._prefetcher.schedule(paths)
 
     def _go(self, where: int) -> None:
         if not QtGui.QGuiApplication.keyboardModifiers():
             self._schema.save_markup(force=False)
         self._idx = (self._idx + where) % len(self._all_files)
+        self._direction = 1 if where > 0 else -1
         self.open_current()
 
     def _update_actions(self) -> None:
@@ -259,6 +281,8 @@ class OneSourceOneDestinationMarkupWindow(QtWidgets.QWidget):
 
     def closeEvent(self, event: QtGui.QCloseEvent) -> None:
         if not self._schema.markup_has_changes():
+            save_queue.drain()
+            self._schema.close_markup()
             return
         answer = MB.question(
             self,
@@ -271,7 +295,8 @@ class OneSourceOneDestinationMarkupWindow(QtWidgets.QWidget):
         )
         if answer == MB.Save:
             self._schema.save_markup(force=True)
-        elif answer == MB.Discard:
-            pass
-        else:
+        elif answer != MB.Discard:
             event.ignore()
+            return
+        save_queue.drain()
+        self._schema.close_markup()
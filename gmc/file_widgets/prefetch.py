@@ -0,0 +1,130 @@
+"""
+Background read-ahead of images and markup, so going to the next file
+doesn't wait for decoding and parsing.
+"""
+
+from __future__ import annotations
+import json
+from os.path import getmtime
+from typing import Any, Iterator
+from PyQt5 import QtCore, QtGui
+from ..utils.image import image_cache, huge_image_size, read_image
+from ..utils.json import remember_prefetched
+from ..utils.storage import storage
+
+
+class _PrefetchJob(QtCore.QRunnable):
+    def __init__(
+        self,
+        prefetcher: Prefetcher,
+        generation: int,
+        image_path: str | None,
+        markup_path: str,
+    ) -> None:
+        super().__init__()
+        self._prefetcher = prefetcher
+        self._generation = generation
+        self._image_path = image_path
+        self._markup_path = markup_path
+
+    def _is_stale(self) -> bool:
+        return self._prefetcher.generation != self._generation
+
+    def run(self) -> None:
+        if self._is_stale():
+            return
+        image, image_mtime = QtGui.QImage(), None
+        if (
+            self._image_path is not None
+            and huge_image_size(self._image_path) is None
+        ):
+            try:
+                image_mtime = getmtime(self._image_path)
+                image = read_image(self._image_path)
+            except (OSError, ValueError):
+                pass  # `load_pixmap` will report the error
+        if self._is_stale():
+            return
+        markup: Any = None
+        markup_storage = storage()
+        markup_version = markup_storage.version(self._markup_path)
+        try:
+            if markup_version is not None:
+                markup = json.loads(markup_storage.read(self._markup_path))
+        except (OSError, ValueError):
+            pass  # `load_json` will report the error
+        result = (
+            self._image_path,
+            image_mtime,
+            image,
+            self._markup_path,
+            markup_version,
+            markup,
+        )
+        try:
+            self._prefetcher.done.emit(self._generation, result)
+        except RuntimeError:
+            pass  # markup window was closed
+
+
+class Prefetcher(QtCore.QObject):
+    """
+    Decodes neighbouring images into `image_cache` and parses their markup
+    for `load_json`. Every `schedule` call cancels jobs of the previous one.
+    """
+
+    AHEAD = 3  # files to read in the direction user is moving
+    BEHIND = 1  # files to read in the opposite direction
+
+    done = QtCore.pyqtSignal(int, tuple)
+
+    def __init__(self, parent: QtCore.QObject) -> None:
+        super().__init__(parent)
+        self.generation = 0
+        self._pool = QtCore.QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+        self.done.connect(self._on_done)
+
+    @classmethod
+    def neighbours(cls, idx: int, count: int, direction: int) -> Iterator[int]:
+        """:returns: indices to prefetch, most wanted first"""
+        offsets = [direction]
+        offsets.extend(-direction * i for i in range(1, cls.BEHIND + 1))
+        offsets.extend(direction * i for i in range(2, cls.AHEAD + 1))
+        seen = {idx}
+        for offset in offsets:
+            neighbour = (idx + offset) % count
+            if neighbour not in seen:
+                seen.add(neighbour)
+                yield neighbour
+
+    def schedule(self, paths: list[tuple[str, str]]) -> None:
+        """
+        :param paths: (image path, markup path) pairs, most wanted first
+        """
+        self.cancel()
+        for priority, (image_path, markup_path) in enumerate(reversed(paths)):
+            job = _PrefetchJob(
+                self,
+                self.generation,
+                None if image_path in image_cache else image_path,
+                markup_path,
+            )
+            self._pool.start(job, priority)
+
+    def cancel(self) -> None:
+        self.generation += 1
+        self._pool.clear()
+
+    def _on_done(self, generation: int, result: tuple[Any, ...]) -> None:
+        if generation != self.generation:
+            return
+        image_path, image_mtime, image, markup_path, markup_version, markup = (
+            result
+        )
+        if not image.isNull():
+            image_cache.put(
+                image_path, image_mtime, QtGui.QPixmap.fromImage(image)
+            )
+        if markup is not None:
+            remember_prefetched(markup_path, markup_version, markup)
@@ -614,8 +614,8 @@ before closing?</source>
     </message>
     <message>
         <location filename="../schemas/tagged_objects/__init__.py" line="488"/>
-        <source>Generate unique tag per directory</source>
-        <translation>Генерировать уникальный тег в текущей директории</translation>
+        <source>Generate tag that is unique in the whole destination tree</source>
+        <translation>Генерировать тег, уникальный во всём дереве разметки</translation>
     </message>
     <message>
         <location filename="../schemas/tagged_objects/__init__.py" line="499"/>
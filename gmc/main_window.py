@@ -5,6 +5,8 @@ from .schemas import MarkupSchema, load_schema_cls, iter_schemas
 from .utils import get_icon, new_action, tr
 from .help_label import HelpLabel
 from .settings import settings
+from .utils.save_queue import save_queue
+from .utils.storage import storage
 from .application import GMCArguments
 
 MB = QtWidgets.QMessageBox
@@ -46,6 +48,9 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self._setup_ui()
         self._load_settings(lang)
+        save_queue.failed.connect(self._on_save_failed)
+        app.aboutToQuit.connect(save_queue.drain)
+        app.aboutToQuit.connect(lambda: storage().close())
         self.startTimer(200)  # this runs py code, to Ctrl+C is caught
 
     def timerEvent(self, _):
@@ -281,8 +286,18 @@ class MainWindow(QtWidgets.QMainWindow):
         if self._mdi_area.subWindowList():
             event.ignore()
         else:
+            save_queue.drain()
             self._save_settings()
 
+    def _on_save_failed(self, path: str, message: str) -> None:
+        MB.warning(
+            self,
+            tr("Error"),
+            tr("Failed to save {path}:\n\n{message}").format(
+                path=path, message=message
+            ),
+        )
+
     def _save_settings(self):
         """Called from closeEvent."""
 
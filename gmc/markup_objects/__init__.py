@@ -18,6 +18,13 @@ class MarkupObjectMeta:
 
     ACTION_KEYS: ClassVar[dict[Qt.Key, tuple[int, ...]]] = {}
 
+    # level of detail (screen pixels per image pixel) below which objects
+    # are drawn with one solid pen from simplified geometry
+    LOD_SIMPLIFIED: ClassVar[float] = 0.5
+    # and below which only labels of selected objects are drawn
+    LOD_TAGS: ClassVar[float] = 0.25
+    TINY_PX: ClassVar[float] = 3.0  # smaller objects are drawn as points
+
     def __init__(self, *args: Any, **kwargs: Any) -> None:
         assert not hasattr(self, "_edit_mode")
         self._edit_mode = False
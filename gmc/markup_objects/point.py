@@ -2,7 +2,7 @@ from PyQt5 import QtGui, QtWidgets
 
 from ..views.image_view import ImageView
 from . import MarkupObjectMeta
-from typing import Callable
+from typing import Callable, ClassVar
 from PyQt5.QtCore import Qt, QRectF, QPointF, QCoreApplication
 
 tr: Callable[[str], str] = lambda text: QCoreApplication.translate(
@@ -11,13 +11,18 @@ tr: Callable[[str], str] = lambda text: QCoreApplication.translate(
 
 
 class MarkupPoint(QtWidgets.QGraphicsItem, MarkupObjectMeta):
-    _rect = QRectF(-4, -4, 8, 8)
+    _rect = QRectF(-4, -4, 8, 8)  # in pixels
+    # same size at any zoom. Not `ItemIgnoresTransformations`, because
+    # such items are never in the scene index
+    screen_sized: ClassVar = True
     PEN = QtGui.QPen(Qt.GlobalColor.white, 4)
     PEN_SELECTED = QtGui.QPen(Qt.GlobalColor.yellow, 4)
     CURSOR = QtGui.QCursor(QtGui.QPixmap("gmc:cursors/add_point.svg"), 6, 6)
 
     def __init__(self, pos: QPointF | None = None):
         super(MarkupPoint, self).__init__()
+        self._shape_scale: float | None = None  # view scale of `_shape`
+        self._shape = QtGui.QPainterPath()
         if pos is None:
             pos = QPointF()
         else:
@@ -25,7 +30,6 @@ class MarkupPoint(QtWidgets.QGraphicsItem, MarkupObjectMeta):
         self.setPos(pos)
         self.setFlags(
             self.ItemIsMovable
-            | self.ItemIgnoresTransformations
             | self.ItemIsSelectable
             | self.ItemIsFocusable
             | self.ItemSendsGeometryChanges
@@ -43,22 +47,38 @@ class MarkupPoint(QtWidgets.QGraphicsItem, MarkupObjectMeta):
         else:
             pen, dashed = self.PEN, self.PEN_DASHED
         radii_px = 2.0
+        factor = 1.0 / painter.transform().m11()
+        painter.save()
+        painter.scale(factor, factor)
         painter.setPen(pen)
         painter.drawEllipse(QPointF(), radii_px, radii_px)
         painter.setPen(dashed)
         painter.drawEllipse(QPointF(), radii_px, radii_px)
+        painter.restore()
 
     def data(self):
         pos = self.pos()
         return [pos.x(), pos.y()]
 
     def boundingRect(self):
-        return self._rect
+        scene = self.scene()
+        if scene is None:
+            return self._rect
+        return self._scaled_rect(scene.item_scale)
 
     def shape(self) -> QtGui.QPainterPath:
-        path = QtGui.QPainterPath()
-        path.addEllipse(self._rect)
-        return path
+        """Same size at any zoom, cached until zoom change"""
+        scene = self.scene()
+        scale = 1.0 if scene is None else scene.view_scale
+        if self._shape_scale != scale:
+            self._shape = QtGui.QPainterPath()
+            self._shape.addEllipse(self._scaled_rect(scale))
+            self._shape_scale = scale
+        return self._shape
+
+    def _scaled_rect(self, scale: float) -> QRectF:
+        rc = self._rect
+        return QRectF(rc.topLeft() / scale, rc.size() / scale)
 
     def on_start_edit(self):
         pass
@@ -132,6 +152,9 @@ class UndoPointCreate(QtWidgets.QUndoCommand):
         self._pos = pos
         super().__init__(tr("Point Creation"))
 
+    def touched(self) -> list[QtWidgets.QGraphicsItem]:
+        return [self._point]
+
     def redo(self) -> None:
         self._point.setPos(self._pos)
         self._scene.addItem(self._point)
@@ -149,6 +172,9 @@ class UndoPointMove(QtWidgets.QUndoCommand):
         self._new_pos = new_pos
         super().__init__(tr("Point Move"))
 
+    def touched(self) -> list[QtWidgets.QGraphicsItem]:
+        return [self._markup_point]
+
     def redo(self) -> None:
         self._markup_point.setPos(self._new_pos)
 
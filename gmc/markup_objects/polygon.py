@@ -4,10 +4,12 @@ from PyQt5 import QtGui, QtWidgets
 from ..views.image_view import ImageView
 from . import MarkupObjectMeta
 from .moveable_diamond import MoveableDiamond
-from math import hypot, atan2, degrees, radians, sin, cos
+from math import hypot, atan2, degrees, radians, sin, cos, floor, log2
 from typing import Any, Callable
 from PyQt5.QtCore import Qt, QPointF, QCoreApplication, QRectF
 from time import monotonic
+import numpy as np
+import numpy.typing as npt
 
 tr: Callable[[str], str] = lambda text: QCoreApplication.translate(
     "@default", text
@@ -30,18 +32,35 @@ class MarkupPolygon(QtWidgets.QGraphicsItem, MarkupObjectMeta):
         else:
             assert isinstance(polygon, QtGui.QPolygonF), polygon
         self._polygon = polygon
-        self._last_scale = 1.0  # dirty trick to make shape respect zoom
+        # `shape` for (view scale, close)
+        self._shape_key: tuple[float, bool] | None = None
+        self._shape = QtGui.QPainterPath()
+        self._vertices_array: npt.NDArray[np.float64] | None = None
+        # level of `_simplified_polygon`, see `_simplified`
+        self._simplified_level: int | None = None
+        self._simplified_polygon = polygon
         self.setFlags(self.ItemIsSelectable | self.ItemIsFocusable)
 
     def paint(
         self,
         painter: QtGui.QPainter,
-        _option,
+        option: QtWidgets.QStyleOptionGraphicsItem,
         _widget,
         f=QtGui.QPainter.drawPolygon,
     ) -> None:
         # Warning: do not setBrush here, since it is useful to set it outside
         p = self._polygon
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < self.LOD_SIMPLIFIED and not self._edit_mode and p.size():
+            painter.setPen(
+                self.PEN_SELECTED if self.isSelected() else self.PEN
+            )
+            rc = p.boundingRect()
+            if max(rc.width(), rc.height()) * lod < self.TINY_PX:
+                painter.drawPoint(rc.center())
+            else:
+                f(painter, self._simplified(lod))
+            return
         if self.isSelected():
             pen, dashed = self.PEN_SELECTED, self.PEN_SELECTED_DASHED
             # draw circle when there's nothing to draw, for user to see it
@@ -56,23 +75,52 @@ class MarkupPolygon(QtWidgets.QGraphicsItem, MarkupObjectMeta):
         f(painter, p)
         painter.setPen(dashed)
         f(painter, p)
-        self._last_scale = painter.transform().m11()
         painter.setPen(Qt.GlobalColor.blue)
 
+    def _simplified(self, lod: float) -> QtGui.QPolygonF:
+        """
+        :returns: polygon without vertices that are closer than a screen
+                  pixel to the previous one, cached for powers of 2 of `lod`
+        """
+        level = floor(log2(lod))
+        if level != self._simplified_level:
+            tolerance = 0.5 ** (level + 1)
+            self._simplified_polygon = simplify(self._polygon, tolerance)
+            self._simplified_level = level
+        return self._simplified_polygon
+
+    def prepareGeometryChange(self) -> None:
+        self._simplified_level = None
+        self._shape_key = None
+        self._vertices_array = None
+        super().prepareGeometryChange()
+
+    def _vertices(self) -> npt.NDArray[np.float64]:
+        """:returns: (n, 2) copy of vertices, cached until geometry change"""
+        if self._vertices_array is None:
+            self._vertices_array = polygon_array(self._polygon)
+        return self._vertices_array
+
     def boundingRect(self) -> QRectF:
         rc = self._polygon.boundingRect()
         rc.adjust(-5, -5, 5, 5)  # to make `shape` width work
         return rc
 
     def shape(self, close: bool = True) -> QtGui.QPainterPath:
-        path = QtGui.QPainterPath()
-        path.setFillRule(Qt.FillRule.WindingFill)
-        path.addPolygon(self._polygon)
-        if close:
-            path.closeSubpath()
-        ps = QtGui.QPainterPathStroker()
-        ps.setWidth(10.0 / self._last_scale)
-        return ps.createStroke(path)
+        """Stroke of 10 screen pixels, cached until geometry or zoom change"""
+        scene = self.scene()
+        scale = 1.0 if scene is None else scene.view_scale
+        if self._shape_key != (scale, close):
+            path = QtGui.QPainterPath()
+            path.setFillRule(Qt.FillRule.WindingFill)
+            path.addPolygon(self._polygon)
+            if close:
+                path.closeSubpath()
+            ps = QtGui.QPainterPathStroker()
+            ps.setWidth(10.0 / scale)
+            self._shape = ps.createStroke(path)
+            self._shape_key = (scale, close)
+        return self._shape
 
     def notify(self, idx: int, pos: QPointF) -> None:
         undo = UndoPolygonPointMove(self, idx, pos)
@@ -114,69 +162,109 @@ class MarkupPolygon(QtWidgets.QGraphicsItem, MarkupObjectMeta):
     def on_deselect(self) -> None:
         pass  # for overriding
 
-    def data(self):
+    def data(self) -> list[tuple[float, float]]:
         pos = self.pos()
-        return [(p.x() + pos.x(), p.y() + pos.y()) for p in self._polygon]
-
+        vertices = polygon_array(self._polygon) + (pos.x(), pos.y())
+        xs, ys = vertices.T.tolist()
+        return list(zip(xs, ys))
 
-class dist_squared:
-    ":returns: distance from segment to a point"
 
-    def __new__(
-        cls, a: QPointF, b: QPointF, d: QPointF
-    ) -> tuple[QPointF, float]:
-        "a and b segment line; d - the point"
-        p = b - a
-        l2 = cls.length(p)
-        if not l2:
-            return a, cls.length(a - d)
-        u = max(0.0, min(1.0, cls.add(cls.mul((d - a), p)) / l2))
-        nearest = a + u * p
-        return nearest, cls.length(nearest - d)
+def polygon_array(polygon: QtGui.QPolygonF) -> npt.NDArray[np.float64]:
+    """:returns: (n, 2) array with a copy of `polygon` vertices"""
+    size = polygon.size()
+    if not size:
+        return np.empty((0, 2))
+    data = polygon.data()
+    data.setsize(size * 16)  # `QPointF` is two doubles
+    return np.frombuffer(data, np.float64).reshape(size, 2).copy()
 
-    @staticmethod
-    def mul(a: QPointF, b: QPointF) -> QPointF:
-        return QPointF(a.x() * b.x(), a.y() * b.y())
 
-    @staticmethod
-    def add(a: QPointF) -> float:
-        return a.x() + a.y()
+def polygon_from_array(vertices: npt.ArrayLike) -> QtGui.QPolygonF:
+    """
+    Copies coordinates into `QPolygonF` buffer at once
 
-    @staticmethod
-    def length(a: QPointF) -> float:
-        return a.x() * a.x() + a.y() * a.y()
+    :param vertices: (n, 2) numbers, like `[[x, y], ...]` of json
+    :raises ValueError: for anything else
+    """
+    array = np.asarray(vertices)
+    if array.ndim == 1 and len(array) == 0:  # `[]` of json
+        return QtGui.QPolygonF()
+    if (
+        array.ndim != 2
+        or array.shape[1] != 2
+        or not array.size
+        or array.dtype.kind not in "fiu"
+    ):
+        raise ValueError(f"expected [[x, y], ...], got {vertices!r:.80}")
+    polygon = QtGui.QPolygonF(len(array))
+    data = polygon.data()
+    data.setsize(polygon.size() * 16)  # `QPointF` is two doubles
+    np.frombuffer(data, np.float64).reshape(array.shape)[:] = array
+    return polygon
+
+
+def nearest_segment(
+    vertices: npt.NDArray[np.float64], point: QPointF
+) -> tuple[int, QPointF]:
+    """
+    :param vertices: (n, 2) array of closed polygon vertices, n > 0
+    :returns: index `idx` of segment from vertex `idx - 1` to vertex `idx`,
+              that is the closest to `point`, and the closest point on it
+    """
+    pos = np.array((point.x(), point.y()))
+    segments = np.roll(vertices, 1, axis=0) - vertices
+    lengths2 = np.einsum("ij,ij->i", segments, segments)
+    u = np.einsum("ij,ij->i", pos - vertices, segments)
+    np.divide(u, lengths2, out=u, where=lengths2 != 0.0)
+    u[lengths2 == 0.0] = 0.0
+    np.clip(u, 0.0, 1.0, out=u)
+    nearest = vertices + u[:, None] * segments
+    offsets = nearest - pos
+    idx = int(np.argmin(np.einsum("ij,ij->i", offsets, offsets)))
+    return idx, QPointF(*nearest[idx])
+
+
+def simplify(polygon: QtGui.QPolygonF, tolerance: float) -> QtGui.QPolygonF:
+    """
+    :returns: `polygon` with about one vertex per `tolerance` of its
+              length, so close vertices are dropped. First and last are kept
+    """
+    if polygon.size() < 3:
+        return polygon
+    vertices = polygon_array(polygon)
+    steps = np.diff(vertices, axis=0)
+    length = np.concatenate(((0.0,), np.cumsum(np.hypot(*steps.T))))
+    bucket = np.floor_divide(length, tolerance)
+    keep = np.empty(len(vertices), dtype=bool)
+    keep[0] = keep[-1] = True
+    keep[1:-1] = bucket[1:-1] != bucket[:-2]  # first vertex of a bucket
+    return polygon_from_array(vertices[keep])
 
 
 class EditableMarkupPolygon(MarkupPolygon):
     def mouseDoubleClickEvent(self, event: QtWidgets.QGraphicsSceneMouseEvent):
         if self.in_edit_mode() and self._polygon:
-            the_point = event.scenePos()
-            min_dist = 1e900
-            prev_point = self._polygon[-1]
-            min_idx = -1
-            for idx, point in enumerate(self._polygon):
-                pt, dist = dist_squared(point, prev_point, the_point)
-                prev_point = point
-                if dist < min_dist:
-                    min_idx = idx
-                    min_dist = dist
-                    mid_pt = pt
-            if min_idx == -1:
-                return
-            undo = UndoPolygonAddPoint(self, min_idx, mid_pt)
+            idx, pos = nearest_segment(self._vertices(), event.scenePos())
+            undo = UndoPolygonAddPoint(self, idx, pos)
             if self.UNDO:
                 self.scene().undo_stack.push(undo)
             else:
                 undo.redo()
-
-            # ensure new diamond handle appears
-            self.on_stop_edit()
-            self.start_edit_nodes()
-            self.childItems()[min_idx].setSelected(True)
+            self._insert_diamond(idx, pos).setSelected(True)
             self.update()
         else:
             MarkupObjectMeta.mouseDoubleClickEvent(self, event)
 
+    def _insert_diamond(self, idx: int, pos: QPointF) -> MoveableDiamond:
+        """Adds handle of inserted vertex, without recreating the others"""
+        diamonds = self.childItems()
+        for diamond in diamonds[idx:]:
+            diamond.idx += 1
+        diamond = MoveableDiamond(self, idx, pos)
+        if idx < len(diamonds):
+            diamond.stackBefore(diamonds[idx])  # `childItems` order is `idx`
+        return diamond
+
     def notify_delete(self) -> None:
         """
         User pressed "Del" on `MoveableDiamond`, we get notified
@@ -207,9 +295,10 @@ class EditableMarkupPolygon(MarkupPolygon):
         pos: QPointF = view.mapToScene(event.pos())
         scene = view.scene()
         if self._polygon.isEmpty():
-            scene.addItem(self)
             self._polygon.append(pos)
+            scene.addItem(self)
         else:
+            self.prepareGeometryChange()
             self._polygon[-1] = pos
             if len(self._polygon) == 2:
                 undo = UndoPolygonCreate(scene, self)
@@ -226,6 +315,7 @@ class EditableMarkupPolygon(MarkupPolygon):
             ):  # clicked on the same point
                 self.mouse_doubleclick(event, view)
                 return True
+        self.prepareGeometryChange()
         self._polygon.append(pos)  # add second point, so it follows cursor
 
         self.setFlag(self.GraphicsItemFlag.ItemIsSelectable, False)
@@ -239,6 +329,7 @@ class EditableMarkupPolygon(MarkupPolygon):
         self, _event: QtGui.QMouseEvent, view: ImageView
     ) -> bool:
         view.unset_all_events()
+        self.prepareGeometryChange()
         del self._polygon[-1]
         # important: there's no strong enough reason to remove one point paths
         self.setFlag(self.ItemIsSelectable, True)
@@ -256,6 +347,7 @@ class EditableMarkupPolygon(MarkupPolygon):
             d = hypot(dx, dy)
             fixed_angle = radians(angle - angle % step_deg)
             pt = a + QPointF(d * sin(fixed_angle), d * cos(fixed_angle))
+        self.prepareGeometryChange()
         self._polygon[-1] = pt
         self.update()
         self.on_change_polygon(self._polygon)
@@ -279,8 +371,12 @@ class UndoPolygonCreate(QtWidgets.QUndoCommand):
         self._polygon = markup_polygon._polygon[:]
         super().__init__(tr("Polygon Creation"))
 
+    def touched(self) -> list[QtWidgets.QGraphicsItem]:
+        return [self._markup_polygon]
+
     def redo(self) -> None:
         mp = self._markup_polygon
+        mp.prepareGeometryChange()
         mp._polygon = self._polygon[:]
         if mp.scene() is None:
             self._scene.addItem(mp)
@@ -300,14 +396,19 @@ class UndoPolygonAddPoint(QtWidgets.QUndoCommand):
         self._pos = pos
         super().__init__(tr("Polygon Point Addition"))
 
+    def touched(self) -> list[QtWidgets.QGraphicsItem]:
+        return [self._markup_polygon]
+
     def redo(self) -> None:
         mp = self._markup_polygon
+        mp.prepareGeometryChange()
         mp._polygon.insert(self._idx, self._pos)
         mp.update()
 
     def undo(self) -> None:
         mp = self._markup_polygon
         mp.ensure_edition_canceled()
+        mp.prepareGeometryChange()
         del mp._polygon[self._idx]
         mp.update()
 
@@ -324,11 +425,15 @@ class UndoPolygonPointMove(QtWidgets.QUndoCommand):
         self._timestamp = monotonic()
         super().__init__(tr("Point Movement"))
 
+    def touched(self) -> list[QtWidgets.QGraphicsItem]:
+        return [self._markup_polygon]
+
     def redo(self) -> None:
         mp, idx = self._markup_polygon, self._idx
         diamonds = mp.childItems()
         if len(diamonds) == len(mp._polygon):
             diamonds[idx].setPos(self._point)
+        mp.prepareGeometryChange()
         self._point, mp._polygon[idx] = (
             QPointF(mp._polygon[idx]),
             self._point,
@@ -356,22 +461,27 @@ class UndoPolygonDelPoints(QtWidgets.QUndoCommand):
     def __init__(
         self, markup_polygon: EditableMarkupPolygon, indices: list[int]
     ) -> None:
-        indices.sort(reverse=True)
-        polygon = markup_polygon._polygon
-        self._points = [QPointF(polygon[idx]) for idx in indices]
+        self._indices = np.unique(indices)
+        self._points = polygon_array(markup_polygon._polygon)[self._indices]
         self._markup_polygon = markup_polygon
-        self._indices = indices
         super().__init__(tr("Polygon Points Deletion"))
 
+    def touched(self) -> list[QtWidgets.QGraphicsItem]:
+        return [self._markup_polygon]
+
     def redo(self) -> None:
         mp = self._markup_polygon
-        for idx in self._indices:
-            mp._polygon.remove(idx)
+        vertices = np.delete(mp._vertices(), self._indices, axis=0)
+        mp.prepareGeometryChange()
+        mp._polygon = polygon_from_array(vertices)
         mp.update()
 
     def undo(self) -> None:
         mp = self._markup_polygon
         mp.ensure_edition_canceled()
-        for idx, point in zip(self._indices[::-1], self._points[::-1]):
-            mp._polygon.insert(idx, point)
+        # indices in the polygon without the deleted points
+        indices = self._indices - np.arange(len(self._indices))
+        vertices = np.insert(mp._vertices(), indices, self._points, axis=0)
+        mp.prepareGeometryChange()
+        mp._polygon = polygon_from_array(vertices)
         mp.update()
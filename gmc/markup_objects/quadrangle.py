@@ -55,6 +55,7 @@ class Quadrangle(MarkupPolygon):
         if self._polygon.count() == 4:
             self._finish(view)
         else:
+            self.prepareGeometryChange()
             self._polygon.append(self._polygon[-1])
         return True
 
@@ -66,6 +67,7 @@ class Quadrangle(MarkupPolygon):
     def mouse_move_sequential(
         self, event: QtGui.QMouseEvent, view: ImageView
     ) -> bool:
+        self.prepareGeometryChange()
         self._polygon[-1] = view.mapToScene(event.pos())
         self.update()
         return True
@@ -84,6 +86,7 @@ class Quadrangle(MarkupPolygon):
             p2 = QtCore.QPointF(p0.x() + w, p0.y() + h)
             p3 = QtCore.QPointF(p0.x(), p0.y() + h)
         polygon = QtGui.QPolygonF((p0, p1, p2, p3))
+        self.prepareGeometryChange()
         self._polygon = polygon
         self.update()
         self.on_change_polygon(polygon)
@@ -95,6 +98,7 @@ class Quadrangle(MarkupPolygon):
         ):
             self._finish(view)
         else:
+            self.prepareGeometryChange()
             self._polygon = QtGui.QPolygonF(
                 [self._polygon[0], self._polygon[0]]
             )
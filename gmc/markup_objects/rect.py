@@ -31,10 +31,29 @@ class MarkupRect(QtWidgets.QGraphicsItem, MarkupObjectMeta):
         else:
             assert isinstance(rect, QRectF), (rect, type(rect))
         self._rect = rect
+        self._shape_scale: float | None = None  # view scale of `_shape`
+        self._shape = QtGui.QPainterPath()
         self.setFlags(self.ItemIsSelectable | self.ItemIsFocusable)
 
-    def paint(self, painter: QtGui.QPainter, _option, _widget) -> None:
+    def paint(
+        self,
+        painter: QtGui.QPainter,
+        option: QtWidgets.QStyleOptionGraphicsItem,
+        _widget,
+    ) -> None:
         # Don't set brush, so it can be set outside
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        if lod < self.LOD_SIMPLIFIED and not self._edit_mode:
+            painter.setPen(
+                self.PEN_SELECTED if self.isSelected() else self.PEN
+            )
+            rc = self._rect
+            size = max(abs(rc.width()), abs(rc.height()))
+            if size * lod < self.TINY_PX:
+                painter.drawPoint(rc.center())
+            else:
+                painter.drawRect(rc)
+            return
         if self.isSelected():
             pen, dashed = self.PEN_SELECTED, self.PEN_SELECTED_DASHED
         else:
@@ -45,13 +64,22 @@ class MarkupRect(QtWidgets.QGraphicsItem, MarkupObjectMeta):
         painter.drawRect(self._rect)
 
     def shape(self) -> QtGui.QPainterPath:
-        path = QtGui.QPainterPath()
-        path.setFillRule(Qt.FillRule.WindingFill)
-        path.addRect(self._rect)
-        ps = QtGui.QPainterPathStroker()
-        scale = self.scene().views()[0].transform().m11()
-        ps.setWidth(8 / scale)
-        return ps.createStroke(path)
+        """Stroke of 8 screen pixels, cached until geometry or zoom change"""
+        scene = self.scene()
+        scale = 1.0 if scene is None else scene.view_scale
+        if self._shape_scale != scale:
+            path = QtGui.QPainterPath()
+            path.setFillRule(Qt.FillRule.WindingFill)
+            path.addRect(self._rect)
+            ps = QtGui.QPainterPathStroker()
+            ps.setWidth(8 / scale)
+            self._shape = ps.createStroke(path)
+            self._shape_scale = scale
+        return self._shape
+
+    def prepareGeometryChange(self) -> None:
+        self._shape_scale = None
+        super().prepareGeometryChange()
 
     def boundingRect(self) -> QRectF:
         return self._rect.normalized().adjusted(-4.0, -4.0, 4.0, 4.0)
@@ -71,6 +99,7 @@ class MarkupRect(QtWidgets.QGraphicsItem, MarkupObjectMeta):
             br = QPointF(self._rect.right(), pos.y())
         else:
             assert False
+        self.prepareGeometryChange()
         self._rect = QRectF(tl, br)
         for point, diamond in zip(self._four_points(), self.childItems()):
             # only notify unselected diamonds, because selected had moved
@@ -159,6 +188,7 @@ class MarkupRect(QtWidgets.QGraphicsItem, MarkupObjectMeta):
         return True  # if not 'return True', back objects will be selected
 
     def mouse_move(self, event: QtGui.QMouseEvent, view: ImageView) -> bool:
+        self.prepareGeometryChange()
         if QtGui.QGuiApplication.keyboardModifiers() != Qt.ShiftModifier:
             self._rect.setBottomRight(view.mapToScene(event.pos()))
         else:
@@ -213,8 +243,12 @@ class UndoRectCreate(QtWidgets.QUndoCommand):
         self._rect = rect
         super().__init__(tr("Rectangle Creation"))
 
+    def touched(self) -> list[QtWidgets.QGraphicsItem]:
+        return [self._markup_rect]
+
     def redo(self) -> None:
         mr = self._markup_rect
+        mr.prepareGeometryChange()
         mr._rect = QRectF(self._rect)
         if mr.scene() is None:
             self._scene.addItem(mr)
@@ -234,14 +268,19 @@ class UndoRectModification(QtWidgets.QUndoCommand):
         self._new_rect = new_rect
         super().__init__(tr("Rectangle Modification"))
 
+    def touched(self) -> list[QtWidgets.QGraphicsItem]:
+        return [self._markup_rect]
+
     def redo(self) -> None:
         mr = self._markup_rect
         mr.ensure_edition_canceled()
+        mr.prepareGeometryChange()
         mr._rect = QRectF(self._new_rect)
         mr.update()
 
     def undo(self) -> None:
         mr = self._markup_rect
         mr.ensure_edition_canceled()
+        mr.prepareGeometryChange()
         mr._rect = QRectF(self._old_rect)
         mr.update()
@@ -1,8 +1,9 @@
-from typing import Any, Callable, Sequence
+from typing import Any, Callable, ClassVar, Sequence
 from PyQt5 import QtCore, QtGui, QtWidgets
 from collections import defaultdict
 from gmc.views.image_widget import ImageWidget
 from . import MarkupObjectMeta
+from ..settings import settings
 from PyQt5.QtCore import Qt, QPointF, QCoreApplication
 
 tr: Callable[[str], str] = lambda text: QCoreApplication.translate(
@@ -96,12 +97,20 @@ class HasTags:
     tag_brush_sel = QtGui.QBrush(grad)
     del grad
     properties: dict[str, float | int | str | bool]  # optional properties
+    # labels have the same size at any zoom
+    screen_sized: ClassVar = True
+    _label_metrics: ClassVar[QtGui.QFontMetrics]
+
+    @classmethod
+    def on_settings_updated(cls) -> None:
+        cls._label_metrics = QtGui.QFontMetrics(settings.font_label)
 
     def __init__(self, *args: Any, tags: Sequence[str] = (), **kwargs: Any):
         self._tags: set[str] = set(tags)
         self._draws: list[Callable[[QtGui.QPainter], None]] = []
         self._tag_polygon = QtGui.QPolygonF()
         self._last_fm = None
+        self._bounding_rect: QtCore.QRectF | None = None
         if "properties" in kwargs:
             self.properties = kwargs.pop("properties")
         super().__init__(*args, **kwargs)
@@ -127,6 +136,7 @@ class HasTags:
 
     def _on_tags_changed(self):
         self._last_fm = None
+        self.prepareGeometryChange()  # label size changes
         self.update()
         pass  # for overriding
 
@@ -143,10 +153,40 @@ class HasTags:
         super().paint(painter, option, widget, **kwargs)
         self.draw_tags(painter)
 
+    def prepareGeometryChange(self) -> None:
+        self._bounding_rect = None
+        super().prepareGeometryChange()
+
+    def boundingRect(self) -> QtCore.QRectF:
+        """
+        Includes the label, so partial viewport updates redraw it. Cached
+        until `prepareGeometryChange`
+        """
+        if self._bounding_rect is not None:
+            return self._bounding_rect
+        rc = super().boundingRect()
+        scene = self.scene()
+        if scene is None:
+            return rc
+        if not self._tags:
+            self._bounding_rect = rc
+            return rc
+        self._construct_draws(self._label_metrics)
+        scale = scene.item_scale
+        hh = self.height * 0.5
+        pos = self.tag_pos()
+        label = QtCore.QRectF(
+            pos.x(),
+            pos.y() - hh / scale,
+            (self._tag_width + 1.5) / scale,  # with shadow
+            (self.height + 1.5) / scale,
+        )
+        self._bounding_rect = rc.united(label)
+        return self._bounding_rect
+
     def _construct_draws(
-        self, painter: QtGui.QPainter, color_tag_dict_get=COLOR_TAG_DICT_GET
+        self, fm: QtGui.QFontMetrics, color_tag_dict_get=COLOR_TAG_DICT_GET
     ):
-        fm: QtGui.QFontMetrics = painter.fontMetrics()
         if self._last_fm == fm:
             return
 
@@ -187,8 +227,14 @@ class HasTags:
     ):
         if not self._tags or self._schema.tags_hidden:
             return
-        self._construct_draws(painter)
-        factor = 1.0 / painter.transform().m11()
+        transform = painter.worldTransform()
+        lod = QtWidgets.QStyleOptionGraphicsItem.levelOfDetailFromTransform(
+            transform
+        )
+        if lod < self.LOD_TAGS and not self.isSelected():
+            return  # labels would cover the objects
+        self._construct_draws(painter.fontMetrics())
+        factor = 1.0 / transform.m11()
         painter.translate(self.tag_pos())
         painter.scale(factor, factor)
         painter.setPen(Qt.NoPen)
@@ -352,6 +398,9 @@ class UndoTagModification(QtWidgets.QUndoCommand):
         self._remove = remove
         super().__init__(tr("Tag Modification"))
 
+    def touched(self) -> list[QtWidgets.QGraphicsItem]:
+        return self._items
+
     def redo(self) -> None:
         for item in self._items:
             for tag in self._remove:
@@ -367,3 +416,7 @@ class UndoTagModification(QtWidgets.QUndoCommand):
             for tag in self._add:
                 item.remove_tag(tag)
             item.update()
+
+
+HasTags.on_settings_updated()
+settings.register(HasTags.on_settings_updated)
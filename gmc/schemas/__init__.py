@@ -14,6 +14,7 @@ class MarkupSchema(metaclass=abc.ABCMeta):
         "*.jp2",
         "*.jpeg",
         "*.jpg",
+        "*.npy",
         "*.png",
         "*.tga",
         "*.tif",
@@ -38,6 +39,9 @@ class MarkupSchema(metaclass=abc.ABCMeta):
     def save_markup(self, force: bool = False) -> None:
         raise NotImplementedError()
 
+    def close_markup(self) -> None:
+        """Markup window is closing, unsaved changes are discarded"""
+
     @classmethod
     @abc.abstractmethod
     def save_settings(cls, settings: QtCore.QSettings) -> None:
@@ -1,13 +1,17 @@
 from PyQt5 import QtCore, QtGui, QtWidgets
 from collections import defaultdict
 from . import MarkupSchema
-from ..markup_objects.polygon import EditableMarkupPolygon, MarkupObjectMeta
+from ..markup_objects.polygon import (
+    EditableMarkupPolygon,
+    MarkupObjectMeta,
+    polygon_from_array,
+)
 from ..markup_objects.tags import HasTags, TagsDialog
 from ..views.image_widget import ImageWidget
 from ..utils.json import load as load_json, dump as dump_json
-from ..utils.dicts import dicts_are_equal
+from ..utils.journal import SnapshotJournal, recover
+from ..utils.sidecar import sidecars, read_lines
 from ..utils.svg import icon_from_data
-from ..utils.image import load_pixmap
 from ..utils import get_icon, separator
 from ..file_widgets.one_source_one_destination import OneSourceOneDestination
 
@@ -202,6 +206,9 @@ class FieldsSchema(OneSourceOneDestination, MarkupSchema):
         self._select_action.trigger()
         self._next_action = markup_window._next_action
         self._unique_cache = {}
+        self._journal = SnapshotJournal(
+            iw.scene().markup_changed, self._get_markup
+        )
 
     def _on_select_default_action(self, action):
         getattr(self, str(action.data())).trigger()
@@ -226,6 +233,7 @@ class FieldsSchema(OneSourceOneDestination, MarkupSchema):
         for item in self._get_selected_items():
             if isinstance(item, HasTags):
                 item.toggle_base()
+                self._image_widget.scene().mark_changed()
 
     def _get_selected_items(self):
         try:
@@ -244,23 +252,28 @@ class FieldsSchema(OneSourceOneDestination, MarkupSchema):
     def open_markup(self, src_data_path: str, dst_markup_path: str) -> None:
         src_dir = QtCore.QFileInfo(src_data_path).dir()
         try:
-            with open(src_dir.absoluteFilePath("tags.txt"), "r") as f:
-                self._user_tags = set(
-                    filter(None, (line.strip() for line in f))
-                )
+            tags = sidecars.get(
+                src_dir.absoluteFilePath("tags.txt"), read_lines
+            )
         except IOError:
+            tags = None
+        if tags is not None:
+            self._user_tags = set(tags)
+        else:
             self._user_tags: set[str] = set()
 
-        pixmap = load_pixmap(src_data_path)
-        self._size = (pixmap.width(), pixmap.height())
-        self._image_widget.set_pixmap(pixmap)
+        size = self._image_widget.set_image(src_data_path)
+        self._size = (size.width(), size.height())
 
         self._dst_markup_path = dst_markup_path
         dst_dir = QtCore.QFileInfo(dst_markup_path).dir()
         self._dst_main_path = dst_dir.absoluteFilePath("base.json")
-        self._original_markup = (
-            load_json(self._dst_main_path, self._image_widget),
-            load_json(dst_markup_path, self._image_widget),
+        self._journal.close()
+        paths = (self._dst_main_path, dst_markup_path)
+        loaded = [load_json(path, self._image_widget) for path in paths]
+        recovered = [recover(path, m) for path, m in zip(paths, loaded)]
+        self._original_markup = tuple(
+            m if r is None else r for m, r in zip(loaded, recovered)
         )
         scene = self._image_widget.scene()
         item = None
@@ -269,16 +282,12 @@ class FieldsSchema(OneSourceOneDestination, MarkupSchema):
             if the_type == "path":
                 cls, args = CustomPath, (
                     True,
-                    QtGui.QPolygonF(
-                        [QtCore.QPointF(x, y) for x, y in obj["data"]]
-                    ),
+                    polygon_from_array(obj["data"]),
                 )
             elif the_type == "region":
                 cls, args = CustomRegion, (
                     True,
-                    QtGui.QPolygonF(
-                        [QtCore.QPointF(x, y) for x, y in obj["data"]]
-                    ),
+                    polygon_from_array(obj["data"]),
                 )
             else:
                 print(f"invalid object type = `{the_type}`")
@@ -289,21 +298,29 @@ class FieldsSchema(OneSourceOneDestination, MarkupSchema):
             if the_type == "path":
                 cls, args = CustomPath, (
                     False,
-                    QtGui.QPolygonF(
-                        [QtCore.QPointF(x, y) for x, y in obj["data"]]
-                    ),
+                    polygon_from_array(obj["data"]),
                 )
             elif the_type == "region":
                 cls, args = CustomRegion, (
                     False,
-                    QtGui.QPolygonF(
-                        [QtCore.QPointF(x, y) for x, y in obj["data"]]
-                    ),
+                    polygon_from_array(obj["data"]),
                 )
             else:
                 print(f"invalid object type = `{the_type}`")
             item = cls(self, *args, tags=obj.get("tags", ()))
             scene.addItem(item)
+        main_markup, markup = self._original_markup
+        size = main_markup.get("size")
+        if (
+            recovered != [None, None]
+            or "objects" not in markup
+            or size != list(self._size)
+        ):
+            scene.mark_changed()  # new or incomplete markup is to be saved
+        self._journal.open(*paths)
+        if recovered != [None, None]:
+            print(f"recovered unsaved changes of `{dst_markup_path}`")
+            self._journal.flush()  # the old journals are overwritten
 
         self._image_widget.setFocus()
 
@@ -311,19 +328,23 @@ class FieldsSchema(OneSourceOneDestination, MarkupSchema):
             item.setSelected(True)
 
     def markup_has_changes(self):
-        return not dicts_are_equal(self._get_markup(), self._original_markup)
+        return self._image_widget.scene().has_changes()
 
     def save_markup(self, force=True):
-        markup = self._get_markup()
-        if dicts_are_equal(markup, self._original_markup) and not force:
+        scene = self._image_widget.scene()
+        if not force and not scene.has_changes():
             print(f"not changed `{self._dst_markup_path}`")
             return
-        markup_main, markup = markup
+        markup_main, markup = self._original_markup = self._get_markup()
+        main_written, written = self._journal.saved()
         print("saving to", self._dst_main_path)
-        dump_json(self._dst_main_path, markup_main)
+        dump_json(self._dst_main_path, markup_main, main_written)
         print("saving to", self._dst_markup_path)
-        dump_json(self._dst_markup_path, markup)
-        self._original_markup = markup
+        dump_json(self._dst_markup_path, markup, written)
+        scene.mark_saved()
+
+    def close_markup(self) -> None:
+        self._journal.close()
 
     def _get_markup(self):
         markup_main = defaultdict(list, self._original_markup[0])
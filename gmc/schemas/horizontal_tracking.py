@@ -5,8 +5,8 @@ from ..markup_objects.polygon import MarkupObjectMeta
 from ..markup_objects.tags import HasTags, TagsDialog
 from ..views.image_widget import ImageWidget
 from ..utils.json import load as load_json, dump as dump_json
-from ..utils.dicts import dicts_are_equal
-from ..utils.image import load_pixmap
+from ..utils.journal import SnapshotJournal, recover
+from ..utils.sidecar import sidecars, read_lines
 from ..utils import get_icon, separator
 from ..utils.svg import icon_from_data
 from ..file_widgets.one_source_one_destination import OneSourceOneDestination
@@ -37,6 +37,7 @@ class CustomRectangle(HasTags, MarkupRect):
         return self._rect.topRight()
 
     def limit(self):
+        self.prepareGeometryChange()
         self._rect = self._rect.intersected(self._scene_rect).normalized()
         self.setVisible(not self._rect.isEmpty())
         self.update()
@@ -79,9 +80,11 @@ class MoveHorizontally:
                 rc.moveRight(self._schema._size[0])
             elif not left_attached and not right_attached:
                 rc.moveRight(rc.right() + diff)
+            item.prepareGeometryChange()
             item._rect = rc
         for item in self._rect_items:
             item.limit()
+        view.scene().mark_changed()
         return True
 
     def mouse_press(self, event: QtGui.QMouseEvent, view: ImageView) -> bool:
@@ -222,6 +225,9 @@ class QuarrySchema(OneSourceOneDestination, MarkupSchema):
 
         iw.add_default_actions()
         self._next_action = markup_window._next_action
+        self._journal = SnapshotJournal(
+            iw.scene().markup_changed, lambda: [self._get_markup()]
+        )
 
     def _toggle_tag_visibility(self, state):
         self.tags_hidden = state
@@ -268,11 +274,14 @@ class QuarrySchema(OneSourceOneDestination, MarkupSchema):
         file_info = QtCore.QFileInfo(src_data_path)
         src_dir = file_info.dir()
         try:
-            with open(src_dir.absoluteFilePath("tags.txt"), "r") as f:
-                self._user_tags = set(
-                    filter(None, (line.strip() for line in f))
-                )
+            tags = sidecars.get(
+                src_dir.absoluteFilePath("tags.txt"), read_lines
+            )
         except IOError:
+            tags = None
+        if tags is not None:
+            self._user_tags = set(tags)
+        else:
             self._user_tags: set[str] = {
                 "background",
                 "cab",
@@ -282,17 +291,20 @@ class QuarrySchema(OneSourceOneDestination, MarkupSchema):
                 "back_edge",
             }
 
-        pixmap = load_pixmap(src_data_path)
-        self._size = (pixmap.width(), pixmap.height())
-        self._image_widget.set_pixmap(pixmap)
+        size = self._image_widget.set_image(src_data_path)
+        self._size = (size.width(), size.height())
 
         self._dst_markup_path = dst_markup_path
+        self._journal.close()
         previous_markup = getattr(self, "_original_markup", None)
         self._original_markup = {}  # for cases when 'load_json' raises
         markup = self._original_markup = load_json(
             dst_markup_path, self._image_widget
         )
-        if (
+        recovered = recover(dst_markup_path, markup)
+        if recovered is not None:
+            markup = recovered
+        elif (
             "objects" not in markup
             and previous_markup
             and "objects" in previous_markup
@@ -310,6 +322,13 @@ class QuarrySchema(OneSourceOneDestination, MarkupSchema):
                 print(f"invalid object type = `{the_type}`")
             item = cls(self, *args, tags=obj.get("tags", ()))
             scene.addItem(item)
+        size = markup.get("size")
+        if markup is not self._original_markup or size != list(self._size):
+            scene.mark_changed()  # new, copied or recovered markup
+        self._journal.open(dst_markup_path)
+        if recovered is not None:
+            print(f"recovered unsaved changes of `{dst_markup_path}`")
+            self._journal.flush()  # the old journal is overwritten
 
         self._image_widget.setFocus()
         self._select_action.trigger()
@@ -324,7 +343,7 @@ class QuarrySchema(OneSourceOneDestination, MarkupSchema):
         self._select_action.trigger()
 
     def markup_has_changes(self) -> bool:
-        return not dicts_are_equal(self._get_markup(), self._original_markup)
+        return self._image_widget.scene().has_changes()
 
     def get_rect_items(self) -> list[CustomRectangle]:
         return [
@@ -345,13 +364,19 @@ class QuarrySchema(OneSourceOneDestination, MarkupSchema):
         return markup
 
     def save_markup(self, force=True):
-        markup = self._get_markup()
-        if dicts_are_equal(markup, self._original_markup) and not force:
+        scene = self._image_widget.scene()
+        if not force and not scene.has_changes():
             print(f"not changed `{self._dst_markup_path}`")
             return
+        markup = self._get_markup()
+        (written,) = self._journal.saved()
         print("saving to", self._dst_markup_path)
-        dump_json(self._dst_markup_path, markup)
+        dump_json(self._dst_markup_path, markup, written)
         self._original_markup = markup
+        scene.mark_saved()
+
+    def close_markup(self) -> None:
+        self._journal.close()
 
     def done_moving(self):
         print("done_moving")
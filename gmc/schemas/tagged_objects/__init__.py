@@ -1,13 +1,16 @@
 from __future__ import annotations
-from pathlib import Path
 from PyQt5 import QtCore, QtGui, QtWidgets
-from collections import defaultdict
 from math import hypot
-from typing import Any, ClassVar
+from time import perf_counter
+from typing import Any, ClassVar, Iterator, TYPE_CHECKING
 from copy import deepcopy
 
 from .. import MarkupSchema
-from ...markup_objects.polygon import EditableMarkupPolygon, MarkupObjectMeta
+from ...markup_objects.polygon import (
+    EditableMarkupPolygon,
+    MarkupObjectMeta,
+    polygon_from_array,
+)
 from ...markup_objects.quadrangle import Quadrangle
 from ...markup_objects.line import MarkupLine
 from ...markup_objects.point import MarkupPoint
@@ -15,16 +18,21 @@ from ...markup_objects.rect import MarkupRect
 from ...markup_objects.tags import HasTags, TagsDialog, UndoTagModification
 from ...views.image_widget import ImageWidget
 from ...utils.json import load as load_json, dump as dump_json
-from ...utils.dicts import dicts_are_equal
-from ...utils.image import load_pixmap
+from ...utils.journal import MarkupJournal, recover
+from ...utils.markup_index import MarkupIndex, unique_tag
 from ...utils.read_properties import read_properties, prop_schema_for_tags
 from ...utils import get_icon, separator, new_action, tr, clipboard
 from ...file_widgets.one_source_one_destination import OneSourceOneDestination
 from ...application import GMCArguments
 from ...settings import settings
+from .paste_into_files import PasteIntoFiles, PasteSummary
+
+if TYPE_CHECKING:
+    from ...utils.read_properties import GMCProperties, GMCProps
 
 Qt = QtCore.Qt
 MB = QtWidgets.QMessageBox
+LOAD_TIME_SLICE = 0.02  # seconds of adding objects between events
 
 
 # ToDo: find better technique
@@ -79,10 +87,7 @@ def from_json_polygon(
         case {"data": points, **extra}:
             if not points:
                 raise ValueError(f"{cls.__name__} has 0 points")
-            polygon = QtGui.QPolygonF(
-                [QtCore.QPointF(x, y) for x, y in points]
-            )
-            return cls(schema, polygon, **extra)
+            return cls(schema, polygon_from_array(points), **extra)
     raise ValueError(f"incorrect {cls.__name__} `{data}`")
 
 
@@ -111,6 +116,24 @@ def _select_on_created(self: Any) -> None:
     self._schema.on_object_created(self)
 
 
+def _common_properties(
+    items: list[HasTags],
+) -> tuple[set[str], dict[str, Any]]:
+    """:returns: tags and property values that all `items` share"""
+    tags = set(items[0].get_tags())
+    common = dict(getattr(items[0], "properties", ()))
+    missing = object()
+    for item in items[1:]:
+        if not tags and not common:
+            break
+        tags.intersection_update(item.get_tags())
+        properties = getattr(item, "properties", {})
+        for key, value in list(common.items()):
+            if properties.get(key, missing) != value:
+                del common[key]
+    return tags, common
+
+
 @with_brush
 class CustomQuadrangle(HasTags, Quadrangle):
     from_json = classmethod(from_json_polygon)
@@ -173,6 +196,18 @@ class CustomLine(CustomSegment):
         )
         super().paint(painter, option, widget)
 
+    def boundingRect(self) -> QtCore.QRectF:
+        rc = super().boundingRect()
+        if len(self._polygon) != 2:
+            return rc
+        p0, p1 = self._polygon
+        d = p0 - p1
+        length = hypot(d.x(), d.y())
+        if not length:
+            return rc
+        shift = d * (3e3 / length)
+        return rc.united(QtCore.QRectF(p0 + shift, p1 - shift).normalized())
+
 
 @with_brush
 class CustomPoint(HasTags, MarkupPoint):
@@ -276,6 +311,7 @@ class TaggedObjects(OneSourceOneDestination, MarkupSchema):
         cls.__name__: name for name, cls in _mapping.items()
     }
 
+    _paste_jobs: ClassVar[set[PasteIntoFiles]] = set()  # running
     _current_root_properties: dict[str, Any] | None
     _current_properties: dict[str, Any] | None
     last_used_default_action: ClassVar[str] = settings.value(
@@ -302,6 +338,24 @@ class TaggedObjects(OneSourceOneDestination, MarkupSchema):
         layout.addWidget(splitter)
         splitter.setSizes([1000, 300])
 
+        self._journal: MarkupJournal | None = None
+        self._journal_generation = 0  # of item keys, changes on every save
+        self._next_journal_key = 0
+        self._journal_items: dict[int, QtWidgets.QGraphicsItem] = {}
+        self._journal_root = self._journal_full = False
+        self._journal_timer = QtCore.QTimer(
+            singleShot=True, interval=250, timeout=self._flush_journal
+        )
+        iw.scene().markup_changed.connect(self._on_markup_changed)
+        self._loading: Iterator[tuple[int, Any]] | None = None
+        self._load_timer = QtCore.QTimer(
+            singleShot=True, interval=0, timeout=self._load_objects
+        )
+        self._properties: GMCProperties = {}
+        # resolved `prop_schema_for_tags`, the same list for the same tags
+        # lets the properties view keep its tree
+        self._prop_schemas: dict[frozenset[str], list[GMCProps]] = {}
+
         self._select_action = iw.add_select_action()
         self._add_quadrangle_action = iw.add_markup_action(
             tr("Add Quadrangle"),
@@ -385,7 +439,6 @@ class TaggedObjects(OneSourceOneDestination, MarkupSchema):
 
         # so that user can go to the next file
         self._next_action = markup_window._next_action
-        self._unique_cache: dict[str, tuple[QtCore.QDateTime, set[str]]] = {}
 
     @classmethod
     def create_data_widget(
@@ -488,7 +541,9 @@ class TaggedObjects(OneSourceOneDestination, MarkupSchema):
                 icon=get_icon("prev"),
                 clicked=self._on_unique_tag,
                 shortcut="Ctrl+U",
-                toolTip=tr("Generate unique tag per directory"),
+                toolTip=tr(
+                    "Generate tag that is unique in the whole destination tree"
+                ),
             )
         )
         toolbar.addSeparator()
@@ -574,18 +629,41 @@ class TaggedObjects(OneSourceOneDestination, MarkupSchema):
             != MB.StandardButton.Yes
         ):
             return
-        for image_path, markup_path in zip(image_paths, markup_paths):
-            if Path(markup_path).exists():
-                data = load_json(markup_path, cls._source_widget)
+        job = PasteIntoFiles(image_paths, markup_paths, new_objects)
+        dialog = QtWidgets.QProgressDialog(
+            tr("Pasting objects..."),
+            tr("Cancel"),
+            0,
+            len(markup_paths),
+            cls._source_widget,
+            windowTitle=tr("Paste"),
+            minimumDuration=500,
+        )
+        dialog.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+        dialog.canceled.connect(job.cancel)
+        job.progress.connect(dialog.setValue)
+
+        def on_finished(summary: PasteSummary) -> None:
+            cls._paste_jobs.discard(job)
+            dialog.close()
+            message = tr("{} objects added to {} files").format(
+                summary.objects_added, summary.files_changed
+            )
+            if summary.cancelled:
+                message += "\n" + tr("Cancelled")
+            if summary.errors:
+                message += "\n\n" + "\n".join(summary.errors[:10])
+                if len(summary.errors) > 10:
+                    message += "\n" + tr("and {} more errors").format(
+                        len(summary.errors) - 10
+                    )
+                MB.warning(cls._source_widget, tr("Paste"), message)
             else:
-                size = load_pixmap(image_path).size()
-                data = {"objects": [], "size": [size.width(), size.height()]}
-            existing_objects: list[Any] = data["objects"]
-            filtered_new_objects = [
-                obj for obj in new_objects if obj not in existing_objects
-            ]
-            existing_objects.extend(filtered_new_objects)
-            dump_json(markup_path, data)
+                MB.information(cls._source_widget, tr("Paste"), message)
+
+        job.finished.connect(on_finished)
+        cls._paste_jobs.add(job)
+        job.start()
 
     def _on_select_default_action(self, action):
         getattr(self, str(action.data())).trigger()
@@ -607,56 +685,47 @@ class TaggedObjects(OneSourceOneDestination, MarkupSchema):
             self._trigger_default_action()
 
     def _on_unique_tag(self):
-        from json import load
-
-        qdir = QtCore.QFileInfo(self._dst_markup_path).dir()
-        dir_filter = qdir.Files | qdir.NoDotAndDotDot
-        all_sets: list[set[str]] = []
-        cache = self._unique_cache
-        for fi in qdir.entryInfoList(dir_filter, qdir.Name):
-            if fi.suffix() != "json":
-                continue
-            last_modified = fi.lastModified()
-            absolute_path = fi.absoluteFilePath()
-            if absolute_path in cache:
-                dt, tags = cache[absolute_path]
-                if dt == last_modified:
-                    all_sets.append(tags)
-                    continue
-            try:
-                with open(absolute_path, "r") as f:
-                    data = load(f)
-            except Exception:
-                print("invalid json", absolute_path, "(ignored)")
-                continue
-            tags: set[str] = set()
-            for obj in data.get("objects", ()):
-                tags |= set(obj.get("tags", ()))
-            all_sets.append(tags)
-            cache[absolute_path] = (last_modified, tags)
-
-        all_tags: set[str] = set()
+        """Generates a tag, not used in the whole destination tree"""
+        directory = QtCore.QFileInfo(self._dst_markup_path).absolutePath()
+        index = MarkupIndex.covering(self._dst_markup_path)
+        if index is None:
+            index = MarkupIndex.open(directory)
+        if index.is_refreshing():
+            # tags of directories that are not scanned yet are unknown
+            if not self._wait_for_index(index):
+                return
+        else:
+            index.refresh_in_background()  # for changes by other programs
+
+        all_tags = index.used_tags()
         for item in self._image_widget.scene().items():
             if isinstance(item, HasTags):
                 all_tags |= item.get_tags()
 
-        for tags in all_sets:
-            all_tags |= tags
-
-        for tag in self._alphabet_gen():
-            if tag not in all_tags:
-                break
-        self._default_tags_edit.setText(tag)
-
-    @staticmethod
-    def _alphabet_gen():
-        from string import digits, ascii_uppercase
-        from itertools import product
-
-        chars = ascii_uppercase + digits
-        for n in range(1, 5):
-            for comb in product(chars, repeat=n):
-                yield "".join(comb)
+        self._default_tags_edit.setText(unique_tag(all_tags))
+
+    def _wait_for_index(self, index: MarkupIndex) -> bool:
+        """:returns: `False` when the user cancelled waiting"""
+        dialog = QtWidgets.QProgressDialog(
+            tr("Scanning markup of the destination tree..."),
+            tr("Cancel"),
+            0,
+            0,
+            self._image_widget,
+            windowTitle=tr("Unique Tag"),
+            windowModality=Qt.WindowModality.WindowModal,
+            minimumDuration=500,
+        )
+        try:
+            while index.is_refreshing():
+                if dialog.wasCanceled():
+                    return False
+                dialog.setValue(0)  # shows the dialog after the duration
+                QtWidgets.QApplication.processEvents()
+                index.wait(0.05)
+            return True
+        finally:
+            dialog.close()
 
     def _trigger_tag(self, tag: str, checked: int) -> None:
         items = self._get_selected_items()
@@ -731,13 +800,18 @@ class TaggedObjects(OneSourceOneDestination, MarkupSchema):
                 properties = items[0].properties
             else:
                 properties = items[0].properties = {}
-            tags = set[str].intersection(*[item.get_tags() for item in items])
-            prop_schema = prop_schema_for_tags(
-                self._properties.get("objects", {}), tags
-            )
+            prop_schema = self._prop_schema(items[0].get_tags())
             self._properties_view.set_schema(prop_schema)
             self._properties_view.set_properties(properties)
             self._current_properties = properties
+        elif len(items) > 1 and "objects" in self._properties:
+            # read only view of what the items have in common
+            tags, properties = _common_properties(items)
+            self._properties_view.set_schema(self._prop_schema(tags))
+            self._properties_view.set_properties(properties)
+            self._properties_view.show()
+            self._properties_view.setEnabled(False)
+            return
         else:
             self._properties_view.set_schema([])
             self._properties_view.setEnabled(False)
@@ -751,6 +825,15 @@ class TaggedObjects(OneSourceOneDestination, MarkupSchema):
             self._properties_view.hide()
         self._properties_view.setEnabled(True)
 
+    def _prop_schema(self, tags: set[str]) -> list[GMCProps]:
+        key = frozenset(tags)
+        schema = self._prop_schemas.get(key)
+        if schema is None:
+            schema = self._prop_schemas[key] = prop_schema_for_tags(
+                self._properties.get("objects", []), tags
+            )
+        return schema
+
     def _property_changed(self, key_value: tuple[str, Any]):
         if self._current_properties is not None:
             key, value = key_value
@@ -758,19 +841,29 @@ class TaggedObjects(OneSourceOneDestination, MarkupSchema):
                 self._current_properties.pop(key)
             else:
                 self._current_properties[key] = value
+            if self._current_properties is self._current_root_properties:
+                self._image_widget.scene().mark_changed([])
+            else:
+                items = self._get_selected_items()
+                self._image_widget.scene().mark_changed(list(items))
 
     def open_markup(self, src_data_path: str, dst_markup_path: str) -> None:
-        self._properties = read_properties(
+        self.close_markup()
+        properties = read_properties(
             (src_data_path, dst_markup_path), self._image_widget
         )
+        if properties.get("objects") != self._properties.get("objects"):
+            self._prop_schemas.clear()
+        self._properties = properties
         self._user_tags = set(self._properties.get("tags", ()))
-        pixmap = load_pixmap(src_data_path)
-        self._size = (pixmap.width(), pixmap.height())
-        self._image_widget.set_pixmap(pixmap)
+        size = self._image_widget.set_image(src_data_path)
+        self._size = (size.width(), size.height())
 
         self._dst_markup_path = dst_markup_path
         self._original_markup = {}  # for cases when 'load_json' raises
-        self._original_markup = load_json(dst_markup_path, self._image_widget)
+        markup = load_json(dst_markup_path, self._image_widget)
+        recovered = recover(dst_markup_path, markup)
+        self._original_markup = markup if recovered is None else recovered
         if "properties" in self._original_markup:
             self._current_root_properties = deepcopy(
                 self._original_markup["properties"]
@@ -778,43 +871,104 @@ class TaggedObjects(OneSourceOneDestination, MarkupSchema):
         else:
             self._current_root_properties = None
         scene = self._image_widget.scene()
-        item = None
-        warnings: list[str] = []
-
-        for obj in self._original_markup.get("objects", ()):
-            match obj:
-                case {"type": the_type, **rest}:
-                    pass
-                case _:
-                    warnings.append(f"invalid type for {obj!r}")
-                    continue
-            if the_type not in self._mapping:
-                warnings.append(f"ignoring unknown object type `{the_type}`")
-                continue
-            cls = self._mapping[the_type]
-            try:
-                item = cls.from_json(self, rest)
-            except ValueError as e:
-                warnings.append(f"ignoring broken `{the_type}`: {e}")
-            else:
-                scene.addItem(item)
 
-        if warnings:
-            MB.warning(self._source_widget, tr("Warning"), "\n".join(warnings))
+        self._journal_generation += 1
+        objects = self._original_markup.get("objects", ())
+        self._next_journal_key = len(objects)
+        # objects are added in time slices, so the image is shown and
+        # can be navigated right away
+        self._loading = enumerate(objects)
+        self._loading_warnings = []
+        self._last_loaded_item = None
+        scene.suspend_index()
+
+        if (
+            recovered is not None
+            or "objects" not in markup
+            or markup.get("size") != list(self._size)
+        ):
+            scene.mark_changed()  # new or incomplete markup is to be saved
+        self._journal = MarkupJournal(dst_markup_path)
 
         self._trigger_default_action()
         self._image_widget.setFocus()
 
         self._update_properties([])
-
+        self._load_objects()
+
+        if recovered is not None:
+            print(f"recovered unsaved changes of `{dst_markup_path}`")
+            self._journal_full = True
+            self._flush_journal()  # the old journal is overwritten
+
+    def _load_objects(self, everything: bool = False) -> None:
+        """
+        Adds objects of the opened markup to the scene for
+        `LOAD_TIME_SLICE` seconds, the rest is scheduled
+        """
+        if self._loading is None:
+            return
+        self._load_timer.stop()
+        scene = self._image_widget.scene()
+        viewport = self._image_widget.view().viewport()
+        viewport.setUpdatesEnabled(False)  # single repaint for the slice
+        deadline = None if everything else perf_counter() + LOAD_TIME_SLICE
+        generation = self._journal_generation
+        warnings = self._loading_warnings
+        try:
+            for key, obj in self._loading:
+                match obj:
+                    case {"type": the_type, **rest}:
+                        pass
+                    case _:
+                        warnings.append(f"invalid type for {obj!r}")
+                        continue
+                if the_type not in self._mapping:
+                    warnings.append(
+                        f"ignoring unknown object type `{the_type}`"
+                    )
+                    continue
+                cls = self._mapping[the_type]
+                try:
+                    item = cls.from_json(self, rest)
+                except ValueError as e:
+                    warnings.append(f"ignoring broken `{the_type}`: {e}")
+                else:
+                    item._journal_key = (generation, key)
+                    scene.addItem(item)
+                    self._last_loaded_item = item
+                if deadline is not None and perf_counter() >= deadline:
+                    break
+            else:
+                self._loading = None
+        finally:
+            viewport.setUpdatesEnabled(True)
+        if self._loading is None:
+            self._on_objects_loaded()
+        else:
+            self._load_timer.start()
+
+    def _finish_loading(self) -> None:
+        """Call before using all objects of the scene"""
+        self._load_objects(everything=True)
+
+    def _on_objects_loaded(self) -> None:
+        self._image_widget.scene().resume_index()
+        if self._loading_warnings:
+            MB.warning(
+                self._source_widget,
+                tr("Warning"),
+                "\n".join(self._loading_warnings),
+            )
         if self._visibility_action.isChecked():
             self._toggle_visibility(True)
-        elif item is not None:
-            item.setSelected(True)
+        elif self._last_loaded_item is not None:
+            self._last_loaded_item.setSelected(True)
             self._on_selection_changed()
+        self._last_loaded_item = None
 
     def markup_has_changes(self) -> bool:
-        return not dicts_are_equal(self._get_markup(), self._original_markup)
+        return self._image_widget.scene().has_changes()
 
     def save_markup(self, force: bool = True) -> None:
         view = self._image_widget.view()
@@ -829,41 +983,141 @@ class TaggedObjects(OneSourceOneDestination, MarkupSchema):
                 Qt.NoModifier,
             )
             view._current_mouse_release(r_event, view)
-        markup = self._get_markup()
-        if dicts_are_equal(markup, self._original_markup) and not force:
+        scene = self._image_widget.scene()
+        if not force and not scene.has_changes():
             print(f"not changed `{self._dst_markup_path}`")
             return
+        self._journal_generation += 1
+        markup = self._get_markup()
         print(f"saving to {self._dst_markup_path}")
-        dump_json(self._dst_markup_path, markup)
+        on_written = None
+        if self._journal is not None:
+            self._reset_journal_changes()
+            on_written = self._journal.saved()
+        dump_json(self._dst_markup_path, markup, on_written)
         self._original_markup = markup
-
-    def _get_markup(self) -> dict[str, Any]:
-        markup = defaultdict(list, self._original_markup)
-        markup["objects"] = []
+        scene.mark_saved()
+
+    def close_markup(self) -> None:
+        if self._loading is not None:
+            self._loading = None
+            self._load_timer.stop()
+            self._image_widget.scene().resume_index()
+        if self._journal is not None:
+            self._reset_journal_changes()
+            self._journal.close()
+            self._journal = None
+
+    def _get_markup_root(self) -> dict[str, Any]:
+        """:returns: markup without objects"""
+        markup = {
+            key: value
+            for key, value in self._original_markup.items()
+            if key != "objects"
+        }
         markup["size"] = self._size
-        for item in self._image_widget.scene().items():
-            the_type = self._cls_to_type.get(type(item).__name__)
-            if the_type is None:
-                continue
-            data = item.data()
-            assert "type" not in data
-            data["type"] = the_type
-            markup["objects"].append(data)
-        properties = self._properties_view.get_properties()
+        current = self._current_properties
+        if current is not None and current is self._current_root_properties:
+            # including properties added in the view
+            properties = self._properties_view.get_properties()
+        else:  # the view shows objects or nothing
+            properties = self._current_root_properties
         if properties:
             markup["properties"] = properties
         elif "properties" in markup:
             del markup["properties"]  # so we don't store old options
         return markup
 
+    def _object_data(self, item: QtWidgets.QGraphicsItem) -> dict[str, Any]:
+        data = item.data()
+        assert "type" not in data
+        data["type"] = self._cls_to_type[type(item).__name__]
+        return data
+
+    def _get_markup(self) -> dict[str, Any]:
+        """Also makes journal keys of items their indices in markup"""
+        self._finish_loading()
+        markup = self._get_markup_root()
+        objects: list[dict[str, Any]] = []
+        generation = self._journal_generation
+        for item in self._image_widget.scene().items():
+            if type(item).__name__ in self._cls_to_type:
+                item._journal_key = (generation, len(objects))
+                objects.append(self._object_data(item))
+        markup["objects"] = objects
+        self._next_journal_key = len(objects)
+        return markup
+
+    def _journal_key(self, item: QtWidgets.QGraphicsItem) -> str:
+        generation, key = getattr(item, "_journal_key", (None, None))
+        if generation != self._journal_generation:
+            key = self._next_journal_key
+            self._next_journal_key += 1
+            item._journal_key = (self._journal_generation, key)
+        return str(key)
+
+    def _on_markup_changed(
+        self, items: list[QtWidgets.QGraphicsItem] | None
+    ) -> None:
+        if self._journal is None:
+            return  # markup is being opened
+        if items is None:
+            self._journal_full = True
+        elif not items:
+            self._journal_root = True
+        for item in items or ():
+            if type(item).__name__ in self._cls_to_type:
+                self._journal_items[id(item)] = item
+        if not self._journal_timer.isActive():
+            self._journal_timer.start()  # fast editing makes one record
+
+    def _reset_journal_changes(self) -> None:
+        self._journal_timer.stop()
+        self._journal_items.clear()
+        self._journal_root = self._journal_full = False
+
+    def _flush_journal(self) -> None:
+        if self._journal_full:
+            self._finish_loading()
+        scene = self._image_widget.scene()
+        record: dict[str, Any] = {}
+        if self._journal_root or self._journal_full:
+            record["root"] = self._get_markup_root()
+        if self._journal_full:
+            record["objects"] = {
+                self._journal_key(item): self._object_data(item)
+                for item in scene.items()
+                if type(item).__name__ in self._cls_to_type
+            }
+        else:
+            changed: dict[str, Any] = {}
+            deleted: list[str] = []
+            for item in self._journal_items.values():
+                if item.scene() is scene:
+                    changed[self._journal_key(item)] = self._object_data(item)
+                else:
+                    deleted.append(self._journal_key(item))
+            if changed:
+                record["set"] = changed
+            if deleted:
+                record["del"] = deleted
+        self._reset_journal_changes()
+        if record and self._journal is not None:
+            self._journal.append(record)
+
     def _on_paste(self, objects) -> None:
         scene = self._image_widget.scene()
-        for obj in objects:
-            classname = obj.pop("_class")
-            if classname in self._cls_to_type:
-                cls = self._mapping[self._cls_to_type[classname]]
-                item = cls.from_json(self, obj)
-                scene.addItem(item)
+        pasted: list[QtWidgets.QGraphicsItem] = []
+        with scene.bulk_edit(len(objects)):
+            for obj in objects:
+                classname = obj.pop("_class")
+                if classname in self._cls_to_type:
+                    cls = self._mapping[self._cls_to_type[classname]]
+                    item = cls.from_json(self, obj)
+                    scene.addItem(item)
+                    pasted.append(item)
+        if pasted:
+            scene.mark_changed(pasted)
 
     @classmethod
     def save_settings(cls, settings: QtCore.QSettings) -> None:
@@ -0,0 +1,82 @@
+"""
+"Paste into files": adding copied objects to the markup of many files
+in background, without freezing the user interface.
+"""
+
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+from os import cpu_count
+from threading import Event, Thread
+from typing import Any, Sequence
+from PyQt5 import QtCore
+from ...utils.paste import paste_into
+
+
+class PasteSummary:
+    def __init__(self) -> None:
+        self.files_changed = 0
+        self.objects_added = 0
+        self.errors: list[str] = []
+        self.cancelled = False
+
+
+class PasteIntoFiles(QtCore.QObject):
+    """
+    Reads and writes markup files in a thread pool. Every file is
+    replaced atomically, pending saves of the same file are not overtaken.
+    """
+
+    progress = QtCore.pyqtSignal(int)  # number of processed files
+    finished = QtCore.pyqtSignal(object)  # PasteSummary
+
+    def __init__(
+        self,
+        image_paths: Sequence[str],
+        markup_paths: Sequence[str],
+        objects: list[dict[str, Any]],
+    ) -> None:
+        super().__init__()
+        self._paths = list(zip(image_paths, markup_paths))
+        self._objects = objects
+        self._cancelled = Event()
+        self._thread: Thread | None = None
+
+    def start(self) -> None:
+        self._thread = Thread(
+            target=self._run, name="gmc-paste-into-files", daemon=True
+        )
+        self._thread.start()
+
+    def cancel(self) -> None:
+        """Files that are already processed stay changed"""
+        self._cancelled.set()
+
+    def wait(self) -> None:
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        summary = PasteSummary()
+        workers = min(16, len(self._paths) or 1, (cpu_count() or 1) * 2)
+        with ThreadPoolExecutor(workers, "gmc-paste") as pool:
+            results = pool.map(self._paste_into, self._paths)
+            for done, (added, error) in enumerate(results, 1):
+                if error is not None:
+                    summary.errors.append(error)
+                elif added:
+                    summary.files_changed += 1
+                    summary.objects_added += added
+                self._emit(self.progress, done)
+        summary.cancelled = self._cancelled.is_set()
+        self._emit(self.finished, summary)
+
+    def _emit(self, signal: Any, value: Any) -> None:
+        try:
+            signal.emit(value)
+        except RuntimeError:
+            pass  # application is finishing
+
+    def _paste_into(self, paths: tuple[str, str]) -> tuple[int, str | None]:
+        if self._cancelled.is_set():
+            return 0, None
+        return paste_into(*paths, self._objects)
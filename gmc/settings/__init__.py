@@ -29,11 +29,12 @@ class Settings:
     click_ms: int = 250
     line_w: int = 0
     zoom: int = 0  # default zoom%, 0 is auto
+    image_cache_mb: int = 512  # memory budget of decoded images cache
 
     def __init__(self) -> None:
         self._callbacks: set[Callable[[], None]] = set()
         # all values that are set here should also be set in `sync`
-        assert len(self.__annotations__) == 11, f"Programmer error"
+        assert len(self.__annotations__) == 12, f"Programmer error"
         value = self.value
         for attr in self.__annotations__:
             setattr(self, attr, value(attr, default=getattr(self, attr)))
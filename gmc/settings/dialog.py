@@ -88,6 +88,20 @@ def add_default(
     form.addRow(label_widget, layout)
 
 
+def _image_cache_stats_text() -> str:
+    from ..utils.image import image_cache
+
+    stats = image_cache.stats()
+    return tr(
+        "Image cache: {hits} hits, {misses} misses, {evictions} evictions, "
+        "{entries} images, {used} of {budget} MB used"
+    ).format(
+        used=stats["used_bytes"] // (1024 * 1024),
+        budget=stats["budget_bytes"] // (1024 * 1024),
+        **stats,
+    )
+
+
 def create_setting_dialog(parent: QtWidgets.QWidget) -> None:
     dialog = QtWidgets.QDialog(parent, windowTitle=f"GMC " + tr("Settings"))  # type: ignore
     form = QtWidgets.QFormLayout()
@@ -114,6 +128,12 @@ def create_setting_dialog(parent: QtWidgets.QWidget) -> None:
     line_w = QtWidgets.QSpinBox(
         minimum=0, maximum=100, value=settings.line_w, suffix="px"
     )
+    image_cache_mb = QtWidgets.QSpinBox(
+        minimum=0,
+        maximum=65536,
+        value=settings.image_cache_mb,
+        suffix="MB",
+    )
     label_font = tr("Label &font")
     font_label = FontWidget(label_font.replace("&", ""), settings.font_label)
 
@@ -140,6 +160,8 @@ def create_setting_dialog(parent: QtWidgets.QWidget) -> None:
         )
     )
     add_default(form, tr("Click Reaction &time"), click_ms, "click_ms")
+    add_default(form, tr("Image &Cache"), image_cache_mb, "image_cache_mb")
+    form.addWidget(QtWidgets.QLabel(_image_cache_stats_text(), wordWrap=True))
 
     Box = QtWidgets.QDialogButtonBox
     button_box = Box(Box.Ok | Box.Cancel, Qt.Orientation.Horizontal, dialog)
@@ -162,5 +184,6 @@ def create_setting_dialog(parent: QtWidgets.QWidget) -> None:
         settings.font_label = font_label.value()
         settings.click_ms = click_ms.value()
         settings.zoom = zoom.value()
+        settings.image_cache_mb = image_cache_mb.value()
         settings.sync()
         settings.update()
@@ -1,10 +1,22 @@
 from __future__ import annotations
-from typing import TYPE_CHECKING
-from PyQt5.QtGui import QPixmap, QImage, QColor
+from os import cpu_count
+from typing import Any, Sequence, TYPE_CHECKING
+from collections import OrderedDict
+from functools import lru_cache
+from PyQt5.QtGui import (
+    QPixmap,
+    QImage,
+    QColor,
+    QImageIOHandler,
+    QImageReader,
+)
+from PyQt5.QtCore import QFileInfo, QSize
 from PyQt5.QtWidgets import QMessageBox as MB
 from os.path import getmtime
+from ..settings import settings
 
 if TYPE_CHECKING:
+    import numpy as np
     import numpy.typing as npt
     from PIL.Image import Image
 
@@ -15,25 +27,408 @@ CONVERT: dict[int, QImage.Format] = {
     1: QImage.Format.Format_Indexed8,
 }
 
-one_image_cache: tuple[str | None, float | None, QPixmap | None] = (
-    None,
-    None,
-    None,
-)
+
+# images of this area and above are shown tiled and are never cached whole
+HUGE_IMAGE_PIXELS = 8192 * 8192
+
+
+def image_size(path: str) -> QSize:
+    """
+    Reads image size from the file header, pixels are not decoded.
+
+    :returns: invalid size when the size can't be determined
+    """
+    if path.lower().endswith(".npy"):
+        try:
+            import numpy as np
+
+            shape = np.load(path, mmap_mode="r", allow_pickle=False).shape
+        except (ImportError, OSError, ValueError):
+            return QSize()
+        return QSize(shape[1], shape[0]) if len(shape) >= 2 else QSize()
+    size = QImageReader(path).size()
+    if size.isValid():
+        return size
+    try:
+        from PIL import Image
+    except ImportError:
+        return QSize()
+    try:
+        with Image.open(path) as pil_image:  # lazy, reads the header only
+            return QSize(*pil_image.size)
+    except (OSError, Image.DecompressionBombError):
+        return QSize()
+
+
+def image_sizes(paths: Sequence[str]) -> list[QSize]:
+    """`image_size` of many files, read in parallel"""
+    if len(paths) < 2:
+        return [image_size(path) for path in paths]
+    from concurrent.futures import ThreadPoolExecutor
+
+    # header reading is I/O bound, so use more threads than cores
+    workers = min(32, len(paths), (cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(image_size, paths, chunksize=16))
+
+
+def huge_image_size(path: str) -> QSize | None:
+    """:returns: image size from the file header when the image is huge"""
+    size = image_size(path)
+    if size.isValid() and size.width() * size.height() >= HUGE_IMAGE_PIXELS:
+        return size
+    return None
+
+
+# images of this area and above are shown downscaled while being decoded
+PREVIEW_MIN_PIXELS = 4096 * 4096
+PREVIEW_MAX_PIXELS = 4 * 1024 * 1024
+
+
+def read_preview(path: str) -> tuple[QImage, QSize] | None:
+    """
+    Fast downscaled decode for big images in formats that can scale while
+    decoding (like jpeg with its DCT scaling).
+
+    :returns: preview image and full image size
+    """
+    reader = QImageReader(path)
+    size = reader.size()
+    area = size.width() * size.height()
+    if (
+        not size.isValid()
+        or area < PREVIEW_MIN_PIXELS
+        or not reader.supportsOption(QImageIOHandler.ImageOption.ScaledSize)
+    ):
+        return None
+    factor = 2
+    while factor < 8 and area > PREVIEW_MAX_PIXELS * factor * factor:
+        factor *= 2
+    reader.setScaledSize(
+        QSize(-(-size.width() // factor), -(-size.height() // factor))
+    )
+    image = reader.read()
+    if image.isNull():
+        return None
+    return image, size
+
+
+_GRAY_COLOR_TABLE = [QColor(c, c, c).rgba() for c in range(256)]
+
+
+class ImageCache:
+    """
+    Least recently used cache of decoded images, limited by memory budget.
+
+    Keys are absolute paths, so all tabs and schemas share the same decoded
+    pixmap. An entry is valid only while file modification time is the same.
+    The most recently added entry is kept even when it exceeds the budget,
+    so reopening the current image is always fast.
+    """
+
+    def __init__(self, budget_mb: int) -> None:
+        self._entries: OrderedDict[str, tuple[float | None, QPixmap, int]] = (
+            OrderedDict()
+        )
+        self._budget = budget_mb * 1024 * 1024
+        self._used = 0
+        # counters for tuning `settings.image_cache_mb`
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(path: str) -> str:
+        return QFileInfo(path).absoluteFilePath()
+
+    def get(self, path: str, mtime: float | None) -> QPixmap | None:
+        key = self.key(path)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] != mtime:
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, path: str, mtime: float | None, pixmap: QPixmap) -> None:
+        key = self.key(path)
+        if key in self._entries:
+            self._remove(key)
+        nbytes = pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        self._entries[key] = (mtime, pixmap, nbytes)
+        self._used += nbytes
+        self._shrink()
+
+    def set_budget_mb(self, budget_mb: int) -> None:
+        self._budget = budget_mb * 1024 * 1024
+        self._shrink()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._used = 0
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "used_bytes": self._used,
+            "budget_bytes": self._budget,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, path: str) -> bool:
+        "checks presence without mtime validation and counters update"
+        return self.key(path) in self._entries
+
+    def _remove(self, key: str) -> None:
+        self._used -= self._entries.pop(key)[2]
+
+    def _shrink(self) -> None:
+        while self._used > self._budget and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+
+image_cache = ImageCache(settings.image_cache_mb)
+
+
+@settings.register
+def _on_settings_updated() -> None:
+    image_cache.set_budget_mb(settings.image_cache_mb)
+
+
+def _apply_window(
+    values: npt.NDArray[np.float32], lo: float, hi: float, gamma: float
+) -> npt.NDArray[np.float32]:
+    "in place `[lo, hi]` -> `[0, 255]` mapping of float32 `values`"
+    import numpy as np
+
+    values -= lo
+    values *= 255.0 / (hi - lo) if hi > lo else 0.0
+    np.clip(values, 0.0, 255.0, out=values)
+    np.nan_to_num(values, copy=False)
+    if gamma != 1.0:
+        values *= 1.0 / 255.0
+        np.power(values, 1.0 / gamma, out=values)
+        values *= 255.0
+    return values
+
+
+@lru_cache(maxsize=16)
+def window_lut(
+    dtype: str, lo: float, hi: float, gamma: float = 1.0
+) -> npt.NDArray[np.uint8]:
+    """
+    :returns: lookup table mapping every value of 8 or 16 bit integer `dtype`
+              (indexed by its unsigned view) into `[lo, hi]` -> `[0, 255]`
+    """
+    import numpy as np
+
+    dt = np.dtype(dtype)
+    values = np.arange(1 << dt.itemsize * 8, dtype=f"u{dt.itemsize}")
+    values = values.view(dt).astype(np.float32)
+    lut = _apply_window(values, lo, hi, gamma).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut
+
+
+def window_to_uint8(
+    arr: npt.NDArray[Any],
+    lo: float,
+    hi: float,
+    gamma: float = 1.0,
+    out: npt.NDArray[np.uint8] | None = None,
+) -> npt.NDArray[np.uint8]:
+    """
+    Maps `[lo, hi]` range of `arr` into uint8 without making
+    a full size float copy
+    """
+    import numpy as np
+
+    if out is None:
+        out = np.empty(arr.shape, dtype=np.uint8)
+    if arr.dtype.kind in "uib" and arr.dtype.itemsize <= 2:
+        lut = window_lut(arr.dtype.str, lo, hi, gamma)
+        return np.take(lut, arr.view(f"u{arr.dtype.itemsize}"), out=out)
+    rows = max(1, (1 << 20) // max(1, arr[:1].size))  # ~4MB of float32
+    for start in range(0, arr.shape[0], rows):
+        chunk = arr[start : start + rows].astype(np.float32)
+        out[start : start + rows] = _apply_window(chunk, lo, hi, gamma)
+    return out
+
+
+class WindowLevel:
+    """
+    Interactive display mapping of 16 bit and float images.
+
+    The histogram is computed once, and every `render` reuses the same
+    output buffer, so changing the window doesn't read the file again.
+    """
+
+    BINS = 4096  # histogram bins for float data
+
+    def __init__(self, arr: npt.NDArray[Any]) -> None:
+        import numpy as np
+
+        self.arr = arr
+        self._out = np.empty(arr.shape, dtype=np.uint8)
+        self._histogram: (
+            tuple[npt.NDArray[np.int64], npt.NDArray[np.float64]] | None
+        ) = None
+        self._extremes: tuple[float, float] | None = None
+        self.lo, self.hi = self.auto_window()
+        self.gamma = 1.0
+
+    def histogram(self) -> tuple[npt.NDArray[np.int64], npt.NDArray[Any]]:
+        """:returns: counts and ascending values (or bin left edges)"""
+        import numpy as np
+
+        if self._histogram is None:
+            arr = self.arr
+            if arr.dtype.kind in "uib" and arr.dtype.itemsize <= 2:
+                size = 1 << arr.dtype.itemsize * 8
+                counts = np.bincount(
+                    arr.view(f"u{arr.dtype.itemsize}").ravel(),
+                    minlength=size,
+                )
+                values = np.arange(size, dtype=f"u{arr.dtype.itemsize}")
+                values = values.view(arr.dtype).astype(np.float64)
+                order = np.argsort(values, kind="stable")
+                self._histogram = counts[order], values[order]
+            else:
+                finite = np.isfinite(arr)
+                if finite.any():
+                    lo, hi = float(arr[finite].min()), float(arr[finite].max())
+                else:
+                    lo, hi = 0.0, 1.0
+                counts, edges = np.histogram(
+                    arr[finite], bins=self.BINS, range=(lo, hi)
+                )
+                self._histogram = counts, edges[:-1]
+                self._extremes = (lo, hi)
+        return self._histogram
+
+    @property
+    def minimum(self) -> float:
+        return self._range()[0]
+
+    @property
+    def maximum(self) -> float:
+        return self._range()[1]
+
+    def _range(self) -> tuple[float, float]:
+        if self._extremes is None:
+            counts, values = self.histogram()
+            nonzero = counts.nonzero()[0]
+            if not len(nonzero):
+                self._extremes = (0.0, 0.0)
+            else:
+                self._extremes = (
+                    float(values[nonzero[0]]),
+                    float(values[nonzero[-1]]),
+                )
+        return self._extremes
+
+    def percentile(self, fraction: float) -> float:
+        import numpy as np
+
+        counts, values = self.histogram()
+        cumulative = np.cumsum(counts)
+        if not cumulative[-1]:
+            return 0.0
+        idx = np.searchsorted(cumulative, fraction * cumulative[-1])
+        return float(values[min(idx, len(values) - 1)])
+
+    def auto_window(self, clip: float = 0.005) -> tuple[float, float]:
+        """:returns: window that ignores `clip` darkest and brightest part"""
+        lo, hi = self.percentile(clip), self.percentile(1.0 - clip)
+        if hi <= lo:
+            lo, hi = self.minimum, self.maximum
+        return lo, hi
+
+    def set_window(self, lo: float, hi: float, gamma: float = 1.0) -> None:
+        self.lo, self.hi, self.gamma = lo, hi, gamma
+
+    def render(self) -> tuple[QImage, object]:
+        """
+        :returns: same as `numpy_to_qimage`. The memory is reused by the next
+                  call, so convert the image to pixmap before that
+        """
+        out = window_to_uint8(
+            self.arr, self.lo, self.hi, self.gamma, out=self._out
+        )
+        return numpy_to_qimage(out)
+
+
+@lru_cache(maxsize=4)
+def _window_level(path: str, _mtime: float) -> WindowLevel | None:
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    try:
+        arr = np.load(path, mmap_mode="r", allow_pickle=False)
+    except (OSError, ValueError):
+        return None  # `load_pixmap` will report the error
+    if arr.dtype == np.uint8 or arr.ndim not in (2, 3):
+        return None
+    if arr.ndim == 3 and arr.shape[2] not in (1, 3, 4):
+        return None
+    return WindowLevel(arr)
+
+
+def window_level(path: str) -> WindowLevel | None:
+    """
+    :returns: display mapping for `.npy` files that are not uint8.
+              Recent ones are cached, so their histogram is reused
+    """
+    if not path.lower().endswith(".npy"):
+        return None
+    try:
+        mtime = getmtime(path)
+    except OSError:
+        return None
+    return _window_level(ImageCache.key(path), mtime)
+
+
+def _is_qimage_compatible(arr: npt.NDArray[Any]) -> bool:
+    "pixels of every row are contiguous, so QImage can use the memory"
+    if arr.ndim == 2:
+        return arr.strides[1] == 1 and arr.strides[0] >= arr.shape[1]
+    return (
+        arr.strides[2] == 1
+        and arr.strides[1] == arr.shape[2]
+        and arr.strides[0] >= arr.shape[1] * arr.shape[2]
+    )
 
 
 def numpy_to_qimage(arr_like: npt.ArrayLike | Image) -> tuple[QImage, object]:
     """
     return QImage and an object that holds that image memory (np.NDarray)
+
+    uint8 arrays (including memory mapped ones) are not copied when rows
+    are contiguous. Other types are mapped from `[0, max]` to `[0, 255]`.
     """
     import numpy as np
 
-    arr = np.ascontiguousarray(arr_like)
+    arr = np.asarray(arr_like)
+    if arr.ndim == 3 and arr.shape[2] == 1:
+        arr = arr[:, :, 0]
     if arr.dtype != np.uint8:
-        max_val = np.max(arr)
-        if max_val:
-            arr = arr / (max_val / 255)
-        arr = arr.astype(np.uint8)
+        max_val = np.nanmax(arr) if arr.size else 0
+        arr = window_to_uint8(arr, 0.0, float(max_val))
+    if not _is_qimage_compatible(arr):
+        arr = np.ascontiguousarray(arr)
     num_channels = 1 if arr.ndim <= 2 else arr.shape[2]
     qformat = CONVERT[num_channels]
     pointer, read_only_flag = arr.__array_interface__["data"]
@@ -43,7 +438,7 @@ def numpy_to_qimage(arr_like: npt.ArrayLike | Image) -> tuple[QImage, object]:
     if num_channels == 1:
         # it is better to set colors in Format_Indexed8 to not get
         # "color table index %d out of range.""
-        image.setColorTable([QColor(c, c, c).rgba() for c in range(256)])
+        image.setColorTable(_GRAY_COLOR_TABLE)
     return image, arr
 
 
@@ -52,26 +447,69 @@ def numpy_to_pixmap(arr_like: npt.ArrayLike | Image) -> QPixmap:
     return QPixmap.fromImage(image)
 
 
+def decode_image(path: str) -> tuple[QImage, object]:
+    """
+    Decode image file. Returned image may reference memory of the second
+    item (memory mapped `.npy` file), so it must be kept alive.
+
+    :raises ValueError: when the image can't be decoded
+    """
+    if path.lower().endswith(".npy"):
+        try:
+            import numpy as np
+        except ImportError as e:
+            raise ValueError(f"Failed to load `{path}`. And {e}")
+        try:
+            arr = np.load(path, mmap_mode="r", allow_pickle=False)
+        except (OSError, ValueError) as e:
+            raise ValueError(f"Failed to load `{path}`. {e}")
+        if (
+            arr.ndim not in (2, 3)
+            or arr.ndim == 3
+            and arr.shape[2] not in (1, 3, 4)
+        ):
+            raise ValueError(f"`{path}` has unsupported shape {arr.shape}")
+        return numpy_to_qimage(arr)
+    image = QImage(path)
+    if image.isNull():
+        try:
+            from PIL import Image
+        except ImportError as e:
+            raise ValueError(f"Failed to load `{path}`. And {e}")
+        try:
+            pil_image = Image.open(path)
+        except (OSError, Image.DecompressionBombError) as e:
+            raise ValueError(f"Failed to load `{path}`. {e}")
+        return numpy_to_qimage(pil_image)
+    return image, None
+
+
+def read_image(path: str) -> QImage:
+    """
+    Decode image file. Unlike `load_pixmap` can be called from any thread.
+
+    :raises ValueError: when the image can't be decoded
+    """
+    image, memory = decode_image(path)
+    if memory is not None:
+        image = image.copy()  # detach from `memory`
+    return image
+
+
 def load_pixmap(path: str) -> QPixmap:
-    global one_image_cache
     try:
         mtime = getmtime(path)
     except OSError:
         mtime = None
     try:
         # use cache for faster markup updating, when image takes time to load
-        if one_image_cache[:2] == (path, mtime):
-            return one_image_cache[2]
-        pixmap = QPixmap(path)
-        if pixmap.isNull():
-            try:
-                from PIL import Image
-            except ImportError as e:
-                raise ValueError(f"Failed to load `{path}`. And {e}")
-            pil_image = Image.open(path)
-            pixmap = numpy_to_pixmap(pil_image)
+        pixmap = image_cache.get(path, mtime)
+        if pixmap is not None:
+            return pixmap
+        image, _memory = decode_image(path)
+        pixmap = QPixmap.fromImage(image)
     except (ValueError, FileNotFoundError) as e:
         MB.warning(None, "Error", f"Error while opening {path}:\n\n{e}")
         return QPixmap()
-    one_image_cache = (path, mtime, pixmap)
+    image_cache.put(path, mtime, pixmap)
     return pixmap
@@ -0,0 +1,389 @@
+"""
+Interpolation of objects between frames of a sequence with optical flow.
+Has no user interface, used by the "Interpolate" action and by
+`run-gmc batch interpolate`.
+"""
+
+from __future__ import annotations
+from json import load as json_load
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    Literal,
+    TypedDict,
+)
+from .json import read as read_json
+from PyQt5 import QtGui
+
+import cv2
+import numpy as np
+import copy
+
+
+CONVERT = {  # channels, mintype
+    QtGui.QImage.Format.Format_ARGB32: 4,
+    QtGui.QImage.Format.Format_RGB32: 3,
+    QtGui.QImage.Format.Format_RGB888: 3,
+    QtGui.QImage.Format.Format_Indexed8: 1,
+}
+
+IMAGES_CACHE: dict[str, Any] = OrderedDict()
+
+
+class NumpyHolder:
+    def __init__(self, interface):
+        self.__array_interface__ = interface
+
+
+class GMCItem_(TypedDict):
+    type: Literal["quad", "rect", "point"]
+    data: list[Any]
+
+
+class GMCItem(GMCItem_, total=False):
+    tags: list[str]
+
+
+TagsFilter = tuple[list[str], Callable[[Iterator[bool]], bool]]
+
+
+class GMCMarkup(TypedDict):
+    size: tuple[int, int]
+    objects: list[GMCItem]
+
+
+def load_image(path: str) -> Any:
+    try:
+        qimg = IMAGES_CACHE.pop(path)
+        IMAGES_CACHE[path] = qimg
+        return qimg[0]
+    except KeyError:
+        if len(IMAGES_CACHE) >= 100:
+            IMAGES_CACHE.popitem(last=False)
+    qimg = QtGui.QImage(path)
+    channels = CONVERT[qimg.format()]
+    shape = qimg.height(), qimg.width(), channels
+    nh = NumpyHolder(
+        {
+            "shape": shape,
+            "data": (qimg.constBits().__int__(), False),
+            "typestr": "u1",
+            "strides": (qimg.bytesPerLine(), channels, 1),
+        }
+    )
+    nparray = np.array(nh, copy=False)
+    IMAGES_CACHE[path] = (nparray, qimg)
+    return nparray
+
+
+def read_markup(file_paths: list[str]) -> Iterator[Any]:
+    for path in file_paths:
+        try:
+            yield read_json(path)
+        except IOError:
+            yield {"objects": []}
+        except Exception as e:
+            print("read_markup", e, "in", path)
+
+
+class iter_interpolatable_objects:
+    def __new__(
+        cls, markup_list: list[Any], tags_filter: TagsFilter | None = None
+    ) -> Iterator[tuple[GMCItem, GMCItem, int, int]]:
+        objects = cls._iter_all_objects(markup_list)
+        if tags_filter is not None:
+            objects = cls.filter_by_tags(objects, *tags_filter)
+        for idx, obj in objects:
+            shift, next_obj = cls._find_next_object(
+                obj, markup_list[idx + 1 :]
+            )
+            if next_obj is not None:
+                yield obj, next_obj, idx, shift
+
+    @staticmethod
+    def _iter_all_objects(
+        markup_list: list[GMCMarkup],
+    ) -> Iterator[tuple[int, GMCItem]]:
+        for idx, markup in enumerate(markup_list):
+            for obj in markup.get("objects", ()):
+                assert isinstance(obj, dict), obj
+                if obj["type"] in ("rect", "quad", "point"):
+                    yield idx, obj
+
+    @staticmethod
+    def _key(obj: GMCItem) -> tuple[str, tuple[str, ...]]:
+        return obj["type"], tuple(obj.get("tags", ()))
+
+    @classmethod
+    def _find_next_object(
+        cls, obj: GMCItem, markup_list: list[GMCItem]
+    ) -> tuple[int, GMCItem | None]:
+        """
+        Find first `obj` in `markup_list` using `cls.key`
+        """
+        key = cls._key
+        key_to_find = key(obj)
+        for idx, markup in enumerate(markup_list):
+            assert isinstance(obj, dict), obj
+            for obj in markup.get("objects", ()):
+                if key(obj) == key_to_find:
+                    return idx, obj
+        return 0, None
+
+    @staticmethod
+    def filter_by_tags(
+        objects: Iterator[tuple[int, GMCItem]],
+        tags: list[str],
+        f: Callable[[Iterator[bool]], bool],
+    ) -> Iterator[tuple[int, GMCItem]]:
+        for idx, obj in objects:
+            obj_tags = obj.get("tags")
+            if not obj_tags:  # because f(empty list) is always true
+                continue
+            if f(tag in tags for tag in obj_tags):
+                yield idx, obj
+
+
+def interpolate_markup(
+    image_paths: list[str],
+    markup_paths: list[str],
+    tags_filter: TagsFilter | None = None,
+) -> dict[str, Any]:
+    """
+    Adds objects to markup between frames that have the same objects
+
+    :param tags_filter: tags and `any` or `all`, to interpolate only
+                        objects with these tags
+    :returns: changed markup by path
+    """
+    markup_list: list[Any] = list(read_markup(markup_paths))
+    save: dict[str, dict[str, Any]] = {}
+    objects = iter_interpolatable_objects(markup_list, tags_filter)
+    for obj, next_obj, idx, shift in objects:
+        if shift == 0:
+            continue
+        frames = interpolate_core(
+            [obj], [next_obj], image_paths[idx : idx + shift + 2]
+        )
+        out_s = slice(idx + 1, idx + 1 + len(frames) - 2)
+        for obj_src, markup_dst, markup_path in zip(
+            frames[1:-1], markup_list[out_s], markup_paths[out_s]
+        ):
+            assert isinstance(obj_src, list) and len(obj_src) == 1, obj_src
+            obj_src = obj_src[0]
+            if "tags" in obj:
+                obj_src["tags"] = obj["tags"]
+            markup_dst.setdefault("objects", []).append(obj_src)
+            save[markup_path] = markup_dst
+    IMAGES_CACHE.clear()
+    return save
+
+
+def prepare_obj(
+    obj: GMCItem,
+) -> tuple[tuple[float, float], tuple[float, float]]:
+    if obj["type"] == "point":
+        size = (20, 20)  # TODO: size as parameter
+        center = tuple(obj["data"])
+    elif obj["type"] == "rect":
+        size = (int(obj["data"][2]), int(obj["data"][3]))
+        center = (
+            obj["data"][0] + (obj["data"][2] / 2),
+            obj["data"][1] + (obj["data"][3] / 2),
+        )
+    else:
+        raise NotImplementedError(f"Unsupported object type `{obj['type']}`")
+    return center, size
+
+
+def move_obj(pt: tuple[float, float], obj: GMCItem) -> GMCItem:
+    obj_moved = copy.deepcopy(obj)
+
+    if obj["type"] == "point":
+        obj_moved["data"][0] = pt[0]
+        obj_moved["data"][1] = pt[1]
+    elif obj["type"] == "rect":
+        obj_moved["data"][0] = pt[0] - (obj["data"][2] / 2)
+        obj_moved["data"][1] = pt[1] - (obj["data"][3] / 2)
+        # 2 and 3 as in obj
+    else:
+        raise NotImplementedError(f"Unsupported object type `{obj['type']}`")
+
+    return obj_moved
+
+
+def predict_cv(
+    objects: list[Any], frame1_path: str, frame2_path: str
+) -> list[GMCItem]:
+    frame1 = load_image(frame1_path)
+    frame2 = load_image(frame2_path)
+    prediction: list[GMCItem] = []
+    for obj in objects:
+        center, size = prepare_obj(obj)
+        center = np.atleast_2d(np.array(center)).astype(np.float32)
+        pt_moved, _, _ = cv2.calcOpticalFlowPyrLK(
+            frame1, frame2, center, None, winSize=size, maxLevel=4
+        )
+        obj_moved = move_obj(pt_moved[0], obj)
+        prediction.append(obj_moved)
+    return prediction
+
+
+def merge_two_obj(obj1: GMCItem, obj2: GMCItem, k: float) -> GMCItem:
+    assert obj1["type"] == obj2["type"]
+    assert obj1.get("tags") == obj2.get("tags")
+
+    merged: GMCItem = {
+        "type": obj1["type"],
+        "data": [],
+    }
+    if "tags" in obj1:
+        merged["tags"] = obj1["tags"]
+    for d1, d2 in zip(obj1["data"], obj2["data"]):
+        merged["data"].append(k * d1 + (1 - k) * d2)
+
+    return merged
+
+
+def normalize_rects(objects: list[GMCItem]) -> list[GMCItem]:
+    for obj in objects:
+        if obj["type"] == "rect":
+            d = obj["data"]
+            if d[2] < 0:
+                d[0] += d[2]
+                d[2] = abs(d[2])
+            if d[3] < 0:
+                d[1] += d[3]
+                d[3] = abs(d[3])
+    return objects
+
+
+def interpolate_core(
+    first_objects: list[GMCItem],
+    last_objects: list[GMCItem],
+    file_paths: list[str],
+) -> list[list[GMCItem]]:
+    assert file_paths, file_paths
+
+    # normalize rects
+    first_objects = normalize_rects(first_objects)
+    last_objects = normalize_rects(last_objects)
+
+    # forward loop
+    forw: list[list[GMCItem]] = []
+    forw.append(first_objects)
+    for file1, file2 in zip(file_paths[:-1], file_paths[1:]):
+        new_obj = predict_cv(forw[-1], file1, file2)
+        forw.append(new_obj)
+
+    # back loop
+    back: list[list[GMCItem]] = []
+    back.append(last_objects)
+    for file1, file2 in reversed(list(zip(file_paths[:-1], file_paths[1:]))):
+        new_obj = predict_cv(back[-1], file2, file1)
+        back.append(new_obj)
+    back = back[::-1]
+
+    # merge
+    ret: list[list[GMCItem]] = []
+    ret.append(first_objects)
+    n_frames = len(forw) - 1
+    for frame_idx, (frame1_obj, frame2_obj) in enumerate(
+        list(zip(forw, back))[1:-1]
+    ):
+        k = float(n_frames - frame_idx - 1) / n_frames
+        merged_frame: list[GMCItem] = []
+        for obj1, obj2 in zip(frame1_obj, frame2_obj):
+            m_obj = merge_two_obj(obj1, obj2, k)
+            merged_frame.append(m_obj)
+        ret.append(merged_frame)
+    ret.append(last_objects)
+
+    return ret
+
+
+def intersect_objects(
+    a: list[GMCItem], b: list[GMCItem]
+) -> tuple[list[GMCItem], list[GMCItem]]:
+    # unused function
+    a_objects = {
+        ((obj["type"],), tuple(obj["tags"])): idx for idx, obj in enumerate(a)
+    }
+    assert len(a_objects) == len(a)
+    b_objects = {
+        ((obj["type"],), tuple(obj["tags"])): idx for idx, obj in enumerate(b)
+    }
+    assert len(b_objects) == len(b)
+    out_tags = sorted(set(a_objects) & set(b_objects))
+    return (
+        [a[a_objects[tag]] for tag in out_tags],
+        [b[b_objects[tag]] for tag in out_tags],
+    )
+
+
+def main_interpolate(
+    first_frame_markup_path: str,
+    last_frame_markup_path: str,
+    file_paths: list[str],
+) -> None:
+    # unused function
+    with open(first_frame_markup_path) as f:
+        first_frame_markup = json_load(f)
+    with open(last_frame_markup_path) as f:
+        last_frame_markup = json_load(f)
+
+    first_intersected, last_intersected = intersect_objects(
+        first_frame_markup.get("objects", ()),
+        last_frame_markup.get("objects", ()),
+    )
+
+    interpolated_objects = interpolate_core(
+        first_intersected, last_intersected, file_paths
+    )
+
+    for idx, frame in enumerate(interpolated_objects):
+        print(" {} ".format(idx).center(40, "-"))
+        for obj in frame:
+            print(obj)
+
+
+def predict(frame_1_path: str, frame_2_path: str, markup_path: str) -> None:
+    """Prints objects of `markup_path` moved from frame 1 to frame 2"""
+    with open(markup_path) as f:
+        markup = json_load(f)
+    objects = [
+        obj
+        for obj in markup.get("objects", ())
+        if obj.get("type") in ("rect", "point")
+    ]
+    for obj in predict_cv(objects, frame_1_path, frame_2_path):
+        print(obj)
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser()
+    subparsers = parser.add_subparsers()
+
+    predict_parser = subparsers.add_parser("predict")
+    predict_parser.add_argument("frame_1_path")
+    predict_parser.add_argument("frame_2_path")
+    predict_parser.add_argument("markup_path")
+    predict_parser.set_defaults(func=predict)
+
+    predict_parser = subparsers.add_parser("interpolate")
+    predict_parser.add_argument("first_frame_markup_path")
+    predict_parser.add_argument("last_frame_markup_path")
+    predict_parser.add_argument("file_paths", nargs="+")
+    predict_parser.set_defaults(func=main_interpolate)
+
+    args = vars(parser.parse_args())
+    func = args.pop("func")
+    func(**args)
+
+
+if __name__ == "__main__":
+    main()
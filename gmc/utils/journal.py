@@ -0,0 +1,234 @@
+"""
+Write-ahead journal of markup edits, so a crash loses at most a fraction of
+a second of work instead of everything since the last save.
+
+`<markup>.journal` starts with `{"base": <storage version of markup>}`,
+followed by records:
+
+* `{"set": {"<key>": <object>}, "del": ["<key>"]}` - object states, keys
+  are indices of objects in the saved markup, new objects get new keys
+* `{"root": <markup without objects>}` - size, properties etc.
+* `{"root": ..., "objects": {"<key>": <object>}}` - everything
+
+The journal is removed when the markup is written or the edits are
+discarded, so it only exists after a crash.
+"""
+
+from __future__ import annotations
+import json
+import os
+from functools import partial
+from typing import Any, Callable, Sequence, TextIO
+from PyQt5 import QtCore
+from .save_queue import save_queue
+from .storage import storage
+
+SUFFIX = ".journal"
+
+
+def _dumps(record: Any) -> str:
+    return json.dumps(
+        record, allow_nan=False, ensure_ascii=False, separators=(",", ":")
+    )
+
+
+def recover(markup_path: str, markup: dict[str, Any]) -> dict[str, Any] | None:
+    """
+    :param markup: markup, currently stored at `markup_path`
+    :returns: `markup` with journal records applied or `None`
+              when there is nothing to recover
+    """
+    if save_queue.pending(markup_path) is not None:
+        return None  # just saved, journal is obsolete
+    path = markup_path + SUFFIX
+    try:
+        with open(path, "r", encoding="utf-8") as inp:
+            lines = inp.read().splitlines()
+    except OSError:
+        return None
+    try:
+        base = json.loads(lines[0])["base"]
+    except (IndexError, ValueError, KeyError, TypeError):
+        base = False
+    version = storage().version(markup_path)
+    if len(lines) < 2 or base != (None if version is None else list(version)):
+        # journal of markup that was written after all
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return None
+    root = {key: value for key, value in markup.items() if key != "objects"}
+    objects = {
+        str(key): obj for key, obj in enumerate(markup.get("objects", ()))
+    }
+    for line in lines[1:]:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            break  # interrupted writing
+        if "root" in record:
+            root = record["root"]
+        if "objects" in record:
+            objects = record["objects"]
+        objects.update(record.get("set", ()))
+        for key in record.get("del", ()):
+            objects.pop(key, None)
+    return {**root, "objects": list(objects.values())}
+
+
+class MarkupJournal(QtCore.QObject):
+    """
+    Journal of one open markup file. Records are appended and flushed
+    right away, which is much cheaper than writing the whole markup.
+    """
+
+    _written = QtCore.pyqtSignal(int, object)  # save number, version
+    _closing: set[MarkupJournal] = set()  # wait for writing before removal
+
+    def __init__(self, markup_path: str) -> None:
+        super().__init__()
+        self.markup_path = markup_path
+        self.path = markup_path + SUFFIX
+        self._base = storage().version(markup_path)
+        self._file: TextIO | None = None
+        self._saves = 0
+        # records made while markup is being written, they go to a new file
+        self._backlog: list[str] | None = None
+        self._closed = False
+        self._written.connect(self._on_written)
+
+    def append(self, record: dict[str, Any]) -> None:
+        if self._closed:
+            return
+        line = _dumps(record) + "\n"
+        if self._backlog is not None:
+            self._backlog.append(line)
+        else:
+            self._write(line)
+
+    def _write(self, line: str) -> None:
+        try:
+            if self._file is None:
+                self._file = open(self.path, "w", encoding="utf-8")
+                base = None if self._base is None else list(self._base)
+                self._file.write(_dumps({"base": base}) + "\n")
+            self._file.write(line)
+            self._file.flush()
+        except OSError as e:
+            print("journal writing failed:", e)
+
+    def saved(self) -> Callable[[], None]:
+        """
+        Call when markup is queued for saving, records made so far are
+        obsolete then.
+
+        :returns: callback for the writer thread, the journal is replaced
+                  after the markup is written
+        """
+        self._close_file()
+        self._saves += 1
+        self._backlog = []
+        return partial(self._notify_written, self._saves)
+
+    def _notify_written(self, save: int) -> None:
+        try:
+            self._written.emit(save, storage().version(self.markup_path))
+        except RuntimeError:
+            pass  # application is finishing
+
+    def _on_written(self, save: int, version: Any) -> None:
+        if save != self._saves:
+            return  # newer markup is queued
+        backlog, self._backlog = self._backlog or [], None
+        self._remove_file()
+        self._base = version
+        if self._closed:
+            self._closing.discard(self)
+        else:
+            for line in backlog:
+                self._write(line)
+
+    def close(self) -> None:
+        """Markup is saved or edits are discarded, journal is not needed"""
+        self._closed = True
+        self._close_file()
+        if self._backlog is None:
+            self._remove_file()
+        else:
+            self._closing.add(self)  # removed after writing
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _remove_file(self) -> None:
+        self._close_file()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print("journal removal failed:", e)
+
+
+class SnapshotJournal(QtCore.QObject):
+    """
+    Journals of schemas with few objects. After every change of the scene
+    whole markup of each file is recorded, which is as cheap as tracking
+    changed objects there.
+
+    :param get_markups: markup of every journaled file, in order of `open`
+    """
+
+    def __init__(
+        self,
+        markup_changed: QtCore.pyqtBoundSignal,
+        get_markups: Callable[[], Sequence[dict[str, Any]]],
+    ) -> None:
+        super().__init__()
+        self._get_markups = get_markups
+        self._journals: list[MarkupJournal] = []
+        self._timer = QtCore.QTimer(
+            self, singleShot=True, interval=250, timeout=self.flush
+        )
+        markup_changed.connect(self._on_markup_changed)
+
+    def open(self, *markup_paths: str) -> None:
+        self.close()
+        self._journals = [MarkupJournal(path) for path in markup_paths]
+
+    def saved(self) -> list[Callable[[], None]]:
+        """`MarkupJournal.saved` of every file"""
+        self._timer.stop()
+        return [journal.saved() for journal in self._journals]
+
+    def close(self) -> None:
+        self._timer.stop()
+        for journal in self._journals:
+            journal.close()
+        self._journals = []
+
+    def _on_markup_changed(self, _items: Any) -> None:
+        if self._journals and not self._timer.isActive():
+            self._timer.start()  # fast editing makes one record
+
+    def flush(self) -> None:
+        self._timer.stop()
+        if not self._journals:
+            return
+        for journal, markup in zip(self._journals, self._get_markups()):
+            journal.append(
+                {
+                    "root": {
+                        key: value
+                        for key, value in markup.items()
+                        if key != "objects"
+                    },
+                    "objects": {
+                        str(key): obj
+                        for key, obj in enumerate(markup.get("objects", ()))
+                    },
+                }
+            )
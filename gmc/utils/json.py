@@ -1,9 +1,20 @@
 from __future__ import annotations
 import json
-from typing import Any
+from functools import partial
+from json.encoder import encode_basestring, encode_basestring_ascii
+from operator import itemgetter
+from typing import Any, Callable
 from PyQt5.QtWidgets import QMessageBox, QWidget
-from PyQt5.QtCore import QFileInfo
 from . import CantOpenMarkup
+from .markup_index import MarkupIndex, summarize
+from .save_queue import save_queue
+from .storage import Version, storage
+
+
+def _encode_float(o: float) -> str:
+    if o.is_integer():
+        return f"{o}"  # don't need extra zeroes
+    return f"{o:0.6f}".rstrip("0").rstrip(".")  # 1e-6 of a pixel is enough
 
 
 # highly modified version of
@@ -30,16 +41,102 @@ class GMCJSONEncoder(json.JSONEncoder):
 
     def encode(self, o):
         """Encode JSON object *o* with respect to single line lists."""
-        if isinstance(o, float):
-            if o.is_integer():
-                return f"{o}"  # don't need extra zeroes
-            return f"{o:0.6f}".rstrip("0").rstrip(
-                "."
-            )  # 1e-6 of a pixel should be all right
-        if isinstance(o, (list, tuple)):
-            return self._encode_list(o)
-        if isinstance(o, dict):
-            return self._encode_object(o)
+        # single pass with local lookups only, as saving markup with
+        # hundreds of thousands of vertices must not be noticeable
+        indent = self.indent
+        assert isinstance(indent, str)
+        if self.ensure_ascii:
+            encode_str = encode_basestring_ascii
+        else:
+            encode_str = encode_basestring
+        sort_keys = self.sort_keys
+        max_items, max_width = self.MAX_ITEMS, self.MAX_WIDTH
+        containers = self.CONTAINER_TYPES
+        int_repr = int.__repr__
+        slow = self._encode_primitive
+
+        def primitive(o: Any) -> str:
+            cls = type(o)
+            if cls is float:
+                return _encode_float(o)
+            if cls is int:
+                return int_repr(o)
+            if cls is str:
+                return encode_str(o)
+            if o is None:
+                return "null"
+            if o is True:
+                return "true"
+            if o is False:
+                return "false"
+            if isinstance(o, float):
+                return _encode_float(o)
+            return slow(o)
+
+        def encode(o: Any, level: int) -> str:
+            if isinstance(o, (list, tuple)):
+                if len(o) <= max_items:
+                    # inlined `primitive` for the coordinates fast path
+                    parts = []
+                    for el in o:
+                        cls = type(el)
+                        if cls is float:
+                            if el.is_integer():
+                                parts.append(f"{el}")
+                            else:
+                                parts.append(
+                                    f"{el:0.6f}".rstrip("0").rstrip(".")
+                                )
+                        elif cls is int:
+                            parts.append(int_repr(el))
+                        elif isinstance(el, containers):
+                            break
+                        else:
+                            parts.append(primitive(el))
+                    else:
+                        data = "[" + ", ".join(parts) + "]"
+                        if len(data) + level * 2 < max_width:
+                            return data
+                if not o:
+                    return "[\n\n" + indent * level + "]"
+                pad = indent * (level + 1)
+                return (
+                    "[\n"
+                    + pad
+                    + (",\n" + pad).join([encode(el, level + 1) for el in o])
+                    + "\n"
+                    + indent * level
+                    + "]"
+                )
+            if isinstance(o, dict):
+                if not o:
+                    return "{}"
+                # ensure keys are converted to strings
+                items = {
+                    str(k) if k is not None else "null": v
+                    for k, v in o.items()
+                }.items()
+                if sort_keys:
+                    items = sorted(items, key=itemgetter(0))
+                pad = indent * (level + 1)
+                return (
+                    "{\n"
+                    + ",\n".join(
+                        [
+                            f"{pad}{encode_str(k)}: {encode(v, level + 1)}"
+                            for k, v in items
+                        ]
+                    )
+                    + "\n"
+                    + indent * level
+                    + "}"
+                )
+            return primitive(o)
+
+        return encode(o, self.indentation_level)
+
+    def _encode_primitive(self, o: Any) -> str:
+        "exotic types (subclasses, `default` support) go through `json`"
         return json.dumps(
             o,
             skipkeys=self.skipkeys,
@@ -52,51 +149,9 @@ class GMCJSONEncoder(json.JSONEncoder):
             default=self.default if hasattr(self, "default") else None,
         )
 
-    def _encode_list(self, o):
-        if self._primitives_only(o) and len(o) <= self.MAX_ITEMS:
-            data = "[" + ", ".join(self.encode(el) for el in o) + "]"
-            if len(data) + self.indentation_level * 2 < self.MAX_WIDTH:
-                return data
-        self.indentation_level += 1
-        output = [self.indent_str + self.encode(el) for el in o]
-        self.indentation_level -= 1
-        return "[\n" + ",\n".join(output) + "\n" + self.indent_str + "]"
-
-    def _encode_object(self, o):
-        if not o:
-            return "{}"
-
-        # ensure keys are converted to strings
-        o = {str(k) if k is not None else "null": v for k, v in o.items()}
-
-        if self.sort_keys:
-            o = dict(sorted(o.items(), key=lambda x: x[0]))
-
-        self.indentation_level += 1
-        output = [
-            f"{self.indent_str}{json.dumps(k, ensure_ascii=self.ensure_ascii)}: {self.encode(v)}"
-            for k, v in o.items()
-        ]
-        self.indentation_level -= 1
-
-        return "{\n" + ",\n".join(output) + "\n" + self.indent_str + "}"
-
     def iterencode(self, o, **kwargs):
         """Required to also work with `json.dump`."""
-        return self.encode(o)
-
-    def _primitives_only(self, o: list | tuple | dict):
-        if isinstance(o, (list, tuple)):
-            return not any(isinstance(el, self.CONTAINER_TYPES) for el in o)
-        elif isinstance(o, dict):
-            return not any(
-                isinstance(el, self.CONTAINER_TYPES) for el in o.values()
-            )
-
-    @property
-    def indent_str(self) -> str:
-        assert isinstance(self.indent, str)
-        return self.indentation_level * self.indent
+        return (self.encode(o),)
 
 
 class ZeroDict(dict):
@@ -108,10 +163,53 @@ class ZeroDict(dict):
         return {}
 
 
+# markup parsed in background by `Prefetcher`, consumed by the next `load`
+_prefetched: dict[str, tuple[Version, Any]] = {}
+_PREFETCHED_MAX = 16
+
+
+def remember_prefetched(
+    json_filename: str, version: Version, data: Any
+) -> None:
+    while len(_prefetched) >= _PREFETCHED_MAX:
+        del _prefetched[next(iter(_prefetched))]
+    _prefetched[json_filename] = (version, data)
+
+
+def _pop_prefetched(json_filename: str) -> Any | None:
+    entry = _prefetched.pop(json_filename, None)
+    if entry is not None and storage().version(json_filename) == entry[0]:
+        return entry[1]
+    return None
+
+
+def exists(json_filename: str) -> bool:
+    """:returns: whether markup is stored or queued for saving"""
+    return save_queue.pending(json_filename) is not None or storage().exists(
+        json_filename
+    )
+
+
+def read(json_filename: str) -> Any:
+    """
+    Reads markup from the current storage, without prefetched data.
+
+    :raises OSError: when there is no markup
+    :raises ValueError: when markup is not valid json
+    """
+    pending = save_queue.pending(json_filename)
+    if pending is not None:
+        return json.loads(pending)
+    return json.loads(storage().read(json_filename))
+
+
 def load(json_filename: str, widget: QWidget):
+    if save_queue.pending(json_filename) is None:
+        data = _pop_prefetched(json_filename)
+        if data is not None:
+            return data
     try:
-        with open(json_filename, "r", encoding="utf-8") as inp:
-            return json.load(inp)
+        return read(json_filename)
     except ValueError as e:
         msg = f"Failed parsing `{json_filename}`\n{e}"
         QMessageBox.warning(widget, "Warning", msg)
@@ -120,18 +218,51 @@ def load(json_filename: str, widget: QWidget):
         return ZeroDict()  # special class so `dicts_are_equal` returns False
 
 
-def dump(json_filename: str, data: dict[str, Any]) -> None:
-    the_qdir = QFileInfo(json_filename).absoluteDir()
-    the_qdir.mkpath(the_qdir.absolutePath())
+def dump(
+    json_filename: str,
+    data: dict[str, Any],
+    on_written: Callable[[], None] | None = None,
+) -> None:
+    """
+    Serializes `data` right away and writes it to the current storage
+    in background. Use `save_queue.drain()` to wait for the writing.
+    Opened `MarkupIndex` of the destination tree is updated after writing
+
+    :param on_written: called from the writer thread after writing
+    """
+    markup_storage = storage()
+    raw_json = markup_storage.serialize(data)
+    index = MarkupIndex.covering(json_filename)
+    if index is not None:
+        summary = summarize(data)
+        index.record_pending(json_filename, summary)
+        record = partial(index.record_written, json_filename, summary)
+        if on_written is None:
+            on_written = record
+        else:
+            on_written = partial(_call_both, record, on_written)
+    save_queue.put(json_filename, raw_json, on_written, markup_storage.write)
+
+
+def write(json_filename: str, data: dict[str, Any]) -> None:
+    """
+    Writes `data` to the current storage in the calling thread, for
+    workers that change many files. When a save of the same file is
+    queued, `data` is queued after it, so the older save can't overwrite
+    it. Opened `MarkupIndex` of the destination tree is updated
+
+    :raises OSError: when writing fails
+    """
+    if save_queue.pending(json_filename) is not None:
+        dump(json_filename, data)
+        return
+    markup_storage = storage()
+    markup_storage.write(json_filename, markup_storage.serialize(data))
+    index = MarkupIndex.covering(json_filename)
+    if index is not None:
+        index.record_written(json_filename, summarize(data))
 
-    # save first to raw_json, as `json.dump` will corrupt file in extreme cases
-    raw_json = json.dumps(
-        data,
-        allow_nan=False,
-        sort_keys=True,
-        ensure_ascii=False,
-        cls=GMCJSONEncoder,
-    )
 
-    with open(json_filename, "w", encoding="utf-8") as out:
-        out.write(raw_json)
+def _call_both(first: Callable[[], None], second: Callable[[], None]) -> None:
+    first()
+    second()
@@ -0,0 +1,329 @@
+"""
+SQLite index of all markup files of a destination tree, so questions like
+"which tags are used" don't need to parse every file.
+"""
+
+from __future__ import annotations
+import json
+import os
+import sqlite3
+from concurrent.futures import Executor, ThreadPoolExecutor
+from itertools import islice
+from threading import Lock, Thread
+from typing import Any
+from .storage import storage
+
+INDEX_NAME = ".gmc_index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    dir TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE TABLE IF NOT EXISTS counts (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    type TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (path, type)
+);
+CREATE TABLE IF NOT EXISTS tags (
+    path TEXT NOT NULL REFERENCES files(path) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (path, tag)
+);
+CREATE INDEX IF NOT EXISTS tags_tag ON tags(tag);
+"""
+
+Summary = tuple[dict[str, int], set[str]]  # counts per type, tags
+
+
+def summarize(data: Any) -> Summary:
+    """:returns: object counts per type and all tags of parsed markup"""
+    counts: dict[str, int] = {}
+    tags: set[str] = set()
+    objects = data.get("objects") if isinstance(data, dict) else None
+    if isinstance(objects, list):
+        for obj in objects:
+            if not isinstance(obj, dict):
+                continue
+            obj_type = str(obj.get("type", ""))
+            counts[obj_type] = counts.get(obj_type, 0) + 1
+            obj_tags = obj.get("tags")
+            if isinstance(obj_tags, list):
+                tags.update(str(tag) for tag in obj_tags)
+    return counts, tags
+
+
+def unique_tag(used: set[str]) -> str:
+    """:returns: shortest tag like "A", "B", ..., "AA", ... not in `used`"""
+    from string import digits, ascii_uppercase
+    from itertools import product
+
+    chars = ascii_uppercase + digits
+    for n in range(1, 5):
+        for comb in product(chars, repeat=n):
+            tag = "".join(comb)
+            if tag not in used:
+                return tag
+    raise ValueError("all tags are used")
+
+
+def _read_summary(path: str) -> Summary | None:
+    try:
+        return summarize(json.loads(storage().read(path)))
+    except (OSError, ValueError):
+        return None
+
+
+class MarkupIndex:
+    """
+    Incrementally maintained index of markup files under `root`.
+
+    Stored in `root/.gmc_index.sqlite`, or in memory when the directory
+    is not writable. Every method can be called from any thread.
+    """
+
+    _opened: dict[str, MarkupIndex] = {}
+    _opened_lock = Lock()
+
+    def __init__(self, root: str) -> None:
+        self.root = os.path.abspath(root)
+        try:
+            self._db = sqlite3.connect(
+                os.path.join(self.root, INDEX_NAME), check_same_thread=False
+            )
+            self._db.executescript(_SCHEMA)
+        except sqlite3.Error:
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+            self._db.executescript(_SCHEMA)
+        self._db.execute("PRAGMA foreign_keys = ON")
+        self._lock = Lock()
+        self._scanner: Thread | None = None
+        # tags of markup queued for writing, by relative path
+        self._unwritten: dict[str, set[str]] = {}
+
+    @classmethod
+    def open(cls, root: str) -> MarkupIndex:
+        """
+        :returns: shared index of `root`, the first call starts background
+                  refresh of the whole tree
+        """
+        root = os.path.abspath(root)
+        with cls._opened_lock:
+            index = cls._opened.get(root)
+            if index is None:
+                index = cls._opened[root] = cls(root)
+                index.refresh_in_background()
+        return index
+
+    @classmethod
+    def covering(cls, path: str) -> MarkupIndex | None:
+        """:returns: opened index that has `path` in its tree"""
+        path = os.path.abspath(path)
+        with cls._opened_lock:
+            indexes = list(cls._opened.values())
+        for index in indexes:
+            if path.startswith(index.root + os.sep):
+                return index
+        return None
+
+    def close(self) -> None:
+        with self._opened_lock:
+            if self._opened.get(self.root) is self:
+                del self._opened[self.root]
+        with self._lock:
+            self._db.close()
+
+    def _relative(self, path: str) -> str:
+        rel = os.path.relpath(os.path.abspath(path), self.root)
+        return rel.replace(os.sep, "/")
+
+    @staticmethod
+    def _dir_of(rel_path: str) -> str:
+        return rel_path.rpartition("/")[0]
+
+    # updating
+
+    def record(
+        self, path: str, mtime: float, size: int, summary: Summary
+    ) -> None:
+        """Stores `summary` of the file at absolute `path`"""
+        rel = self._relative(path)
+        with self._lock, self._db:
+            self._store(rel, mtime, size, summary)
+
+    def record_pending(self, path: str, summary: Summary) -> None:
+        """Makes tags of markup that is not written yet visible to lookups"""
+        with self._lock:
+            self._unwritten[self._relative(path)] = summary[1]
+
+    def record_written(self, path: str, summary: Summary) -> None:
+        """Same as `record`, version of the just written markup is read here"""
+        rel = self._relative(path)
+        with self._lock:
+            if self._unwritten.get(rel) is summary[1]:
+                del self._unwritten[rel]
+        version = storage().version(path)
+        if version is None:
+            return
+        try:
+            self.record(path, version[0], version[1], summary)
+        except sqlite3.Error as e:
+            print("markup index update failed:", e)
+
+    def _store(
+        self, rel: str, mtime: float, size: int, summary: Summary
+    ) -> None:
+        counts, tags = summary
+        db = self._db
+        db.execute("DELETE FROM files WHERE path = ?", (rel,))
+        db.execute(
+            "INSERT INTO files(path, dir, mtime, size) VALUES (?, ?, ?, ?)",
+            (rel, self._dir_of(rel), mtime, size),
+        )
+        db.executemany(
+            "INSERT INTO counts(path, type, count) VALUES (?, ?, ?)",
+            [(rel, obj_type, n) for obj_type, n in counts.items()],
+        )
+        db.executemany(
+            "INSERT INTO tags(path, tag) VALUES (?, ?)",
+            [(rel, tag) for tag in tags],
+        )
+
+    def refresh(
+        self, directory: str | None = None, executor: Executor | None = None
+    ) -> int:
+        """
+        Re-parses changed files and forgets removed ones.
+
+        :param directory: absolute path to refresh only one directory,
+                          not recursively. Whole tree when `None`
+        :param executor: pool for parsing, e.g. processes for batch jobs.
+                         Threads are used by default
+        :returns: number of re-parsed files
+        """
+        recursive = directory is None
+        top = self.root if directory is None else os.path.abspath(directory)
+        rel_top = "" if top == self.root else self._relative(top)
+        with self._lock:
+            if recursive:
+                rows = self._db.execute("SELECT path, mtime, size FROM files")
+            else:
+                rows = self._db.execute(
+                    "SELECT path, mtime, size FROM files WHERE dir = ?",
+                    (rel_top,),
+                )
+            known = {path: (mtime, size) for path, mtime, size in rows}
+        changed: list[tuple[str, str, float, int]] = []
+        for path, (mtime, size) in storage().scan(top, recursive):
+            rel = self._relative(path)
+            if known.pop(rel, None) != (mtime, size):
+                changed.append((path, rel, mtime, size))
+        self._store_changed(changed, executor)
+        if known:  # files that are gone
+            with self._lock, self._db:
+                self._db.executemany(
+                    "DELETE FROM files WHERE path = ?",
+                    [(rel,) for rel in known],
+                )
+        return len(changed)
+
+    def _store_changed(
+        self,
+        changed: list[tuple[str, str, float, int]],
+        executor: Executor | None,
+    ) -> None:
+        if not changed:
+            return
+        if executor is None:
+            workers = min(8, os.cpu_count() or 1, len(changed))
+            with ThreadPoolExecutor(workers, "gmc-markup-index") as pool:
+                return self._store_changed(changed, pool)
+        it = iter(changed)
+        while batch := list(islice(it, 500)):
+            summaries = list(
+                executor.map(
+                    _read_summary, [item[0] for item in batch], chunksize=50
+                )
+            )
+            with self._lock, self._db:
+                for (path, rel, mtime, size), summary in zip(batch, summaries):
+                    if summary is None:  # stored anyway, not to reparse
+                        print("invalid json", path, "(ignored)")
+                        summary = ({}, set())
+                    self._store(rel, mtime, size, summary)
+
+    def refresh_in_background(self) -> None:
+        if self.is_refreshing():
+            return
+        self._scanner = Thread(
+            target=self._refresh_quietly, name="gmc-markup-index", daemon=True
+        )
+        self._scanner.start()
+
+    def _refresh_quietly(self) -> None:
+        try:
+            self.refresh()
+        except sqlite3.Error as e:  # e.g. index was closed
+            print("markup index refresh failed:", e)
+
+    def is_refreshing(self) -> bool:
+        """:returns: `True` while the background refresh is running"""
+        return self._scanner is not None and self._scanner.is_alive()
+
+    def wait(self, timeout: float | None = None) -> None:
+        """Waits for the background refresh"""
+        if self._scanner is not None:
+            self._scanner.join(timeout)
+
+    # lookups
+
+    def tags_in_dir(self, directory: str) -> set[str]:
+        """:returns: tags used in markup files of one directory"""
+        rel_dir = "" if directory == self.root else self._relative(directory)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT tags.tag FROM tags JOIN files "
+                "ON files.path = tags.path WHERE files.dir = ?",
+                (rel_dir,),
+            ).fetchall()
+        return {tag for (tag,) in rows}
+
+    def used_tags(self) -> set[str]:
+        """:returns: tags used anywhere in the tree, including unwritten"""
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT tag FROM tags").fetchall()
+            tags = {tag for (tag,) in rows}
+            tags.update(*self._unwritten.values())
+        return tags
+
+    def tag_statistics(self) -> dict[str, int]:
+        """:returns: number of files using every tag in the whole tree"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT tag, COUNT(*) FROM tags GROUP BY tag"
+            ).fetchall()
+        return dict(rows)
+
+    def type_statistics(self) -> dict[str, int]:
+        """:returns: number of objects of every type in the whole tree"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT type, SUM(count) FROM counts GROUP BY type"
+            ).fetchall()
+        return dict(rows)
+
+    def annotated(self) -> set[str]:
+        """:returns: relative paths of markup files with any objects"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT DISTINCT path FROM counts WHERE count > 0"
+            ).fetchall()
+        return {path for (path,) in rows}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
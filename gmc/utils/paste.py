@@ -0,0 +1,78 @@
+"""
+Adding copied objects to markup of many files, shared by
+"Paste into files" and `run-gmc batch paste`.
+"""
+
+from __future__ import annotations
+from typing import Any, Callable, Hashable
+from .image import image_size
+from .json import exists, read as read_json, write as write_json
+
+
+def _freeze(value: Any) -> Hashable:
+    """hashable equivalent of parsed json, lists and tuples are the same"""
+    if isinstance(value, dict):
+        return frozenset((key, _freeze(val)) for key, val in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(val) for val in value)
+    return value
+
+
+def paste_objects(
+    markup: dict[str, Any], objects: list[dict[str, Any]]
+) -> int:
+    """
+    Appends `objects` that are not in `markup` yet
+
+    :returns: number of added objects
+    """
+    existing = markup.setdefault("objects", [])
+    seen = {_freeze(obj) for obj in existing}
+    added = 0
+    for obj in objects:
+        key = _freeze(obj)
+        if key not in seen:
+            seen.add(key)
+            existing.append(obj)
+            added += 1
+    return added
+
+
+def paste_into(
+    image_path: str,
+    markup_path: str,
+    objects: list[dict[str, Any]],
+    write: Callable[[str, dict[str, Any]], None] = write_json,
+) -> tuple[int, str | None]:
+    """
+    Pastes `objects` into markup of one image, new markup is created
+    from the image size. Can be called from worker threads, the markup
+    is written before returning
+
+    :returns: number of added objects, error message
+    """
+    markup: Any = None
+    if exists(markup_path):
+        try:
+            markup = read_json(markup_path)
+        except ValueError as e:
+            return 0, f"Failed parsing `{markup_path}`\n{e}"
+        except OSError:
+            pass  # removed meanwhile
+    if markup is None:
+        # only sizes are needed for new markup, so don't decode images
+        size = image_size(image_path)
+        if not size.isValid():
+            return 0, f"Can't read image size of `{image_path}`"
+        markup = {"objects": [], "size": [size.width(), size.height()]}
+    if not isinstance(markup, dict) or not isinstance(
+        markup.get("objects", []), list
+    ):
+        return 0, f"Unexpected markup in `{markup_path}`"
+    added = paste_objects(markup, objects)
+    if added:
+        try:
+            write(markup_path, markup)
+        except OSError as e:
+            return 0, f"Failed writing `{markup_path}`\n{e}"
+    return added, None
@@ -1,9 +1,12 @@
 from __future__ import annotations
+import json
+from copy import deepcopy
 from typing import Any, Iterator, Sequence, TypedDict, Literal, TYPE_CHECKING
 from PyQt5.QtCore import QFileInfo, QDir
-from PyQt5.QtWidgets import QWidget
-from .json import load
+from PyQt5.QtWidgets import QMessageBox, QWidget
+from . import CantOpenMarkup
 from .dicts import dicts_merge
+from .sidecar import sidecars
 
 if TYPE_CHECKING:
     from typing import NotRequired
@@ -92,20 +95,44 @@ def _paths(the_dir: QDir, filename: str, depth: int) -> Iterator[str]:
             break
 
 
+def _read_json(path: str) -> Any:
+    with open(path, "r", encoding="utf-8") as inp:
+        return json.load(inp)
+
+
 def read_properties(
     paths: Sequence[str],
     widget: QWidget,
     filename: str = ".gmc_properties.json",
     depth: int = 6,
 ) -> GMCProperties:
-    ret: GMCProperties = {}
-    for path in paths:
-        the_dir = QFileInfo(path).dir()
-        properties_paths = list(_paths(the_dir, filename, depth))
-        for properties_path in reversed(properties_paths):
-            data = load(properties_path, widget)
-            dicts_merge(ret, data)
-    return ret
+    """
+    Merges `filename` files of `depth` parent directories of every path,
+    the nearest file wins. Doesn't touch the disk until the files change.
+    """
+    dirs = tuple(QFileInfo(path).absolutePath() for path in paths)
+
+    def merge() -> tuple[GMCProperties, tuple[str, ...]]:
+        ret: GMCProperties = {}
+        all_paths: list[str] = []
+        for the_dir in dirs:
+            properties_paths = list(_paths(QDir(the_dir), filename, depth))
+            all_paths.extend(properties_paths)
+            for properties_path in reversed(properties_paths):
+                try:
+                    data = sidecars.get(properties_path, _read_json)
+                except ValueError as e:
+                    msg = f"Failed parsing `{properties_path}`\n{e}"
+                    QMessageBox.warning(widget, "Warning", msg)
+                    raise CantOpenMarkup(msg)
+                except OSError:
+                    continue
+                if data is not None:
+                    dicts_merge(ret, deepcopy(data))
+        return ret, tuple(all_paths)
+
+    # copy, as schemas are free to modify their properties
+    return deepcopy(sidecars.combined((dirs, filename, depth), merge))
 
 
 def prop_schema_for_tags(
@@ -0,0 +1,119 @@
+"""
+Background writing of markup files, so going to the next file doesn't
+wait for slow (network) disks.
+"""
+
+from __future__ import annotations
+import os
+from queue import Queue
+from threading import Lock, Thread
+from typing import Callable
+from PyQt5.QtCore import QCoreApplication, QEvent, QObject, pyqtSignal
+
+
+class SaveQueue(QObject):
+    """
+    Writes files in a single background thread in the order they were
+    queued. By default every file is written with `write_atomically`.
+
+    Write errors are reported with the `failed` signal.
+    """
+
+    failed = pyqtSignal(str, str)  # path, error message
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._queue: Queue[
+            tuple[
+                str,
+                str,
+                Callable[[str, str], None] | None,
+                Callable[[], None] | None,
+            ]
+        ] = Queue()
+        # latest queued text of every path that is not written yet
+        self._pending: dict[str, str] = {}
+        self._lock = Lock()
+        self._thread: Thread | None = None
+
+    def put(
+        self,
+        path: str,
+        text: str,
+        on_written: Callable[[], None] | None = None,
+        write: Callable[[str, str], None] | None = None,
+    ) -> None:
+        """
+        :param on_written: called from the writer thread after successful
+                           writing. Not called when newer text of the same
+                           path is queued
+        :param write: writes text to the path, e.g. `MarkupStorage.write`
+        """
+        with self._lock:
+            self._pending[path] = text
+            if self._thread is None:
+                self._thread = Thread(
+                    target=self._run, name="gmc-save-queue", daemon=True
+                )
+                self._thread.start()
+        self._queue.put((path, text, write, on_written))
+
+    def pending(self, path: str) -> str | None:
+        """:returns: queued text of `path`, it is newer than file content"""
+        with self._lock:
+            return self._pending.get(path)
+
+    def drain(self) -> None:
+        """Blocks until everything is written and failures are reported"""
+        self._queue.join()
+        if QCoreApplication.instance() is not None:
+            QCoreApplication.sendPostedEvents(None, QEvent.Type.MetaCall)
+
+    def _run(self) -> None:
+        while True:
+            path, text, write, on_written = self._queue.get()
+            try:
+                with self._lock:
+                    superseded = self._pending.get(path) is not text
+                if not superseded:  # otherwise newer text is queued
+                    (write or self._write)(path, text)
+                    if on_written is not None:
+                        on_written()
+            except Exception as e:
+                try:
+                    self.failed.emit(path, str(e))
+                except RuntimeError:
+                    pass  # application is finishing
+            finally:
+                with self._lock:
+                    if self._pending.get(path) is text:
+                        del self._pending[path]
+                self._queue.task_done()
+
+    @staticmethod
+    def _write(path: str, text: str) -> None:
+        write_atomically(path, text)
+
+
+def write_atomically(path: str, text: str) -> None:
+    """
+    Writes to a temporary file in the same directory, which then replaces
+    `path`, so readers never see half written files
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            out.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+save_queue = SaveQueue()
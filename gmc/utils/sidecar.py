@@ -0,0 +1,127 @@
+"""
+Cache of small files that live next to images and markup, like
+`.gmc_properties.json` and `tags.txt`. They are needed on every image open
+but almost never change, so they are parsed once and forgotten when
+`QFileSystemWatcher` reports their change.
+"""
+
+from __future__ import annotations
+import os
+from typing import Any, Callable, Hashable
+from PyQt5.QtCore import QCoreApplication, QFileSystemWatcher, QObject
+
+
+class SidecarCache(QObject):
+    """
+    Parsed files by path, and values computed from several of them.
+    When a path can't be watched (e.g. inotify limit), its mtime is
+    checked on every lookup instead.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._watcher: QFileSystemWatcher | None = None
+        self._watched: set[str] = set()
+        self._files: dict[str, Any] = {}  # path -> parsed, `None` if missing
+        # key -> value, contributing paths
+        self._combined: dict[Hashable, tuple[Any, tuple[str, ...]]] = {}
+        self._mtimes: dict[str, float | None] = {}  # of unwatched paths
+
+    def get(self, path: str, parse: Callable[[str], Any]) -> Any:
+        """
+        :param parse: reads the file, its exceptions are not cached
+        :returns: parsed file or `None` when there is no file
+        """
+        if path in self._files and self._is_valid(path):
+            return self._files[path]
+        mtime = _mtime(path)
+        value = None if mtime is None else parse(path)
+        self._files[path] = value
+        if not self._watch(path, exists=mtime is not None):
+            self._mtimes[path] = mtime
+        return value
+
+    def combined(
+        self,
+        key: Hashable,
+        build: Callable[[], tuple[Any, tuple[str, ...]]],
+    ) -> Any:
+        """
+        :param build: returns value and paths it was built from
+        :returns: cached result of `build`
+        """
+        entry = self._combined.get(key)
+        if entry is not None and all(map(self._is_valid, entry[1])):
+            return entry[0]
+        value, paths = build()
+        self._combined[key] = (value, paths)
+        return value
+
+    def clear(self) -> None:
+        self._files.clear()
+        self._combined.clear()
+        self._mtimes.clear()
+        if self._watched and self._watcher is not None:
+            self._watcher.removePaths(list(self._watched))
+        self._watched.clear()
+
+    def _is_valid(self, path: str) -> bool:
+        if path not in self._files:
+            return False
+        return path not in self._mtimes or self._mtimes[path] == _mtime(path)
+
+    def _watch(self, path: str, exists: bool) -> bool:
+        """:returns: `True` when changes of `path` will be reported"""
+        if self._watcher is None:
+            if QCoreApplication.instance() is None:
+                return False
+            self._watcher = QFileSystemWatcher(self)
+            self._watcher.fileChanged.connect(self._on_file_changed)
+            self._watcher.directoryChanged.connect(self._on_dir_changed)
+        paths = [os.path.dirname(path)]  # to know when the file appears
+        if exists:
+            paths.append(path)
+        for watched_path in paths:
+            if watched_path not in self._watched:
+                if not self._watcher.addPath(watched_path):
+                    return False
+                self._watched.add(watched_path)
+        return True
+
+    def _forget(self, path: str) -> None:
+        self._files.pop(path, None)
+        self._mtimes.pop(path, None)
+        for key, (_value, paths) in list(self._combined.items()):
+            if path in paths:
+                del self._combined[key]
+
+    def _on_file_changed(self, path: str) -> None:
+        self._forget(path)
+        self._watched.discard(path)  # watcher drops removed files
+        if self._watcher is not None:
+            self._watcher.removePath(path)
+
+    def _on_dir_changed(self, directory: str) -> None:
+        # markup is written to the same directories, so only appearing and
+        # disappearing sidecars matter
+        for path, value in list(self._files.items()):
+            if os.path.dirname(path) != directory:
+                continue
+            if (value is None) != (_mtime(path) is None):
+                self._forget(path)
+
+
+def _mtime(path: str) -> float | None:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+sidecars = SidecarCache()
+
+
+def read_lines(path: str) -> set[str]:
+    """Parser of `tags.txt` like files: set of non-empty lines"""
+    with open(path, "r") as f:
+        return set(filter(None, (line.strip() for line in f)))
@@ -0,0 +1,394 @@
+"""
+Markup storage backends. `FileStorage` keeps one json file per image,
+`JsonLinesStorage` keeps all markup of a directory in one append-only file,
+which is much easier on filesystems with millions of files.
+
+Paths are always the paths of per image json files, so schemas don't
+depend on the backend.
+"""
+
+from __future__ import annotations
+import json
+import os
+from threading import Lock
+from typing import Any, Iterator
+
+from .save_queue import write_atomically
+
+Version = tuple[float, int]  # changes on every write (mtime, size)
+
+
+class MarkupStorage:
+    """Base class of storages. Every method can be called from any thread"""
+
+    name = ""
+
+    def serialize(self, data: Any) -> str:
+        raise NotImplementedError
+
+    def read(self, path: str) -> str:
+        """:raises OSError: when there is no markup"""
+        raise NotImplementedError
+
+    def write(self, path: str, text: str) -> None:
+        """Called by `save_queue` writer thread"""
+        raise NotImplementedError
+
+    def exists(self, path: str) -> bool:
+        return self.version(path) is not None
+
+    def version(self, path: str) -> Version | None:
+        raise NotImplementedError
+
+    def scan(
+        self, directory: str, recursive: bool = True
+    ) -> Iterator[tuple[str, Version]]:
+        """:returns: markup paths and their versions"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class FileStorage(MarkupStorage):
+    name = "files"
+    SUFFIX = ".json"
+
+    def serialize(self, data: Any) -> str:
+        from .json import GMCJSONEncoder
+
+        return json.dumps(
+            data,
+            allow_nan=False,
+            sort_keys=True,
+            ensure_ascii=False,
+            cls=GMCJSONEncoder,
+        )
+
+    def read(self, path: str) -> str:
+        with open(path, "r", encoding="utf-8") as inp:
+            return inp.read()
+
+    def write(self, path: str, text: str) -> None:
+        write_atomically(path, text)
+
+    def version(self, path: str) -> Version | None:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def scan(
+        self, directory: str, recursive: bool = True
+    ) -> Iterator[tuple[str, Version]]:
+        for entry in _walk(directory, recursive):
+            # hidden files like `.gmc_properties.json` are not markup
+            if entry.name.endswith(self.SUFFIX) and not _is_hidden(entry.name):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                yield entry.path, (stat.st_mtime, stat.st_size)
+
+
+def _is_hidden(name: str) -> bool:
+    return name.startswith(".")
+
+
+def _walk(directory: str, recursive: bool) -> Iterator[os.DirEntry[str]]:
+    """files of `directory`, hidden directories are skipped"""
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return
+    for entry in entries:
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                if recursive and not _is_hidden(entry.name):
+                    yield from _walk(entry.path, recursive)
+            else:
+                yield entry
+        except OSError:
+            continue
+
+
+class _Store:
+    """
+    One `.gmc_markup.jsonl` file. Every line is
+    `{"name":"<file name>","markup":<compact json>}`, the latest line of
+    a name wins. `.idx` file next to it caches offsets, so opening a store
+    reads only lines appended after the index was saved.
+
+    Lines are numbered by a counter of appends, which is kept when the
+    store is compacted, so versions of records survive compaction.
+    """
+
+    SAVE_INDEX_EVERY = 64  # appends
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.index_path = path + ".idx"
+        self.lock = Lock()
+        # name -> offset, size, number of the append
+        self.records: dict[str, tuple[int, int, int]] = {}
+        self.size = 0  # bytes covered by `records`
+        self.appends = 0  # number of the last append
+        self.garbage = 0  # bytes of overwritten records
+        self._unsaved = 0
+        self._load_index()
+        self._read_tail()
+
+    @staticmethod
+    def prefix(name: str) -> bytes:
+        return b'{"name":' + json.dumps(name).encode() + b',"markup":'
+
+    def _load_index(self) -> None:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as inp:
+                index = json.load(inp)
+            size, garbage = int(index["size"]), int(index["garbage"])
+            # indexes without numbers used offsets as versions
+            appends = int(index.get("appends", size))
+            records: dict[str, tuple[int, int, int]] = {}
+            for name, (offset, length, *number) in index["records"].items():
+                number = number[0] if number else offset
+                records[name] = (int(offset), int(length), int(number))
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        try:
+            actual_size = os.path.getsize(self.path)
+        except OSError:
+            actual_size = 0
+        if size <= actual_size:
+            self.records, self.size, self.garbage = records, size, garbage
+            self.appends = appends
+
+    def _read_tail(self) -> None:
+        try:
+            inp = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        decoder = json.JSONDecoder()
+        with inp:
+            inp.seek(self.size)
+            offset = self.size
+            for line in inp:
+                if not line.endswith(b"\n"):
+                    break  # interrupted append, overwritten by the next one
+                try:
+                    name, _end = decoder.raw_decode(line.decode(), 8)
+                except (ValueError, UnicodeDecodeError):
+                    name = None
+                if isinstance(name, str):
+                    previous = self.records.get(name)
+                    if previous is not None:
+                        self.garbage += previous[1]
+                    self.appends += 1
+                    self.records[name] = (offset, len(line), self.appends)
+                offset += len(line)
+            self.size = offset
+            self._unsaved += 1
+
+    def save_index(self) -> None:
+        index = {
+            "size": self.size,
+            "garbage": self.garbage,
+            "appends": self.appends,
+            "records": self.records,
+        }
+        try:
+            write_atomically(self.index_path, json.dumps(index))
+        except OSError:
+            pass  # index is only an optimization
+        self._unsaved = 0
+
+    def read(self, name: str) -> str:
+        # under the lock, so compaction can't move the record meanwhile
+        with self.lock:
+            record = self.records.get(name)
+            if record is None:
+                raise FileNotFoundError(f"no `{name}` in `{self.path}`")
+            offset, length, _number = record
+            with open(self.path, "rb") as inp:
+                inp.seek(offset)
+                line = inp.read(length)
+        return line[len(self.prefix(name)) : -2].decode()
+
+    def version(self, name: str) -> Version | None:
+        with self.lock:
+            record = self.records.get(name)
+        return None if record is None else (float(record[2]), record[1])
+
+    def append(self, name: str, text: str) -> None:
+        line = self.prefix(name) + text.encode() + b"}\n"
+        with self.lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, "ab") as out:
+                out.seek(0, os.SEEK_END)
+                offset = out.tell()
+                out.write(line)
+            previous = self.records.get(name)
+            if previous is not None:
+                self.garbage += previous[1]
+            self.appends += 1
+            self.records[name] = (offset, len(line), self.appends)
+            self.size = offset + len(line)
+            self._unsaved += 1
+            if self.garbage > max(1 << 20, self.size - self.garbage):
+                self._compact()
+            elif self._unsaved >= self.SAVE_INDEX_EVERY:
+                self.save_index()
+
+    def _compact(self) -> None:
+        """Rewrites the store with the latest records only"""
+        records: dict[str, tuple[int, int, int]] = {}
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(self.path, "rb") as inp, open(tmp_path, "wb") as out:
+            for name, (offset, length, number) in sorted(
+                self.records.items(), key=lambda item: item[1][0]
+            ):
+                inp.seek(offset)
+                records[name] = (out.tell(), length, number)
+                out.write(inp.read(length))
+            size = out.tell()
+        os.replace(tmp_path, self.path)
+        self.records, self.size, self.garbage = records, size, 0
+        self.save_index()
+
+    def compact(self) -> None:
+        with self.lock:
+            self._compact()
+
+
+class JsonLinesStorage(MarkupStorage):
+    name = "jsonl"
+    STORE_NAME = ".gmc_markup.jsonl"
+
+    def __init__(self) -> None:
+        self._stores: dict[str, _Store] = {}
+        self._lock = Lock()
+
+    def _store(self, directory: str) -> _Store:
+        directory = os.path.abspath(directory)
+        with self._lock:
+            store = self._stores.get(directory)
+            if store is None:
+                store = self._stores[directory] = _Store(
+                    os.path.join(directory, self.STORE_NAME)
+                )
+            return store
+
+    def _split(self, path: str) -> tuple[_Store, str]:
+        directory, name = os.path.split(path)
+        return self._store(directory), name
+
+    def serialize(self, data: Any) -> str:
+        return json.dumps(
+            data,
+            allow_nan=False,
+            sort_keys=True,
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    def read(self, path: str) -> str:
+        store, name = self._split(path)
+        return store.read(name)
+
+    def write(self, path: str, text: str) -> None:
+        store, name = self._split(path)
+        store.append(name, text)
+
+    def version(self, path: str) -> Version | None:
+        store, name = self._split(path)
+        return store.version(name)
+
+    def scan(
+        self, directory: str, recursive: bool = True
+    ) -> Iterator[tuple[str, Version]]:
+        for entry in _walk(directory, recursive):
+            if entry.name == self.STORE_NAME:
+                parent = os.path.dirname(entry.path)
+                store = self._store(parent)
+                with store.lock:
+                    records = list(store.records.items())
+                for name, (_offset, length, number) in records:
+                    if _is_hidden(name):  # copied by older `convert`
+                        continue
+                    yield os.path.join(parent, name), (float(number), length)
+
+    def compact(self, directory: str) -> None:
+        self._store(directory).compact()
+
+    def close(self) -> None:
+        with self._lock:
+            stores = list(self._stores.values())
+        for store in stores:
+            with store.lock:
+                if store._unsaved:
+                    store.save_index()
+
+
+STORAGES: dict[str, type[MarkupStorage]] = {
+    FileStorage.name: FileStorage,
+    JsonLinesStorage.name: JsonLinesStorage,
+}
+_current: MarkupStorage = FileStorage()
+
+
+def storage() -> MarkupStorage:
+    """:returns: storage of the current session"""
+    return _current
+
+
+def set_storage(name: str) -> MarkupStorage:
+    global _current
+    if _current.name != name:
+        _current.close()
+        _current = STORAGES[name]()
+    return _current
+
+
+def convert(root: str, source: MarkupStorage, target: MarkupStorage) -> int:
+    """
+    Copies all markup under `root` from `source` to `target` storage.
+    Source markup is kept.
+
+    :returns: number of converted markup files
+    """
+    count = 0
+    for path, _version in source.scan(root):
+        try:
+            data = json.loads(source.read(path))
+        except (OSError, ValueError) as e:
+            print(f"skipping {path}: {e}")
+            continue
+        target.write(path, target.serialize(data))
+        count += 1
+    target.close()
+    return count
+
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        "python -m gmc.utils.storage",
+        description="Convert markup between storages",
+    )
+    parser.add_argument("root", help="root of markup dir")
+    parser.add_argument("--from", dest="source", choices=STORAGES)
+    parser.add_argument("--to", dest="target", choices=STORAGES, required=True)
+    args = parser.parse_args()
+    source_name = args.source or next(
+        name for name in STORAGES if name != args.target
+    )
+    count = convert(
+        args.root, STORAGES[source_name](), STORAGES[args.target]()
+    )
+    print(f"converted {count} markup files")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,25 @@
 from __future__ import annotations
-from typing import Any, Callable, TYPE_CHECKING
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, TYPE_CHECKING
+from math import floor, log
+from os.path import getmtime
 from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtCore import QPointF
 
 from ..graphics import chess
 from ..utils import new_action, get_icon, tr, clipboard
 from ..settings import settings
+from ..utils.image import (
+    huge_image_size,
+    image_cache,
+    load_pixmap,
+    read_image,
+    read_preview,
+    window_level,
+    WindowLevel,
+)
+from .tiled_image import TiledImageItem
+from .window_level import WindowLevelDialog
 
 Qt = QtCore.Qt
 
@@ -31,20 +45,111 @@ class MarkupScene(QtWidgets.QGraphicsScene):
     }
     _current_object: MarkupObjectMeta | None = None
 
-    # False: don't try to show cursor
-    # None: cursor not on window
-    # QPointF: draw cursor
-    _cross_pos: QPointF | bool | None = False
-    _cross_pen = QtGui.QPen(
-        QtGui.QColor(255, 32, 32, 224), 0.0, Qt.PenStyle.CustomDashLine
-    )
-    _cross_pen.setDashPattern([16, 8])
+    # items changed by undo/redo or `mark_changed`. `None` when unknown,
+    # empty list when only the markup itself (e.g. its properties) changed
+    markup_changed = QtCore.pyqtSignal(object)
+
+    # with fewer top level items a linear search is faster than keeping
+    # a BSP tree up to date. Half as many switch the index off again
+    INDEX_THRESHOLD = 200
+    # changing this many items at once is done without the index, it is
+    # rebuilt once afterwards instead of being updated for every item
+    BULK_EDIT_ITEMS = 64
 
     def __init__(self, parent: QtCore.QObject) -> None:
         super().__init__(parent)
         self.undo_stack = QtWidgets.QUndoStack(self, undoLimit=8192)
+        self._undo_index = 0
+        self.undo_stack.indexChanged.connect(self._on_undo_index_changed)
+        # markup changes that are not on the undo stack
+        self._revision = self._saved_revision = 0
         self.selectionChanged.connect(self._on_selection_changed)
+        self._item_count = 0  # top level items
+        self._indexed = False  # `_item_count` is large enough for the index
+        self._index_suspended = 0
+        self._drag_suspended: bool | None = None  # decided on first move
         self.setItemIndexMethod(self.ItemIndexMethod.NoIndex)
+        # zoom of the view, and the same rounded down to a power of 4.
+        # Items that are `screen_sized` are indexed with bounding rects
+        # for `item_scale`, so zooming rarely changes them
+        self.view_scale = self.item_scale = 1.0
+
+    def addItem(self, item: QtWidgets.QGraphicsItem) -> None:
+        if item.scene() is not self:
+            if item.parentItem() is None:
+                self._item_count += 1
+            if getattr(item, "screen_sized", False):
+                item.prepareGeometryChange()  # scale could change meanwhile
+        super().addItem(item)
+        self._update_index_method()
+
+    def removeItem(self, item: QtWidgets.QGraphicsItem) -> None:
+        if item.scene() is self and item.parentItem() is None:
+            self._item_count -= 1
+        super().removeItem(item)
+        self._update_index_method()
+
+    def clear(self) -> None:
+        super().clear()
+        self._item_count = 0
+        self._update_index_method()
+
+    def suspend_index(self) -> None:
+        """
+        Stops indexing items until `resume_index`, for changing many items
+        or adding them over several event loop iterations
+        """
+        self._index_suspended += 1
+        self._update_index_method()
+
+    def resume_index(self) -> None:
+        assert self._index_suspended > 0
+        self._index_suspended -= 1
+        self._update_index_method()
+
+    @contextmanager
+    def bulk_edit(self, count: int) -> Iterator[None]:
+        """Suspends indexing when `count` items are going to change"""
+        if count < self.BULK_EDIT_ITEMS:
+            yield
+            return
+        self.suspend_index()
+        try:
+            yield
+        finally:
+            self.resume_index()
+
+    def set_view_scale(self, scale: float) -> None:
+        self.view_scale = scale
+        item_scale = 4.0 ** floor(log(scale, 4.0))
+        if item_scale == self.item_scale:
+            return
+        # while `item_scale` is old, so the index removes old rects
+        self.update_geometry(screen_sized_only=True)
+        self.item_scale = item_scale
+
+    def update_geometry(self, screen_sized_only: bool = False) -> None:
+        """Call when bounding rects of items changed not by themselves"""
+        with self.bulk_edit(self._item_count):
+            for item in self.items():
+                if not screen_sized_only or getattr(
+                    item, "screen_sized", False
+                ):
+                    item.prepareGeometryChange()
+
+    def _update_index_method(self) -> None:
+        count = self._item_count
+        if count >= self.INDEX_THRESHOLD:
+            self._indexed = True
+        elif count < self.INDEX_THRESHOLD // 2:
+            self._indexed = False
+        Method = self.ItemIndexMethod
+        if self._indexed and not self._index_suspended:
+            method = Method.BspTreeIndex
+        else:
+            method = Method.NoIndex
+        if self.itemIndexMethod() != method:
+            self.setItemIndexMethod(method)
 
     def mouseDoubleClickEvent(
         self, event: QtWidgets.QGraphicsSceneMouseEvent
@@ -58,33 +163,27 @@ class MarkupScene(QtWidgets.QGraphicsScene):
     def mouseMoveEvent(
         self, event: QtWidgets.QGraphicsSceneMouseEvent
     ) -> None:
-        if self._cross_pos is not False:
-            self._cross_pos = event.scenePos()
-            self.invalidate(QtCore.QRectF(), self.SceneLayer.ForegroundLayer)
+        if (
+            self._drag_suspended is None
+            and event.buttons() & Qt.MouseButton.LeftButton
+            and self.mouseGrabberItem() is not None
+        ):
+            # dragging moves every selected item
+            self._drag_suspended = (
+                len(self.selectedItems()) >= self.BULK_EDIT_ITEMS
+            )
+            if self._drag_suspended:
+                self.suspend_index()
         super().mouseMoveEvent(event)
 
-    def drawForeground(
-        self, painter: QtGui.QPainter, rect: QtCore.QRectF
+    def mouseReleaseEvent(
+        self, event: QtWidgets.QGraphicsSceneMouseEvent
     ) -> None:
-        coords = self._cross_pos
-        if type(coords) is not QPointF:
-            return
-        painter.setClipRect(rect)
-        painter.setPen(self._cross_pen)
-        painter.drawLine(
-            QPointF(coords.x(), rect.top() - 24 + coords.y() % 24),
-            QPointF(coords.x(), rect.bottom()),
-        )
-        painter.drawLine(
-            QPointF(rect.left() + coords.x() % 24 - 24, coords.y()),
-            QPointF(rect.right(), coords.y()),
-        )
-
-    def event(self, event: QtCore.QEvent) -> bool:
-        if event.type() == event.Type.Leave and self._cross_pos is not False:
-            self._cross_pos = None
-            self.invalidate(QtCore.QRectF(), self.SceneLayer.ForegroundLayer)
-        return super().event(event)
+        super().mouseReleaseEvent(event)
+        if not event.buttons() & Qt.MouseButton.LeftButton:
+            if self._drag_suspended:
+                self.resume_index()
+            self._drag_suspended = None
 
     def keyPressEvent(self, event: QtGui.QKeyEvent) -> None:
         selected = self.selectedItems()
@@ -105,7 +204,7 @@ class MarkupScene(QtWidgets.QGraphicsScene):
                     else:
                         item.setPos(item.pos() + vec)
                 if moved:
-                    self.undo_stack.push(UndoObjectsMovement(moved, vec))
+                    self.undo_stack.push(UndoObjectsMovement(self, moved, vec))
                 return
         super().keyPressEvent(event)
 
@@ -130,42 +229,163 @@ class MarkupScene(QtWidgets.QGraphicsScene):
             self._current_object.ensure_edition_canceled()
         self._current_object = markup_object
 
-    def show_cross_cursor(self, pos: QPointF | None) -> None:
-        self._cross_pos = pos
-        self.invalidate(QtCore.QRectF(), self.SceneLayer.ForegroundLayer)
-
-    def hide_cross_cursor(self) -> None:
-        if self._cross_pos is not False:
-            self._cross_pos = False
-            self.invalidate(QtCore.QRectF(), self.SceneLayer.ForegroundLayer)
-
     def add_undo_delete(self, deleted_items: list[QtWidgets.QGraphicsItem]):
         self.undo_stack.push(UndoObjectsDelete(self, deleted_items))
 
+    def _on_undo_index_changed(self, index: int) -> None:
+        previous, self._undo_index = self._undo_index, index
+        stack = self.undo_stack
+        if index == previous:  # pushed command was merged into the last one
+            commands = [stack.command(index - 1)]
+        else:
+            commands = [
+                stack.command(i)
+                for i in range(min(index, previous), max(index, previous))
+            ]
+        items: list[QtWidgets.QGraphicsItem] | None = []
+        for command in commands:
+            touched = getattr(command, "touched", None)
+            if touched is None:
+                items = None
+                break
+            items.extend(touched())
+        self.markup_changed.emit(items)
+
+    def mark_changed(
+        self, items: list[QtWidgets.QGraphicsItem] | None = None
+    ) -> None:
+        """Call on markup modifications that don't go to `undo_stack`"""
+        self._revision += 1
+        self.markup_changed.emit(items)
+
+    def has_changes(self) -> bool:
+        """:returns: whether markup changed since `mark_saved`, in O(1)"""
+        return (
+            self._revision != self._saved_revision
+            or not self.undo_stack.isClean()
+        )
+
+    def mark_saved(self) -> None:
+        self.undo_stack.setClean()
+        self._saved_revision = self._revision
+
+    def reset_changes(self) -> None:
+        """New markup is opened, undo history is of no use anymore"""
+        self.undo_stack.indexChanged.disconnect(self._on_undo_index_changed)
+        self.undo_stack.clear()
+        self.undo_stack.indexChanged.connect(self._on_undo_index_changed)
+        self._undo_index = 0
+        self._saved_revision = self._revision
+
 
 # should return `True` when the event is accepted
 MouseCallback = Callable[[QtGui.QMouseEvent, "ImageView"], bool]
 CancelCallback = Callable[["ImageView"], None]
 
 
+class _FullImageJob(QtCore.QRunnable):
+    def __init__(self, view: ImageView, generation: int, path: str) -> None:
+        super().__init__()
+        self._view = view
+        self._generation = generation
+        self._path = path
+
+    def run(self) -> None:
+        try:
+            mtime = getmtime(self._path)
+            image = read_image(self._path)
+        except (OSError, ValueError):
+            mtime, image = 0.0, QtGui.QImage()
+        try:
+            self._view._full_image_decoded.emit(
+                self._generation, self._path, mtime, image
+            )
+        except RuntimeError:
+            pass  # view was closed
+
+
+class CrossCursor(QtWidgets.QWidget):
+    """
+    Dashed lines through the mouse position. Drawn on a transparent widget
+    over the viewport, so moving the mouse repaints two lines of pixels
+    instead of the whole scene
+    """
+
+    _pen = QtGui.QPen(
+        QtGui.QColor(255, 32, 32, 224), 0.0, Qt.PenStyle.CustomDashLine
+    )
+    _pen.setDashPattern([16, 8])
+
+    def __init__(self, parent: QtWidgets.QWidget) -> None:
+        super().__init__(parent)
+        self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self._pos: QtCore.QPoint | None = None  # `None` when not on window
+        self.hide()
+
+    def set_pos(self, pos: QtCore.QPoint | None) -> None:
+        if pos == self._pos:
+            return
+        old, self._pos = self._pos, pos
+        if not self.isVisible():
+            return
+        # vertical and horizontal lines are repainted separately, because
+        # the scene is repainted in the bounding rect of the update region
+        vertical, horizontal = QtCore.QRect(), QtCore.QRect()
+        for p in old, pos:
+            if p is not None:
+                vertical |= QtCore.QRect(p.x(), 0, 1, self.height())
+                horizontal |= QtCore.QRect(0, p.y(), self.width(), 1)
+        for rect in vertical, horizontal:
+            if not rect.isNull():
+                self.repaint(rect)
+
+    def paintEvent(self, event: QtGui.QPaintEvent) -> None:
+        if self._pos is None:
+            return
+        x, y = self._pos.x(), self._pos.y()
+        painter = QtGui.QPainter(self)
+        painter.setPen(self._pen)
+        # dashes start at the cursor, so they don't crawl along the lines
+        painter.drawLine(x, y % 24 - 24, x, self.height())
+        painter.drawLine(x % 24 - 24, y, self.width(), y)
+
+
 class ImageView(QtWidgets.QGraphicsView):
     _scene_padding_px = 20
+    _full_image_decoded = QtCore.pyqtSignal(int, str, float, QtGui.QImage)
 
     def __init__(self):
         super().__init__(
             contextMenuPolicy=Qt.ActionsContextMenu,
             cacheMode=self.CacheBackground,
-            viewportUpdateMode=self.FullViewportUpdate,
+            viewportUpdateMode=self.SmartViewportUpdate,
             transformationAnchor=self.AnchorUnderMouse,
             resizeAnchor=self.AnchorViewCenter,
             focusPolicy=Qt.WheelFocus,
         )  # type: ignore
         self._update_settings()
+        self._image_generation = 0
+        self._preview_item: QtWidgets.QGraphicsPixmapItem | None = None
+        self._full_image_decoded.connect(self._on_full_image)
+        # display mapping of 16 bit and float images
+        self._window_level: WindowLevel | None = None
+        self._window_item: QtWidgets.QGraphicsPixmapItem | None = None
+        # user chosen window, kept while going through images
+        self._window: tuple[float, float, float] | None = None
+        self._window_dialog: WindowLevelDialog | None = None
         self._scene = MarkupScene(self)
         self.setScene(self._scene)
+        self._cross_cursor = CrossCursor(self)
         self.addAction(
             QtWidgets.QAction(tr("Debug"), self, triggered=self._debug)
         )
+        self.window_level_action = QtWidgets.QAction(
+            tr("Window/Level…"),
+            self,
+            triggered=self._show_window_level,
+            enabled=False,
+        )
+        self.addAction(self.window_level_action)
         KS = QtGui.QKeySequence
 
         self.delete_action = new_action(
@@ -235,6 +455,9 @@ class ImageView(QtWidgets.QGraphicsView):
     def _update_settings(self):
         self.setFont(settings.font_label)
         self.setBackgroundBrush(chess(16, settings.bg_1, settings.bg_2))
+        scene = self.scene()
+        if scene is not None:  # sizes of labels and pens might change
+            scene.update_geometry()
         self.update()
 
     def unset_all_events(self) -> None:
@@ -274,16 +497,19 @@ class ImageView(QtWidgets.QGraphicsView):
 
     def _delete(self) -> None:
         deleted_items: list[MarkupObjectMeta] = []
-        for item in self._scene.selectedItems():
-            # we delete even `MoveableDiamond` because how otherwise delete it
-            if hasattr(item, "delete"):
-                # we check that item's scene exists, because `delete` method
-                # can remove other selected items.
-                if item.delete() and item.scene():
-                    item.ensure_edition_canceled()
-                    self._scene.removeItem(item)
-                    if isinstance(item, MarkupObjectMeta):
-                        deleted_items.append(item)
+        selected = self._scene.selectedItems()
+        with self._scene.bulk_edit(len(selected)):
+            for item in selected:
+                # we delete even `MoveableDiamond` because how otherwise
+                # delete it
+                if hasattr(item, "delete"):
+                    # we check that item's scene exists, because `delete`
+                    # method can remove other selected items.
+                    if item.delete() and item.scene():
+                        item.ensure_edition_canceled()
+                        self._scene.removeItem(item)
+                        if isinstance(item, MarkupObjectMeta):
+                            deleted_items.append(item)
         if deleted_items:
             self._scene.add_undo_delete(deleted_items)
 
@@ -317,19 +543,120 @@ class ImageView(QtWidgets.QGraphicsView):
     def _debug(self) -> None:
         print("debug", self._scene.items())
 
+    def set_image(self, path: str) -> QtCore.QSize:
+        """
+        Shows image file. Huge images are shown tiled, so only the visible
+        part is decoded and uploaded. Big images are shown downscaled first
+        and replaced when full resolution decoding finishes. Scene units are
+        always full resolution pixels, so markup is editable right away.
+        16 bit and float `.npy` images are shown through adjustable
+        window/level mapping.
+
+        :returns: full resolution size of the image
+        """
+        size = huge_image_size(path)
+        if size is not None:
+            self._set_image_item(TiledImageItem(path, size), size)
+            return size
+        window = window_level(path)
+        if window is not None:
+            if self._window is not None:
+                window.set_window(*self._window)
+            item = self.set_pixmap(QtGui.QPixmap.fromImage(window.render()[0]))
+            self._window_level, self._window_item = window, item
+            self.window_level_action.setEnabled(True)
+            if self._window_dialog is not None:
+                self._window_dialog.set_window_level(window)
+            return item.pixmap().size()
+        preview = None if path in image_cache else read_preview(path)
+        if preview is None:
+            pixmap = load_pixmap(path)
+            self.set_pixmap(pixmap)
+            return pixmap.size()
+        image, size = preview
+        item = QtWidgets.QGraphicsPixmapItem(QtGui.QPixmap.fromImage(image))
+        item.no_doubleclick = True
+        item.setTransformationMode(Qt.TransformationMode.SmoothTransformation)
+        item.setTransform(
+            QtGui.QTransform.fromScale(
+                size.width() / image.width(), size.height() / image.height()
+            )
+        )
+        self._set_image_item(item, size)
+        self._preview_item = item
+        QtCore.QThreadPool.globalInstance().start(
+            _FullImageJob(self, self._image_generation, path)
+        )
+        return size
+
+    def _on_full_image(
+        self, generation: int, path: str, mtime: float, image: QtGui.QImage
+    ) -> None:
+        if image.isNull():
+            if generation == self._image_generation:
+                load_pixmap(path)  # shows the error
+            return
+        pixmap = QtGui.QPixmap.fromImage(image)
+        image_cache.put(path, mtime, pixmap)
+        if generation == self._image_generation:
+            item = self._preview_item
+            item.setPixmap(pixmap)
+            item.setTransform(QtGui.QTransform())
+            item.setTransformationMode(
+                Qt.TransformationMode.FastTransformation
+            )
+            self._preview_item = None
+
+    def _show_window_level(self) -> None:
+        if self._window_level is None:
+            return
+        if self._window_dialog is None:
+            dialog = WindowLevelDialog(self, self._window_level)
+            dialog.changed.connect(self._set_window)
+            dialog.auto_requested.connect(self._auto_window)
+            self._window_dialog = dialog
+        self._window_dialog.show()
+        self._window_dialog.raise_()
+
+    def _set_window(self, lo: float, hi: float, gamma: float) -> None:
+        self._window = (lo, hi, gamma)
+        window = self._window_level
+        if window is not None:
+            window.set_window(lo, hi, gamma)
+            image, _memory = window.render()
+            self._window_item.setPixmap(QtGui.QPixmap.fromImage(image))
+
+    def _auto_window(self) -> None:
+        window = self._window_level
+        if window is not None:
+            self._set_window(*window.auto_window(), 1.0)
+            self._window = None  # every next image gets its own window
+            self._window_dialog.set_window_level(window)
+
     def set_pixmap(
         self, pixmap: QtGui.QPixmap
     ) -> QtWidgets.QGraphicsPixmapItem:
+        item = QtWidgets.QGraphicsPixmapItem(pixmap)
+        item.no_doubleclick = True
+        self._set_image_item(item, pixmap.size())
+        return item
+
+    def _set_image_item(
+        self, item: QtWidgets.QGraphicsItem, size: QtCore.QSize
+    ) -> None:
         self.unset_all_events()
         self._scene.set_current_markup_object(None)
         first_time = self._scene.sceneRect().isNull()
+        self._image_generation += 1
+        self._preview_item = None
+        self._window_level = self._window_item = None
+        self.window_level_action.setEnabled(False)
         self._scene.clear()
-        item = QtWidgets.QGraphicsPixmapItem(pixmap)
-        item.no_doubleclick = True
+        self._scene.reset_changes()
         self._scene.addItem(item)
         p = self._scene_padding_px
         self._scene.setSceneRect(
-            -p, -p, pixmap.width() + p * 2, pixmap.height() + p * 2
+            -p, -p, size.width() + p * 2, size.height() + p * 2
         )
         force_auto_zoom = self._auto_zoom_act.isChecked()
         if force_auto_zoom:
@@ -343,7 +670,6 @@ class ImageView(QtWidgets.QGraphicsView):
                 self._auto_zoom(True)
             elif zoom != 100:
                 self._scale_view(zoom / 100.0)
-        return item
 
     def get_zoom_actions(
         self,
@@ -389,6 +715,7 @@ class ImageView(QtWidgets.QGraphicsView):
             p = self._scene_padding_px
             rc = self._scene.sceneRect().adjusted(p, p, -p, -p)
             self.fitInView(rc, Qt.AspectRatioMode.KeepAspectRatio)
+            self._scene.set_view_scale(self.transform().m11())
 
     def mousePressEvent(self, event: QtGui.QMouseEvent) -> None:
         if event.button() == Qt.MouseButton.RightButton:
@@ -426,9 +753,19 @@ class ImageView(QtWidgets.QGraphicsView):
             super().mouseReleaseEvent(event)
 
     def mouseMoveEvent(self, event: QtGui.QMouseEvent) -> None:
+        if self._cross_cursor.isVisible():
+            self._cross_cursor.set_pos(event.pos())
         if not self._current_mouse_move(event, self):
             super().mouseMoveEvent(event)
 
+    def viewportEvent(self, event: QtCore.QEvent) -> bool:
+        Type = QtCore.QEvent.Type
+        if event.type() == Type.Leave:
+            self._cross_cursor.set_pos(None)
+        elif event.type() == Type.Resize:
+            self._cross_cursor.setGeometry(self.viewport().geometry())
+        return super().viewportEvent(event)
+
     def wheelEvent(self, event: QtGui.QWheelEvent) -> None:
         if event.modifiers() & Qt.KeyboardModifier.ControlModifier:
             self._scale_view(2.0 ** (event.angleDelta().y() / 240.0))
@@ -451,12 +788,14 @@ class ImageView(QtWidgets.QGraphicsView):
             and new_factor < current_factor
         ):
             self.scale(factor, factor)
+            self._scene.set_view_scale(self.transform().m11())
 
     def _set_scale(self, scale: float) -> None:
         old_matrix = self.transform()
         self.resetTransform()
         self.translate(old_matrix.dx(), old_matrix.dy())
         self.scale(scale, scale)
+        self._scene.set_view_scale(scale)
 
     @staticmethod
     def _dummy_mouse_move(
@@ -510,15 +849,16 @@ class ImageView(QtWidgets.QGraphicsView):
             QtCore.QTimer.singleShot(0, lambda: self.mousePressEvent(p_event))
 
     def show_cross_cursor(self):
-        pos = self.mapFromGlobal(QtGui.QCursor.pos())
-        if self.rect().contains(pos):
-            pos = self.mapToScene(pos)
-        else:
-            pos = None
-        self.scene().show_cross_cursor(pos)
+        viewport = self.viewport()
+        pos = viewport.mapFromGlobal(QtGui.QCursor.pos())
+        cross_cursor = self._cross_cursor
+        cross_cursor.setGeometry(viewport.geometry())
+        cross_cursor.show()
+        cross_cursor.raise_()
+        cross_cursor.set_pos(pos if viewport.rect().contains(pos) else None)
 
     def hide_cross_cursor(self):
-        self.scene().hide_cross_cursor()
+        self._cross_cursor.hide()
 
     if TYPE_CHECKING:
 
@@ -527,40 +867,54 @@ class ImageView(QtWidgets.QGraphicsView):
 
 class UndoObjectsMovement(QtWidgets.QUndoCommand):
     def __init__(
-        self, items: list[QtWidgets.QGraphicsItem], vec: QPointF
+        self,
+        scene: MarkupScene,
+        items: list[QtWidgets.QGraphicsItem],
+        vec: QPointF,
     ) -> None:
+        self._scene = scene
         self._items = items
         self._prev_poses = [item.pos() for item in items]
         self._vec = vec
         super().__init__(tr("Movement"))
 
+    def touched(self) -> list[QtWidgets.QGraphicsItem]:
+        return self._items
+
     def redo(self) -> None:
-        for item, pos in zip(self._items, self._prev_poses):
-            item.setPos(pos + self._vec)
+        with self._scene.bulk_edit(len(self._items)):
+            for item, pos in zip(self._items, self._prev_poses):
+                item.setPos(pos + self._vec)
 
     def undo(self) -> None:
-        for item, pos in zip(self._items, self._prev_poses):
-            item.setPos(pos)
+        with self._scene.bulk_edit(len(self._items)):
+            for item, pos in zip(self._items, self._prev_poses):
+                item.setPos(pos)
 
 
 class UndoObjectsDelete(QtWidgets.QUndoCommand):
     def __init__(
         self,
-        scene: QtWidgets.QGraphicsScene,
+        scene: MarkupScene,
         items: list[QtWidgets.QGraphicsItem],
     ) -> None:
         self._scene = scene
         self._items = items
         super().__init__(tr("Deletion"))
 
+    def touched(self) -> list[QtWidgets.QGraphicsItem]:
+        return self._items
+
     def redo(self) -> None:
-        for item in self._items:
-            if item.scene():
-                self._scene.removeItem(item)
+        with self._scene.bulk_edit(len(self._items)):
+            for item in self._items:
+                if item.scene():
+                    self._scene.removeItem(item)
 
     def undo(self) -> None:
-        for item in self._items:
-            self._scene.addItem(item)
+        with self._scene.bulk_edit(len(self._items)):
+            for item in self._items:
+                self._scene.addItem(item)
 
 
 from ..markup_objects import MarkupObjectMeta  # here fixing circular reference
@@ -106,6 +106,9 @@ class ImageWidget(QtWidgets.QWidget, Generic[T]):
     def _set_markup_object(self, cls: Callable[[], MarkupObjectMeta]):
         return self._view.set_markup_object(cls)
 
+    def set_image(self, path: str) -> QtCore.QSize:
+        return self._view.set_image(path)
+
     def set_pixmap(
         self, pixmap: QtGui.QPixmap
     ) -> QtWidgets.QGraphicsPixmapItem:
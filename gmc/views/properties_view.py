@@ -98,6 +98,7 @@ class PropertyItemBase(BaseItem):
                 raise ValueError(f"'name' field is required `{prop}`")
         self._display_name = kwargs.pop("display", self.name)
         self._kwargs = kwargs
+        self._default = getattr(self, "_value", None)
         parent.insert(parent.get_model(), items=[self])
 
     @property
@@ -137,6 +138,10 @@ class PropertyItemBase(BaseItem):
     def emit(self) -> tuple[str, Any]:
         return (self.name, self.value)
 
+    def reset(self) -> None:
+        """restore the value from schema"""
+        self.set_edit(self._default)
+
 
 TWidget = TypeVar("TWidget", bound=QtWidgets.QWidget)
 
@@ -297,6 +302,10 @@ class SingleItem(PropertyItemBase):
         for item in self.children:
             item.set_edit(item.name == value)
 
+    def reset(self) -> None:
+        for item in self.children:  # `None` is allowed here
+            item._value = item.name == self._default
+
     @property
     def value(self) -> str | None:
         for item in self.children:
@@ -344,6 +353,8 @@ class PropertiesModel(QtCore.QAbstractItemModel):
     def __init__(self):
         super().__init__()
         self.root = RootItem(self)
+        self.schema: list[GMCProps] | None = None
+        self._schema_rows = 0  # rows after are properties missing in schema
 
     def rowCount(self, parent: QtCore.QModelIndex) -> int:
         return self._get_item(parent).row_count()
@@ -471,10 +482,40 @@ class PropertiesModel(QtCore.QAbstractItemModel):
         del self.root.children[:]
         self.endResetModel()
 
+        self.schema = schema
         for prop in schema:
             span_row = self._create_item(prop)
             if span_row is not None:
                 yield span_row
+        self._schema_rows = len(self.root.children)
+
+    def reset_values(self) -> None:
+        """
+        Prepare for `set_properties` without rebuilding the tree,
+        when the schema stays the same
+        """
+        root = self.root
+        if len(root.children) > self._schema_rows:
+            self.beginRemoveRows(
+                QtCore.QModelIndex(),
+                self._schema_rows,
+                len(root.children) - 1,
+            )
+            del root.children[self._schema_rows :]
+            self.endRemoveRows()
+        for item in root.children:
+            if not isinstance(item, SeparatorItem):
+                item.reset()
+
+    def _emit_values_changed(self, parent: BaseItem) -> None:
+        if parent.children:
+            self.dataChanged.emit(
+                parent.children[0].index(self, 1),
+                parent.children[-1].index(self, 1),
+            )
+            for item in parent.children:
+                if item.has_children:
+                    self._emit_values_changed(item)
 
     def set_properties(self, properties: dict[str, Any]):
         current_items = {
@@ -503,6 +544,7 @@ class PropertiesModel(QtCore.QAbstractItemModel):
                     "value": value,
                 }
             )
+        self._emit_values_changed(self.root)
 
     def get_properties(self) -> dict[str, Any]:
         properties: dict[str, Any] = {}
@@ -735,7 +777,13 @@ class PropertiesView(QtWidgets.QTreeView):
     def set_schema(self, schema: list[GMCProps]):
         """
         initial schema load, with data from .gmc_properties.json
+
+        Setting the same schema object again keeps the tree and only
+        resets the values
         """
+        if schema is self._model.schema:
+            self._model.reset_values()
+            return
         span_rows = list(self._model.set_schema(schema))
         for span_row in span_rows:
             self.setFirstColumnSpanned(span_row, QtCore.QModelIndex(), True)
@@ -0,0 +1,370 @@
+"""
+Rendering of huge images. Only tiles visible at current zoom are decoded,
+using coarser pyramid levels when zoomed out.
+"""
+
+from __future__ import annotations
+from collections import OrderedDict
+from math import ceil, floor, log2
+from threading import Lock, RLock
+from typing import TYPE_CHECKING
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtWidgets import QMessageBox as MB
+
+from ..utils.image import numpy_to_qimage, read_image
+
+if TYPE_CHECKING:
+    import numpy as np
+
+TileKey = tuple[int, int, int]  # level, column, row
+
+
+class _TiffRegions:
+    """
+    Reads regions of a tiff file without decoding it whole. Uncompressed
+    images are memory mapped, compressed ones decode only tiles or strips
+    that intersect the region. Requires optional `tifffile`
+    """
+
+    def __init__(self, path: str) -> None:
+        import tifffile
+
+        self._tiff = tifffile.TiffFile(path)
+        self._errors = (OSError, RuntimeError, tifffile.TiffFileError)
+        page = self._page = self._tiff.pages.first
+        if (
+            page.dtype != "uint8"
+            or page.imagedepth != 1
+            or page.samplesperpixel not in (1, 3, 4)
+            or page.samplesperpixel > 1
+            and page.planarconfig != tifffile.PLANARCONFIG.CONTIG
+            or page.photometric
+            not in (tifffile.PHOTOMETRIC.MINISBLACK, tifffile.PHOTOMETRIC.RGB)
+        ):
+            raise ValueError(f"unsupported tiff layout of {path}")
+        self._memmap = None
+        if page.is_memmappable:
+            self._memmap = page.asarray(out="memmap")
+        else:
+            self._lock = RLock()
+            self._segment_height, self._segment_width = page.chunks[:2]
+            self._columns = page.chunked[1]
+            self.read(QtCore.QRect(0, 0, 1, 1), 1)  # checks codec
+
+    @classmethod
+    def open(cls, path: str) -> _TiffRegions | None:
+        """:returns: None when regions of `path` can't be read"""
+        if not path.lower().endswith((".tif", ".tiff")):
+            return None
+        try:
+            return cls(path)
+        except Exception:  # tifffile raises many types
+            return None
+
+    def read(self, rect: QtCore.QRect, step: int) -> np.ndarray:
+        """
+        :returns: every `step`th pixel of `rect`, whose corner is
+                  divisible by `step`
+        :raises ValueError: when the file can't be read or decoded
+        """
+        try:
+            return self._read(rect, step)
+        except self._errors as e:
+            raise ValueError(f"{self._tiff.filename}: {e}")
+
+    def _read(self, rect: QtCore.QRect, step: int) -> np.ndarray:
+        import numpy as np
+
+        x0, y0 = rect.x(), rect.y()
+        x1, y1 = x0 + rect.width(), y0 + rect.height()
+        if self._memmap is not None:
+            return np.array(self._memmap[y0:y1:step, x0:x1:step])
+        page = self._page
+        shape = (
+            len(range(y0, y1, step)),
+            len(range(x0, x1, step)),
+            page.samplesperpixel,
+        )
+        out = np.zeros(shape, np.uint8)
+        seg_h, seg_w = self._segment_height, self._segment_width
+        indices = [
+            row * self._columns + col
+            for row in range(y0 // seg_h, (y1 - 1) // seg_h + 1)
+            for col in range(x0 // seg_w, (x1 - 1) // seg_w + 1)
+        ]
+        segments = self._tiff.filehandle.read_segments(
+            [page.dataoffsets[i] for i in indices],
+            [page.databytecounts[i] for i in indices],
+            indices,
+            lock=self._lock,
+        )
+        for data, index in segments:
+            segment = page.decode(data, index, jpegtables=page.jpegtables)[0]
+            if segment is None:
+                continue  # empty segment
+            segment = segment[0]  # depth
+            sy = index // self._columns * seg_h
+            sx = index % self._columns * seg_w
+            # first pixels of the segment on the `step` grid
+            top = max(y0, sy)
+            top += -(top - y0) % step
+            left = max(x0, sx)
+            left += -(left - x0) % step
+            bottom = min(y1, sy + segment.shape[0])
+            right = min(x1, sx + segment.shape[1])
+            if top >= bottom or left >= right:
+                continue
+            part = segment[
+                top - sy : bottom - sy : step, left - sx : right - sx : step
+            ]
+            oy, ox = (top - y0) // step, (left - x0) // step
+            out[oy : oy + part.shape[0], ox : ox + part.shape[1]] = part
+        return out
+
+
+class TileSource:
+    """
+    Thread safe tile provider. Formats that support clipped reading
+    (like jpeg) and most tiffs are never decoded whole, other formats are
+    decoded once and then downscaled level by level.
+    """
+
+    TILE = 512  # tile size in pixels of its level
+
+    def __init__(self, path: str, size: QtCore.QSize) -> None:
+        self.path = path
+        self.size = size
+        self.cancelled = False
+        self.max_level = max(
+            0, ceil(log2(max(size.width(), size.height()) / self.TILE))
+        )
+        Option = QtGui.QImageIOHandler.ImageOption
+        reader = QtGui.QImageReader(path)
+        self._clip_reading = reader.supportsOption(
+            Option.ClipRect
+        ) and reader.supportsOption(Option.ScaledSize)
+        self._tiff = None if self._clip_reading else _TiffRegions.open(path)
+        self._levels: dict[int, QtGui.QImage] = {}
+        self._lock = Lock()
+
+    def tile_rect(self, key: TileKey) -> QtCore.QRect:
+        """:returns: tile rect in full resolution image coordinates"""
+        level, col, row = key
+        span = self.TILE << level
+        rect = QtCore.QRect(col * span, row * span, span, span)
+        return rect.intersected(QtCore.QRect(QtCore.QPoint(), self.size))
+
+    def read_tile(self, key: TileKey) -> QtGui.QImage:
+        level = key[0]
+        rect = self.tile_rect(key)
+        scaled = QtCore.QSize(
+            max(1, ceil(rect.width() / (1 << level))),
+            max(1, ceil(rect.height() / (1 << level))),
+        )
+        if self._clip_reading:
+            reader = QtGui.QImageReader(self.path)
+            reader.setClipRect(rect)
+            reader.setScaledSize(scaled)
+            image = reader.read()
+            if image.isNull():
+                raise ValueError(reader.errorString())
+            return image
+        if self._tiff is not None:
+            # every other pixel of twice the size, then smoothed
+            step = 1 << max(0, level - 1)
+            image, _memory = numpy_to_qimage(self._tiff.read(rect, step))
+            if level == 0:
+                return image.copy()  # detach from the array
+            return image.scaled(
+                scaled, transformMode=QtCore.Qt.SmoothTransformation
+            )
+        image = self._level_image(level)
+        return image.copy(
+            QtCore.QRect(
+                QtCore.QPoint(rect.x() >> level, rect.y() >> level), scaled
+            )
+        )
+
+    def _level_image(self, level: int) -> QtGui.QImage:
+        with self._lock:
+            image = self._levels.get(level)
+            if image is None:
+                if level == 0:
+                    image = read_image(self.path)
+                else:
+                    image = self._levels.get(level - 1)
+                    if image is None:
+                        self._lock.release()
+                        try:
+                            image = self._level_image(level - 1)
+                        finally:
+                            self._lock.acquire()
+                    image = image.scaled(
+                        max(1, image.width() // 2),
+                        max(1, image.height() // 2),
+                        transformMode=QtCore.Qt.SmoothTransformation,
+                    )
+                self._levels[level] = image
+            return image
+
+
+class _TileJob(QtCore.QRunnable):
+    def __init__(self, item: TiledImageItem, key: TileKey) -> None:
+        super().__init__()
+        self._item = item
+        self._source = item.source
+        self._key = key
+
+    def run(self) -> None:
+        if self._source.cancelled:
+            return
+        error = ""
+        try:
+            image = self._source.read_tile(self._key)
+        except (ValueError, MemoryError) as e:
+            error = str(e) or type(e).__name__
+            image = QtGui.QImage()
+        if self._source.cancelled:
+            return
+        try:
+            if error:
+                self._item.tile_failed.emit(error)
+            self._item.tile_ready.emit(self._key, image)
+        except RuntimeError:
+            pass  # item was deleted with the scene
+
+
+class TiledImageItem(QtWidgets.QGraphicsObject):
+    """
+    Replacement of `QGraphicsPixmapItem` for huge images.
+    Item coordinates are always full resolution pixels.
+    """
+
+    MAX_TILES = 192  # uploaded tiles, ~1MB each
+    no_doubleclick = True
+
+    tile_ready = QtCore.pyqtSignal(tuple, QtGui.QImage)
+    tile_failed = QtCore.pyqtSignal(str)
+
+    _pool: QtCore.QThreadPool | None = None
+
+    def __init__(self, path: str, size: QtCore.QSize) -> None:
+        super().__init__()
+        self.source = TileSource(path, size)
+        self._rect = QtCore.QRectF(0.0, 0.0, size.width(), size.height())
+        self._tiles: OrderedDict[TileKey, QtGui.QPixmap] = OrderedDict()
+        self._requested: set[TileKey] = set()
+        self._failed = False
+        self.setFlag(self.GraphicsItemFlag.ItemUsesExtendedStyleOption)
+        self.tile_ready.connect(self._on_tile_ready)
+        self.tile_failed.connect(self._on_tile_failed)
+        self.destroyed.connect(self._cancel)
+
+    @classmethod
+    def _thread_pool(cls) -> QtCore.QThreadPool:
+        if cls._pool is None:
+            cls._pool = QtCore.QThreadPool()
+        return cls._pool
+
+    def boundingRect(self) -> QtCore.QRectF:
+        return self._rect
+
+    def itemChange(
+        self, change: QtWidgets.QGraphicsItem.GraphicsItemChange, value
+    ):
+        if change == self.GraphicsItemChange.ItemSceneHasChanged:
+            if value is None:
+                self._cancel()
+        return super().itemChange(change, value)
+
+    def _cancel(self) -> None:
+        self.source.cancelled = True
+
+    def _level_for(self, lod: float) -> int:
+        if lod >= 1.0:
+            return 0
+        return min(self.source.max_level, floor(log2(1.0 / lod)))
+
+    def paint(
+        self,
+        painter: QtGui.QPainter,
+        option: QtWidgets.QStyleOptionGraphicsItem,
+        _widget: QtWidgets.QWidget | None,
+    ) -> None:
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        level = self._level_for(lod)
+        span = self.source.TILE << level
+        exposed = option.exposedRect.intersected(self._rect)
+        if exposed.isEmpty():
+            return
+        cols = range(int(exposed.left()) // span, ceil(exposed.right() / span))
+        rows = range(int(exposed.top()) // span, ceil(exposed.bottom() / span))
+        missing: list[TileKey] = []
+        for row in rows:
+            for col in cols:
+                key = (level, col, row)
+                pixmap = self._tiles.get(key)
+                if pixmap is None:
+                    missing.append(key)
+                    self._draw_coarser(painter, key)
+                else:
+                    self._tiles.move_to_end(key)
+                    painter.drawPixmap(
+                        QtCore.QRectF(self.source.tile_rect(key)),
+                        pixmap,
+                        QtCore.QRectF(pixmap.rect()),
+                    )
+        for key in missing:
+            self._request(key)
+
+    def _draw_coarser(self, painter: QtGui.QPainter, key: TileKey) -> None:
+        """Draws upscaled part of coarser tile while `key` is decoded"""
+        target = QtCore.QRectF(self.source.tile_rect(key))
+        level = key[0]
+        for coarse_level in range(level + 1, self.source.max_level + 1):
+            span = self.source.TILE << coarse_level
+            coarse_key = (
+                coarse_level,
+                int(target.left()) // span,
+                int(target.top()) // span,
+            )
+            pixmap = self._tiles.get(coarse_key)
+            if pixmap is not None:
+                origin = QtCore.QPointF(
+                    self.source.tile_rect(coarse_key).topLeft()
+                )
+                scale = 1.0 / (1 << coarse_level)
+                source = QtCore.QRectF(
+                    (target.left() - origin.x()) * scale,
+                    (target.top() - origin.y()) * scale,
+                    target.width() * scale,
+                    target.height() * scale,
+                )
+                painter.drawPixmap(target, pixmap, source)
+                return
+
+    def _request(self, key: TileKey) -> None:
+        if key in self._requested:
+            return
+        self._requested.add(key)
+        # coarse tiles first, they cover more area
+        self._thread_pool().start(_TileJob(self, key), key[0])
+
+    def _on_tile_ready(self, key: TileKey, image: QtGui.QImage) -> None:
+        self._requested.discard(key)
+        if image.isNull():
+            return
+        self._tiles[key] = QtGui.QPixmap.fromImage(image)
+        while len(self._tiles) > self.MAX_TILES:
+            self._tiles.popitem(last=False)
+        self.update(QtCore.QRectF(self.source.tile_rect(key)))
+
+    def _on_tile_failed(self, error: str) -> None:
+        if self._failed:
+            return  # other tiles fail the same way
+        self._failed = True
+        MB.warning(
+            None,
+            "Error",
+            f"Error while opening {self.source.path}:\n\n{error}",
+        )
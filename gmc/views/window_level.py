@@ -0,0 +1,81 @@
+from __future__ import annotations
+from PyQt5 import QtCore, QtWidgets
+from ..utils import tr
+from ..utils.image import WindowLevel
+
+Qt = QtCore.Qt
+
+
+class WindowLevelDialog(QtWidgets.QDialog):
+    """
+    Non modal window/level editor. Emits `changed` on every slider move,
+    so the image is re-rendered while dragging.
+    """
+
+    STEPS = 1000
+
+    changed = QtCore.pyqtSignal(float, float, float)  # lo, hi, gamma
+    auto_requested = QtCore.pyqtSignal()
+
+    def __init__(self, parent: QtWidgets.QWidget, window: WindowLevel):
+        super().__init__(parent, windowTitle=tr("Window/Level"))
+        self._minimum = self._maximum = 0.0
+        self._lo = QtWidgets.QSlider(Qt.Orientation.Horizontal)
+        self._hi = QtWidgets.QSlider(Qt.Orientation.Horizontal)
+        self._lo_label = QtWidgets.QLabel()
+        self._hi_label = QtWidgets.QLabel()
+        for slider in (self._lo, self._hi):
+            slider.setRange(0, self.STEPS)
+            slider.valueChanged.connect(self._on_changed)
+        self._gamma = QtWidgets.QDoubleSpinBox(
+            minimum=0.1, maximum=5.0, singleStep=0.1, decimals=2
+        )  # type: ignore
+        self._gamma.valueChanged.connect(self._on_changed)
+        auto = QtWidgets.QPushButton(
+            tr("Auto"), clicked=self.auto_requested.emit
+        )  # type: ignore
+
+        form = QtWidgets.QFormLayout(self)
+        for label, slider, value_label in (
+            (tr("Low"), self._lo, self._lo_label),
+            (tr("High"), self._hi, self._hi_label),
+        ):
+            row = QtWidgets.QHBoxLayout()
+            row.addWidget(slider, 1)
+            row.addWidget(value_label)
+            form.addRow(label, row)
+        form.addRow(tr("Gamma"), self._gamma)
+        form.addRow(auto)
+        self.set_window_level(window)
+
+    def _to_value(self, position: int) -> float:
+        span = self._maximum - self._minimum
+        return self._minimum + span * position / self.STEPS
+
+    def _to_position(self, value: float) -> int:
+        span = self._maximum - self._minimum
+        if span <= 0:
+            return 0
+        position = round((value - self._minimum) / span * self.STEPS)
+        return min(max(position, 0), self.STEPS)
+
+    def set_window_level(self, window: WindowLevel) -> None:
+        "shows `window` values without emitting `changed`"
+        self._minimum, self._maximum = window.minimum, window.maximum
+        widgets = (self._lo, self._hi, self._gamma)
+        for widget in widgets:
+            widget.blockSignals(True)
+        self._lo.setValue(self._to_position(window.lo))
+        self._hi.setValue(self._to_position(window.hi))
+        self._gamma.setValue(window.gamma)
+        for widget in widgets:
+            widget.blockSignals(False)
+        self._lo_label.setText(f"{window.lo:g}")
+        self._hi_label.setText(f"{window.hi:g}")
+
+    def _on_changed(self) -> None:
+        lo = self._to_value(self._lo.value())
+        hi = self._to_value(self._hi.value())
+        self._lo_label.setText(f"{lo:g}")
+        self._hi_label.setText(f"{hi:g}")
+        self.changed.emit(lo, hi, self._gamma.value())
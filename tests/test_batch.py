@@ -0,0 +1,89 @@
+from __future__ import annotations
+import io
+import json
+import os
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from tempfile import TemporaryDirectory
+
+from __init__ import qapplication
+from PyQt5 import QtGui
+
+from gmc.batch import main, validate_markup
+
+POINT = {"type": "point", "data": [1, 2], "tags": ["B"]}
+
+
+def run(*argv: str) -> tuple[int, dict]:
+    out = io.StringIO()
+    with redirect_stdout(out), redirect_stderr(io.StringIO()):
+        code = main(["--jobs", "2", *argv])
+    return code, json.loads(out.getvalue())
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.src = os.path.join(self._tmp.name, "src")
+        self.dst = os.path.join(self._tmp.name, "dst")
+        for directory in ("a", "b"):
+            os.makedirs(os.path.join(self.src, directory))
+            for name in ("1.png", "2.png"):
+                QtGui.QImage(6, 3, QtGui.QImage.Format_RGB32).save(
+                    os.path.join(self.src, directory, name)
+                )
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_paste_validate_and_unique_tag(self):
+        objects_path = os.path.join(self._tmp.name, "objects.json")
+        with open(objects_path, "w") as out:
+            json.dump([POINT, {"type": "point", "data": [3, 4]}], out)
+        code, summary = run("paste", self.src, self.dst, objects_path)
+        self.assertEqual(code, 0)
+        self.assertEqual(
+            summary,
+            {
+                "operation": "paste",
+                "files": 4,
+                "changed_files": 4,
+                "added_objects": 8,
+                "errors": [],
+            },
+        )
+        with open(os.path.join(self.dst, "b", "2.png.json")) as inp:
+            self.assertEqual(json.load(inp)["size"], [6, 3])
+        self.assertEqual(
+            run("paste", self.src, self.dst, objects_path)[1]["added_objects"],
+            0,
+        )
+
+        code, summary = run("unique-tag", self.dst)
+        self.assertEqual(summary["tag"], "A")
+
+        with open(os.path.join(self.dst, "a", "1.png.json"), "w") as out:
+            out.write('{"objects": [{"type": "point"}]}')
+        code, summary = run("validate", self.dst)
+        self.assertEqual(code, 1)
+        self.assertEqual(summary["files"], 4)
+        self.assertEqual(
+            summary["errors"],
+            [
+                {
+                    "path": os.path.join(self.dst, "a", "1.png.json"),
+                    "error": "object 0 has no data",
+                }
+            ],
+        )
+
+    def test_validate_markup(self):
+        self.assertEqual(validate_markup({"objects": [POINT]}), [])
+        self.assertEqual(
+            validate_markup({"size": [1], "objects": [{"data": 1}]}),
+            ["invalid size [1]", "object 0 has no type"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
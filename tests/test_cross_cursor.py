@@ -0,0 +1,88 @@
+from __future__ import annotations
+import unittest
+
+from __init__ import qapplication
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtTest import QTest
+
+from gmc.schemas.tagged_objects import CustomRectangle
+from gmc.views.image_view import ImageView
+
+Qt = QtCore.Qt
+
+
+class PaintRecorder(QtCore.QObject):
+    def __init__(self, widget: QtWidgets.QWidget) -> None:
+        super().__init__()
+        self.rects: list[QtCore.QRect] = []
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj: QtCore.QObject, event: QtCore.QEvent) -> bool:
+        if event.type() == QtCore.QEvent.Type.Paint:
+            self.rects.append(event.region().boundingRect())
+        return False
+
+
+class CrossCursorTest(unittest.TestCase):
+    def setUp(self):
+        self.view = ImageView()
+        self.view.setSceneRect(0, 0, 640, 480)
+        self.view.resize(400, 300)
+        self.view.show()
+        QTest.qWaitForWindowExposed(self.view)
+        self.viewport = self.view.viewport()
+
+    def tearDown(self):
+        self.view.close()
+
+    def _move(self, x: int, y: int) -> None:
+        event = QtGui.QMouseEvent(
+            QtCore.QEvent.Type.MouseMove,
+            QtCore.QPointF(x, y),
+            Qt.MouseButton.NoButton,
+            Qt.MouseButton.NoButton,
+            Qt.KeyboardModifier.NoModifier,
+        )
+        QtWidgets.QApplication.sendEvent(self.viewport, event)
+        qapplication.processEvents()
+
+    def test_mouse_move_repaints_lines(self):
+        self.view.show_cross_cursor()
+        cross_cursor = self.view._cross_cursor
+        self.assertEqual(cross_cursor.geometry(), self.viewport.geometry())
+        self._move(100, 50)
+        qapplication.processEvents()
+        recorder = PaintRecorder(self.viewport)
+        self._move(110, 55)
+        self.assertEqual(cross_cursor._pos, QtCore.QPoint(110, 55))
+        self.assertTrue(recorder.rects)
+        for rect in recorder.rects:
+            self.assertLessEqual(min(rect.width(), rect.height()), 11, rect)
+
+        self.view.hide_cross_cursor()
+        qapplication.processEvents()
+        recorder.rects.clear()
+        self._move(200, 100)
+        self.assertEqual(recorder.rects, [])
+
+    def test_label_is_in_bounding_rect(self):
+        scene = self.view.scene()
+        rect = CustomRectangle(None, QtCore.QRectF(10, 10, 20, 20))
+        scene.addItem(rect)
+        without_label = rect.boundingRect()
+        rect.add_tag("car")
+        with_label = rect.boundingRect()
+        self.assertTrue(with_label.contains(without_label))
+        self.assertGreater(with_label.right(), without_label.right())
+        scene.set_view_scale(4.0)
+        zoomed = rect.boundingRect()
+        self.assertLess(zoomed.width(), with_label.width())
+        # label scale is updated for items added back
+        scene.removeItem(rect)
+        scene.set_view_scale(1.0)
+        scene.addItem(rect)
+        self.assertEqual(rect.boundingRect(), with_label)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+from __future__ import annotations
+import unittest
+
+from __init__ import qapplication
+from PyQt5.QtGui import QPixmap
+
+from gmc.utils.image import ImageCache
+
+
+def _pixmap(width: int, height: int) -> QPixmap:
+    pixmap = QPixmap(width, height)
+    pixmap.fill()
+    return pixmap
+
+
+class ImageCacheTest(unittest.TestCase):
+    def test_hit_and_mtime_invalidation(self):
+        cache = ImageCache(budget_mb=16)
+        pixmap = _pixmap(8, 8)
+        cache.put("a.png", 1.0, pixmap)
+        self.assertIs(cache.get("a.png", 1.0), pixmap)
+        self.assertIsNone(cache.get("a.png", 2.0))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ImageCache(budget_mb=1)
+        for name in "abc":  # 512x256x4 bytes is a half of the budget
+            cache.put(name, None, _pixmap(512, 256))
+            cache.get("a", None)
+        self.assertIsNotNone(cache.get("a", None))
+        self.assertIsNone(cache.get("b", None))
+        self.assertIsNotNone(cache.get("c", None))
+        self.assertEqual(cache.evictions, 1)
+
+    def test_last_image_is_kept_over_budget(self):
+        cache = ImageCache(budget_mb=0)
+        cache.put("a", None, _pixmap(64, 64))
+        cache.put("b", None, _pixmap(64, 64))
+        self.assertIsNone(cache.get("a", None))
+        self.assertIsNotNone(cache.get("b", None))
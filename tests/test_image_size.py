@@ -0,0 +1,44 @@
+from __future__ import annotations
+import unittest
+from tempfile import TemporaryDirectory
+
+from __init__ import qapplication
+from PyQt5 import QtCore, QtGui
+
+from gmc.utils.image import image_size, image_sizes
+
+
+class ImageSizeTest(unittest.TestCase):
+    def test_sizes_are_read_from_headers(self):
+        with TemporaryDirectory() as tmp:
+            qdir = QtCore.QDir(tmp)
+            paths = []
+            for i, ext in enumerate(("png", "jpg", "bmp") * 10):
+                image = QtGui.QImage(
+                    10 + i, 20, QtGui.QImage.Format.Format_RGB32
+                )
+                image.fill(0)
+                path = qdir.filePath(f"{i}.{ext}")
+                image.save(path)
+                paths.append(path)
+            missing = qdir.filePath("missing.png")
+            sizes = image_sizes(paths + [missing])
+            self.assertEqual(image_size(paths[3]), QtCore.QSize(13, 20))
+        self.assertEqual(
+            sizes[:-1], [QtCore.QSize(10 + i, 20) for i in range(30)]
+        )
+        self.assertFalse(sizes[-1].isValid())
+
+    def test_npy_size(self):
+        try:
+            import numpy as np
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        with TemporaryDirectory() as tmp:
+            path = QtCore.QDir(tmp).filePath("frame.npy")
+            np.save(path, np.zeros((7, 5, 3), dtype=np.uint16))
+            self.assertEqual(image_size(path), QtCore.QSize(5, 7))
+
+
+if __name__ == "__main__":
+    unittest.main()
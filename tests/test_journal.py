@@ -0,0 +1,198 @@
+from __future__ import annotations
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from __init__ import qapplication
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from gmc.markup_objects.point import MarkupPoint, UndoPointMove
+from gmc.schemas import fields, horizontal_tracking
+from gmc.utils.journal import MarkupJournal, SnapshotJournal, recover
+from gmc.utils.json import dump
+from gmc.utils.save_queue import save_queue
+from gmc.views.image_view import MarkupScene
+
+MARKUP = {
+    "size": [10, 10],
+    "objects": [
+        {"type": "point", "data": [1, 1]},
+        {"type": "point", "data": [2, 2]},
+    ],
+}
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "a.png.json")
+        dump(self.path, MARKUP)
+        save_queue.drain()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_records_are_replayed(self):
+        journal = MarkupJournal(self.path)
+        journal.append({"set": {"1": {"type": "point", "data": [5, 5]}}})
+        journal.append({"set": {"2": {"type": "point", "data": [3, 3]}}})
+        journal.append({"del": ["0"], "root": {"size": [10, 10], "x": 1}})
+        # crash, journal is not closed
+        recovered = recover(self.path, MARKUP)
+        self.assertEqual(
+            recovered,
+            {
+                "size": [10, 10],
+                "x": 1,
+                "objects": [
+                    {"type": "point", "data": [5, 5]},
+                    {"type": "point", "data": [3, 3]},
+                ],
+            },
+        )
+        journal.close()
+        self.assertFalse(os.path.exists(journal.path))
+        self.assertIsNone(recover(self.path, MARKUP))
+
+    def test_full_snapshot_and_interrupted_record(self):
+        journal = MarkupJournal(self.path)
+        journal.append({"root": {"size": [1, 1]}, "objects": {}})
+        journal.append({"set": {"7": {"type": "point", "data": [0, 0]}}})
+        with open(journal.path, "a") as out:
+            out.write('{"del": ["7"')
+        self.assertEqual(
+            recover(self.path, MARKUP),
+            {"size": [1, 1], "objects": [{"type": "point", "data": [0, 0]}]},
+        )
+        journal.close()
+
+    def test_journal_is_replaced_after_writing(self):
+        journal = MarkupJournal(self.path)
+        journal.append({"del": ["0"]})
+        saved = {**MARKUP, "objects": MARKUP["objects"][1:]}
+        dump(self.path, saved, journal.saved())
+        journal.append({"del": ["0"]})  # relative to `saved`
+        save_queue.drain()
+        with open(journal.path) as inp:
+            lines = inp.read().splitlines()
+        self.assertEqual(json.loads(lines[1]), {"del": ["0"]})
+        self.assertEqual(recover(self.path, saved), {**saved, "objects": []})
+        journal.close()
+
+    def test_stale_journal_is_ignored(self):
+        journal = MarkupJournal(self.path)
+        journal.append({"del": ["0"]})
+        dump(self.path, {**MARKUP, "size": [20, 20]})
+        save_queue.drain()  # written without the journal knowing
+        self.assertIsNone(recover(self.path, MARKUP))
+        self.assertFalse(os.path.exists(journal.path))
+        journal.close()
+
+
+class FakeMarkupWindow(QtWidgets.QWidget):
+    def __init__(self) -> None:
+        super().__init__()
+        self._next_action = QtWidgets.QAction()
+
+
+class SnapshotJournalTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.image_path = os.path.join(self._tmp.name, "a.png")
+        QtGui.QImage(40, 30, QtGui.QImage.Format_RGB32).save(self.image_path)
+        self.path = self.image_path + ".json"
+        dump(self.path, MARKUP)
+        save_queue.drain()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_changes_are_recorded_as_snapshots(self):
+        scene = MarkupScene(None)
+        markup = {"size": [10, 10], "objects": []}
+        journal = SnapshotJournal(scene.markup_changed, lambda: [markup])
+        scene.mark_changed()  # not opened yet
+        self.assertFalse(journal._timer.isActive())
+        journal.open(self.path)
+        scene.mark_changed()
+        journal.flush()
+        self.assertEqual(recover(self.path, MARKUP), markup)
+        dump(self.path, markup, *journal.saved())
+        save_queue.drain()
+        self.assertFalse(os.path.exists(self.path + ".journal"))
+        journal.close()
+
+    def _crash_and_recover(self, schema_cls, add_object):
+        """:returns: markup before the crash and after recovery"""
+        dump(self.path, {"size": [40, 30], "objects": []})
+        save_queue.drain()
+        windows = [FakeMarkupWindow(), FakeMarkupWindow()]
+        schema = schema_cls(windows[0], [])
+        schema.open_markup(self.image_path, self.path)
+        add_object(schema)
+        schema._image_widget.scene().mark_changed()
+        schema._journal.flush()
+        expected = schema._get_markup()
+        # crash, another session opens the markup
+        schema = schema_cls(windows[1], [])
+        schema.open_markup(self.image_path, self.path)
+        self.assertTrue(schema.markup_has_changes())
+        recovered = schema._get_markup()
+        schema.close_markup()
+        journals = [
+            name for name in os.listdir(self._tmp.name) if ".journal" in name
+        ]
+        self.assertEqual(journals, [])
+        return expected, recovered
+
+    def test_horizontal_tracking(self):
+        def add_rect(schema) -> None:
+            schema._image_widget.scene().addItem(
+                horizontal_tracking.CustomRectangle(
+                    schema, QtCore.QRectF(1, 2, 3, 4), tags=("cab",)
+                )
+            )
+
+        expected, recovered = self._crash_and_recover(
+            horizontal_tracking.QuarrySchema, add_rect
+        )
+        self.assertEqual(len(recovered["objects"]), 1)
+        self.assertEqual(recovered, expected)
+
+    def test_fields(self):
+        def add_regions(schema) -> None:
+            polygon = QtGui.QPolygonF(
+                [QtCore.QPointF(0, 0), QtCore.QPointF(5, 0)]
+            )
+            scene = schema._image_widget.scene()
+            for base in (True, False):
+                scene.addItem(fields.CustomRegion(schema, base, polygon))
+
+        expected, recovered = self._crash_and_recover(
+            fields.FieldsSchema, add_regions
+        )
+        self.assertEqual([len(m["objects"]) for m in recovered], [1, 1])
+        as_json = json.dumps(expected, sort_keys=True)
+        self.assertEqual(json.dumps(recovered, sort_keys=True), as_json)
+
+
+class MarkupChangedTest(unittest.TestCase):
+    def test_undo_commands_report_touched_items(self):
+        scene = MarkupScene(None)
+        point = MarkupPoint()
+        scene.addItem(point)
+        changes = []
+        scene.markup_changed.connect(changes.append)
+        old, new = QtCore.QPointF(0, 0), QtCore.QPointF(1, 1)
+        scene.undo_stack.push(UndoPointMove(point, old, new))
+        scene.undo_stack.undo()
+        scene.undo_stack.push(QtWidgets.QUndoCommand("unknown"))
+        scene.mark_changed([])
+        self.assertEqual(changes, [[point], [point], None, []])
+        scene.reset_changes()
+        self.assertEqual(len(changes), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
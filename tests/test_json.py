@@ -0,0 +1,195 @@
+from __future__ import annotations
+import json
+import math
+import os
+import random
+import unittest
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from gmc.utils.json import GMCJSONEncoder
+
+
+class ReferenceEncoder(json.JSONEncoder):
+    """`GMCJSONEncoder` before the single pass rewrite"""
+
+    CONTAINER_TYPES = (list, tuple, dict)
+    """Container datatypes include primitives or other containers."""
+
+    MAX_WIDTH = 79
+    """Maximum width of a container that might be put on a single line."""
+
+    MAX_ITEMS = 10
+    """Maximum number of items in container that might be put on single line."""
+
+    def __init__(self, *args, **kwargs):
+        # using this class without indentation is pointless
+        if kwargs.get("indent") is None:
+            kwargs["indent"] = "  "
+        super().__init__(*args, **kwargs)
+        self.indentation_level = 0
+
+    def encode(self, o):
+        """Encode JSON object *o* with respect to single line lists."""
+        if isinstance(o, float):
+            if o.is_integer():
+                return f"{o}"  # don't need extra zeroes
+            return f"{o:0.6f}".rstrip("0").rstrip(
+                "."
+            )  # 1e-6 of a pixel should be all right
+        if isinstance(o, (list, tuple)):
+            return self._encode_list(o)
+        if isinstance(o, dict):
+            return self._encode_object(o)
+        return json.dumps(
+            o,
+            skipkeys=self.skipkeys,
+            ensure_ascii=self.ensure_ascii,
+            check_circular=self.check_circular,
+            allow_nan=self.allow_nan,
+            sort_keys=self.sort_keys,
+            indent=self.indent,
+            separators=(self.item_separator, self.key_separator),
+            default=self.default if hasattr(self, "default") else None,
+        )
+
+    def _encode_list(self, o):
+        if self._primitives_only(o) and len(o) <= self.MAX_ITEMS:
+            data = "[" + ", ".join(self.encode(el) for el in o) + "]"
+            if len(data) + self.indentation_level * 2 < self.MAX_WIDTH:
+                return data
+        self.indentation_level += 1
+        output = [self.indent_str + self.encode(el) for el in o]
+        self.indentation_level -= 1
+        return "[\n" + ",\n".join(output) + "\n" + self.indent_str + "]"
+
+    def _encode_object(self, o):
+        if not o:
+            return "{}"
+
+        # ensure keys are converted to strings
+        o = {str(k) if k is not None else "null": v for k, v in o.items()}
+
+        if self.sort_keys:
+            o = dict(sorted(o.items(), key=lambda x: x[0]))
+
+        self.indentation_level += 1
+        output = [
+            f"{self.indent_str}{json.dumps(k, ensure_ascii=self.ensure_ascii)}: {self.encode(v)}"
+            for k, v in o.items()
+        ]
+        self.indentation_level -= 1
+
+        return "{\n" + ",\n".join(output) + "\n" + self.indent_str + "}"
+
+    def iterencode(self, o, **kwargs):
+        """Required to also work with `json.dump`."""
+        return self.encode(o)
+
+    def _primitives_only(self, o: list | tuple | dict):
+        if isinstance(o, (list, tuple)):
+            return not any(isinstance(el, self.CONTAINER_TYPES) for el in o)
+        elif isinstance(o, dict):
+            return not any(
+                isinstance(el, self.CONTAINER_TYPES) for el in o.values()
+            )
+
+    @property
+    def indent_str(self) -> str:
+        assert isinstance(self.indent, str)
+        return self.indentation_level * self.indent
+
+
+def dumps(data, cls, **kwargs) -> str:
+    kwargs.setdefault("allow_nan", False)
+    kwargs.setdefault("sort_keys", True)
+    kwargs.setdefault("ensure_ascii", False)
+    return json.dumps(data, cls=cls, **kwargs)
+
+
+def markup(num_objects: int, num_points: int, seed: int = 0):
+    rnd = random.Random(seed)
+    objects = []
+    for i in range(num_objects):
+        points = [
+            [
+                round(rnd.uniform(0, 4000), rnd.randint(0, 8)),
+                rnd.randint(0, 3000),
+            ]
+            for _ in range(num_points)
+        ]
+        objects.append(
+            {
+                "data": points,
+                "tags": ["car", f"id_{i}"],
+                "type": "region",
+                "properties": {"ok": i % 2 == 0, "note": None, "score": 0.5},
+            }
+        )
+    return {"objects": objects, "size": [4000, 3000]}
+
+
+class GMCJSONEncoderTest(unittest.TestCase):
+    def assertSameOutput(self, data, **kwargs):
+        self.assertEqual(
+            dumps(data, GMCJSONEncoder, **kwargs),
+            dumps(data, ReferenceEncoder, **kwargs),
+        )
+
+    def test_identical_output(self):
+        self.assertSameOutput(markup(20, 30))
+        self.assertSameOutput(markup(3, 5), ensure_ascii=True)
+        self.assertSameOutput(markup(3, 5), sort_keys=False)
+
+    def test_edge_cases(self):
+        cases = [
+            [],
+            {},
+            1.0,
+            1e20,
+            -0.0000001,
+            0.1 + 0.2,
+            'строка "quoted"\n',
+            [[], {}, [[]], [{}]],
+            list(range(10)),
+            list(range(11)),
+            [123456789.123] * 9,
+            {None: 1, 1: 2, True: 3, 2.5: [4], "a": {"b": {"c": [1, 2]}}},
+            {"deep": [[[[[[[[[[[[[["x" * 30, 1.5]]]]]]]]]]]]]]},
+            (1, (2, 3), False, None),
+            [math.nan, math.inf],
+            2**70,
+        ]
+        for case in cases:
+            with self.subTest(case=case):
+                self.assertSameOutput(case)
+
+    def test_json_dump(self):
+        data = markup(2, 3)
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "markup.json")
+            with open(path, "w", encoding="utf-8") as out:
+                json.dump(data, out, cls=GMCJSONEncoder, sort_keys=True)
+            with open(path, encoding="utf-8") as inp:
+                self.assertEqual(inp.read(), dumps(data, ReferenceEncoder))
+
+    @unittest.skipUnless(
+        os.environ.get("GMC_BENCHMARK"), "set GMC_BENCHMARK=1 to run"
+    )
+    def test_benchmark(self):
+        data = markup(100, 1000)  # 100k vertices
+        timings = {}
+        for cls in (ReferenceEncoder, GMCJSONEncoder):
+            start = perf_counter()
+            dumps(data, cls)
+            timings[cls.__name__] = perf_counter() - start
+        print(
+            "\nencoding 100k vertices: "
+            + ", ".join(f"{k} {v:.3f}s" for k, v in timings.items()),
+            end=" ",
+        )
+        self.assertLess(timings["GMCJSONEncoder"], timings["ReferenceEncoder"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+from __future__ import annotations
+import unittest
+from math import cos, pi, sin
+from unittest.mock import patch
+
+from __init__ import qapplication
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from gmc.markup_objects.polygon import simplify
+from gmc.markup_objects.tags import TagText
+from gmc.schemas.tagged_objects import CustomRectangle, CustomRegion
+from gmc.views.image_view import MarkupScene
+
+QPointF = QtCore.QPointF
+
+
+class FakeImageView(QtWidgets.QWidget):
+    def __init__(self) -> None:
+        super().__init__()
+        self.delete_action = QtWidgets.QAction()
+        self.copy_action = QtWidgets.QAction()
+
+
+class FakeSchema:
+    tags_hidden = False
+
+
+def _circle(x: float, y: float, count: int = 400) -> QtGui.QPolygonF:
+    return QtGui.QPolygonF(
+        [
+            QPointF(x + 50.0 * cos(a), y + 50.0 * sin(a))
+            for a in (2.0 * pi * i / count for i in range(count))
+        ]
+    )
+
+
+class SimplifyTest(unittest.TestCase):
+    def test_close_vertices_are_removed(self):
+        polygon = QtGui.QPolygonF(
+            [QPointF(0, 0), QPointF(0.2, 0), QPointF(5, 0), QPointF(5, 0.1)]
+        )
+        self.assertEqual(
+            list(simplify(polygon, 1.0)),
+            [QPointF(0, 0), QPointF(5, 0), QPointF(5, 0.1)],
+        )
+        self.assertEqual(simplify(polygon, 0.05), polygon)
+
+    def test_dense_vertices_keep_the_shape(self):
+        polygon = QtGui.QPolygonF([QPointF(0.3 * i, 0) for i in range(101)])
+        simplified = simplify(polygon, 1.0)
+        self.assertAlmostEqual(simplified.size(), 31, delta=1)
+        self.assertEqual(simplified.first(), polygon.first())
+        self.assertEqual(simplified.last(), polygon.last())
+        xs = [point.x() for point in simplified]
+        self.assertLess(max(b - a for a, b in zip(xs, xs[1:])), 1.3)
+
+    def test_short_polygon_is_kept(self):
+        polygon = QtGui.QPolygonF([QPointF(0, 0), QPointF(0.1, 0)])
+        self.assertIs(simplify(polygon, 1.0), polygon)
+
+
+class LevelOfDetailTest(unittest.TestCase):
+    def setUp(self):
+        self.parent = FakeImageView()
+        self.scene = MarkupScene(self.parent)
+        self.schema = FakeSchema()
+
+    def _render(self, scale: float) -> QtGui.QImage:
+        image = QtGui.QImage(400, 400, QtGui.QImage.Format.Format_RGB32)
+        image.fill(0)
+        painter = QtGui.QPainter(image)
+        source = QtCore.QRectF(0.0, 0.0, 400.0 / scale, 400.0 / scale)
+        self.scene.render(painter, QtCore.QRectF(image.rect()), source)
+        painter.end()
+        return image
+
+    def test_polygon_is_simplified_when_zoomed_out(self):
+        region = CustomRegion(self.schema, _circle(100, 100))
+        self.scene.addItem(region)
+        self._render(1.0)
+        self.assertIsNone(region._simplified_level)
+        self._render(0.1)
+        self.assertEqual(region._simplified_level, -4)
+        simplified = region._simplified_polygon
+        self.assertLess(simplified.size(), region._polygon.size() // 2)
+        region.prepareGeometryChange()
+        self.assertIsNone(region._simplified_level)
+
+    def test_tiny_objects_are_points(self):
+        rect = CustomRectangle(self.schema, QtCore.QRectF(100, 100, 20, 10))
+        self.scene.addItem(rect)
+        with patch.object(QtGui.QPainter, "drawPoint") as draw_point:
+            self._render(0.4)
+            draw_point.assert_not_called()
+            self._render(0.1)
+            draw_point.assert_called_once()
+
+    def test_labels_are_hidden_when_zoomed_out(self):
+        rect = CustomRectangle(
+            self.schema, QtCore.QRectF(100, 100, 200, 100), tags=["car"]
+        )
+        self.scene.addItem(rect)
+        with patch.object(TagText, "__call__") as draw_text:
+            self._render(0.3)
+            self.assertEqual(draw_text.call_count, 1)
+            self._render(0.2)
+            self.assertEqual(draw_text.call_count, 1)
+            rect.setSelected(True)
+            self._render(0.2)
+            self.assertEqual(draw_text.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+from __future__ import annotations
+import unittest
+from tempfile import TemporaryDirectory
+
+from __init__ import qapplication
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from gmc.utils.image import image_cache
+from gmc.views.image_widget import ImageWidget
+
+
+class MarkupChangesTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.path = QtCore.QDir(self._tmp.name).filePath("a.png")
+        image = QtGui.QImage(64, 32, QtGui.QImage.Format.Format_RGB32)
+        image.fill(QtGui.QColor(10, 20, 30))
+        image.save(self.path)
+        self.widget = ImageWidget([])
+        self.widget.view().get_zoom_actions()
+        self.widget.set_image(self.path)
+        self.scene = self.widget.scene()
+
+    def tearDown(self):
+        image_cache.clear()
+        self._tmp.cleanup()
+
+    def test_undo_stack_drives_changes(self):
+        scene, stack = self.scene, self.scene.undo_stack
+        self.assertFalse(scene.has_changes())
+        stack.push(QtWidgets.QUndoCommand("edit"))
+        self.assertTrue(scene.has_changes())
+        stack.undo()
+        self.assertFalse(scene.has_changes())
+        stack.redo()
+        scene.mark_saved()
+        self.assertFalse(scene.has_changes())
+        stack.undo()
+        self.assertTrue(scene.has_changes())
+
+    def test_changes_outside_undo_stack(self):
+        scene = self.scene
+        scene.mark_changed()
+        self.assertTrue(scene.has_changes())
+        scene.mark_saved()
+        self.assertFalse(scene.has_changes())
+
+    def test_new_image_resets_changes(self):
+        scene = self.scene
+        scene.undo_stack.push(QtWidgets.QUndoCommand("edit"))
+        scene.mark_changed()
+        self.widget.set_image(self.path)
+        self.assertFalse(scene.has_changes())
+        self.assertEqual(scene.undo_stack.count(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+
+from __init__ import qapplication
+
+from gmc.utils.json import dump
+from gmc.utils.markup_index import INDEX_NAME, MarkupIndex, unique_tag
+from gmc.utils.save_queue import save_queue
+
+
+def write_markup(path: str, *objects: tuple[str, list[str]]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = {
+        "objects": [
+            {"type": t, "tags": tags, "data": []} for t, tags in objects
+        ]
+    }
+    with open(path, "w") as out:
+        json.dump(data, out)
+
+
+class MarkupIndexTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.root = self._tmp.name
+        self.a = os.path.join(self.root, "a", "1.png.json")
+        self.b = os.path.join(self.root, "a", "2.png.json")
+        self.c = os.path.join(self.root, "b", "c", "3.png.json")
+        write_markup(self.a, ("rect", ["car"]), ("rect", ["car", "red"]))
+        write_markup(self.b)
+        write_markup(self.c, ("point", ["dog"]))
+        self.index = MarkupIndex.open(self.root)
+        self.index.wait()
+
+    def tearDown(self):
+        self.index.close()
+        self._tmp.cleanup()
+
+    def test_lookups(self):
+        index = self.index
+        self.assertEqual(len(index), 3)
+        self.assertEqual(
+            index.tags_in_dir(os.path.dirname(self.a)), {"car", "red"}
+        )
+        self.assertEqual(
+            index.tag_statistics(), {"car": 1, "red": 1, "dog": 1}
+        )
+        self.assertEqual(index.type_statistics(), {"rect": 2, "point": 1})
+        self.assertEqual(index.annotated(), {"a/1.png.json", "b/c/3.png.json"})
+
+    def test_only_changed_files_are_parsed(self):
+        index = self.index
+        self.assertEqual(index.refresh(), 0)
+        write_markup(self.b, ("line", ["cat"]))
+        os.utime(self.b, (1, 1))
+        os.remove(self.a)
+        self.assertEqual(index.refresh(os.path.dirname(self.b)), 1)
+        self.assertEqual(index.tags_in_dir(os.path.dirname(self.b)), {"cat"})
+        self.assertEqual(len(index), 2)
+
+        # index is persistent
+        self.index.close()
+        self.assertTrue(os.path.exists(os.path.join(self.root, INDEX_NAME)))
+        self.index = MarkupIndex(self.root)
+        self.assertEqual(self.index.refresh(), 0)
+        self.assertEqual(self.index.type_statistics(), {"line": 1, "point": 1})
+
+    def test_dump_updates_index(self):
+        self.assertIs(MarkupIndex.covering(self.c), self.index)
+        dump(self.c, {"objects": [{"type": "rect", "tags": ["fox"]}]})
+        save_queue.drain()
+        self.assertEqual(
+            self.index.tags_in_dir(os.path.dirname(self.c)), {"fox"}
+        )
+        self.assertEqual(self.index.refresh(), 0)
+
+    def test_used_tags_of_whole_tree(self):
+        self.assertEqual(self.index.used_tags(), {"car", "red", "dog"})
+        dump(self.b, {"objects": [{"type": "rect", "tags": ["fox"]}]})
+        self.assertIn("fox", self.index.used_tags())  # not written yet
+        save_queue.drain()
+        self.assertEqual(self.index.used_tags(), {"car", "red", "dog", "fox"})
+
+    def test_hidden_files_are_not_markup(self):
+        properties = os.path.join(self.root, "a", ".gmc_properties.json")
+        write_markup(properties, ("rect", ["A"]), ("rect", ["B"]))
+        self.assertEqual(self.index.refresh(), 0)
+        self.assertEqual(len(self.index), 3)
+        self.assertEqual(self.index.used_tags(), {"car", "red", "dog"})
+        self.assertEqual(unique_tag(self.index.used_tags()), "A")
+        self.assertEqual(self.index.type_statistics(), {"rect": 2, "point": 1})
+
+    def test_many_files_are_parsed_in_batches(self):
+        for i in range(1200):
+            path = os.path.join(self.root, "d", f"{i}.png.json")
+            write_markup(path, ("point", [f"t{i}"]))
+        self.assertEqual(self.index.refresh(), 1200)
+        self.assertEqual(len(self.index), 1203)
+        self.assertEqual(len(self.index.used_tags()), 1203)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+from __future__ import annotations
+import unittest
+from tempfile import TemporaryDirectory
+
+from __init__ import qapplication
+from PyQt5 import QtCore
+
+from gmc.utils.image import (
+    WindowLevel,
+    _window_level,
+    decode_image,
+    numpy_to_qimage,
+    read_image,
+    window_level,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+@unittest.skipIf(np is None, "numpy is not installed")
+class NumpyImageTest(unittest.TestCase):
+    def test_uint8_memory_is_shared(self):
+        arr = np.zeros((4, 6, 3), dtype=np.uint8)[:, 1:5]
+        image, memory = numpy_to_qimage(arr)
+        self.assertIs(memory, arr)
+        arr[1, 2] = (10, 20, 30)
+        self.assertEqual(image.pixelColor(2, 1).getRgb(), (10, 20, 30, 255))
+
+    def test_non_contiguous_rows_are_copied(self):
+        arr = np.arange(24, dtype=np.uint8).reshape(4, 6)[:, ::2]
+        image, memory = numpy_to_qimage(arr)
+        self.assertTrue(memory.flags.c_contiguous)
+        self.assertEqual(image.pixelIndex(1, 2), arr[2, 1])
+
+    def test_window_matches_max_scaling(self):
+        for dtype in (np.uint16, np.int16, np.float32, np.int32):
+            arr = np.array([[0, 100, 1000], [250, 500, 999]], dtype=dtype)
+            expected = (arr / (1000 / 255)).astype(np.uint8)
+            image, memory = numpy_to_qimage(arr)
+            self.assertEqual(memory.dtype, np.uint8)
+            np.testing.assert_array_equal(memory, expected, str(dtype))
+
+    def test_npy_is_memory_mapped(self):
+        arr = np.random.default_rng(0).integers(0, 255, (5, 7), dtype=np.uint8)
+        with TemporaryDirectory() as tmp:
+            path = QtCore.QDir(tmp).filePath("frame.npy")
+            np.save(path, arr)
+            image, memory = decode_image(path)
+            self.assertFalse(memory.flags.writeable)  # mapped read only
+            self.assertEqual(image.pixelIndex(3, 4), arr[4, 3])
+            del image, memory
+            copy = read_image(path)
+        self.assertEqual((copy.width(), copy.height()), (7, 5))
+        self.assertEqual(copy.pixelIndex(6, 1), arr[1, 6])
+
+    def test_npy_with_unsupported_channels(self):
+        with TemporaryDirectory() as tmp:
+            path = QtCore.QDir(tmp).filePath("frame.npy")
+            for channels in (2, 5):
+                np.save(path, np.zeros((5, 7, channels), dtype=np.uint8))
+                with self.assertRaises(ValueError):
+                    decode_image(path)
+
+    def test_window_level(self):
+        arr = np.arange(1000, dtype=np.uint16).reshape(20, 50)
+        window = WindowLevel(arr)
+        self.assertEqual((window.minimum, window.maximum), (0.0, 999.0))
+        self.assertEqual(window.auto_window(), (4.0, 994.0))
+        window.set_window(100.0, 200.0)
+        image, memory = window.render()
+        self.assertEqual(image.pixelIndex(0, 0), 0)  # 0
+        self.assertEqual(image.pixelIndex(49, 1), 0)  # 99
+        self.assertEqual(image.pixelIndex(0, 4), 255)  # 200
+        self.assertEqual(memory[3, 0], 127)
+        window.set_window(100.0, 200.0, gamma=2.0)
+        _image, same_memory = window.render()
+        self.assertIs(same_memory, memory)
+        self.assertEqual(memory[3, 0], 180)
+
+    def test_float_window_level(self):
+        arr = np.linspace(-1.0, 1.0, 200, dtype=np.float32).reshape(10, 20)
+        arr[0, 0] = np.nan
+        window = WindowLevel(arr)
+        self.assertAlmostEqual(window.maximum, 1.0)
+        self.assertAlmostEqual(window.minimum, arr[0, 1])
+        window.set_window(0.0, 1.0)
+        _image, memory = window.render()
+        self.assertEqual(memory[0, 0], 0)
+        self.assertEqual(memory[2, 0], 0)
+        self.assertEqual(memory[-1, -1], 255)
+
+    def test_window_level_is_cached_per_file(self):
+        with TemporaryDirectory() as tmp:
+            path = QtCore.QDir(tmp).filePath("depth.npy")
+            np.save(path, np.ones((3, 4), dtype=np.uint16))
+            window = window_level(path)
+            self.assertIsInstance(window, WindowLevel)
+            self.assertIs(window_level(path), window)
+            uint8_path = QtCore.QDir(tmp).filePath("frame.npy")
+            np.save(uint8_path, np.ones((3, 4), dtype=np.uint8))
+            self.assertIsNone(window_level(uint8_path))
+            del window
+            _window_level.cache_clear()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from __init__ import qapplication
+from PyQt5 import QtGui
+
+from gmc.schemas.tagged_objects.paste_into_files import PasteIntoFiles
+from gmc.utils.paste import paste_into, paste_objects
+from gmc.utils.save_queue import save_queue
+from test_save_queue import BlockedSaveQueue
+
+POINT = {"type": "point", "data": [1.0, 2.0], "tags": ["a"]}
+RECT = {"type": "rect", "data": (0, 0, 5, 5)}
+
+
+class PasteObjectsTest(unittest.TestCase):
+    def test_duplicates_are_skipped(self):
+        markup = {"objects": [dict(POINT)]}
+        self.assertEqual(paste_objects(markup, [POINT, RECT, RECT]), 1)
+        self.assertEqual(markup["objects"], [POINT, RECT])
+        # tuples from items equal lists from json
+        rect = {"data": [0, 0, 5, 5], "type": "rect"}
+        self.assertEqual(paste_objects(markup, [rect]), 0)
+
+
+class PasteIntoFilesTest(unittest.TestCase):
+    def test_job(self):
+        with TemporaryDirectory() as tmp:
+            image_paths, markup_paths = [], []
+            for i in range(3):
+                image_path = os.path.join(tmp, f"{i}.png")
+                QtGui.QImage(8, 4, QtGui.QImage.Format_RGB32).save(image_path)
+                image_paths.append(image_path)
+                markup_paths.append(image_path + ".json")
+            with open(markup_paths[0], "w") as out:
+                json.dump({"size": [8, 4], "objects": [POINT]}, out)
+            with open(markup_paths[1], "w") as out:
+                out.write("{")
+            job = PasteIntoFiles(image_paths, markup_paths, [POINT, RECT])
+            progress, summaries = [], []
+            job.progress.connect(progress.append)
+            job.finished.connect(summaries.append)
+            with patch.object(save_queue, "put") as put:
+                job.start()
+                job.wait()
+            put.assert_not_called()  # written by the workers
+            qapplication.processEvents()
+
+            self.assertEqual(progress, [1, 2, 3])
+            (summary,) = summaries
+            self.assertEqual(summary.files_changed, 2)
+            self.assertEqual(summary.objects_added, 3)
+            self.assertEqual(len(summary.errors), 1)
+            self.assertFalse(summary.cancelled)
+            with open(markup_paths[2]) as inp:
+                self.assertEqual(
+                    json.load(inp),
+                    {
+                        "objects": [POINT, {**RECT, "data": [0, 0, 5, 5]}],
+                        "size": [8, 4],
+                    },
+                )
+
+    def test_queued_save_is_not_overtaken(self):
+        queue = BlockedSaveQueue()
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.png.json")
+            saved = {"size": [8, 4], "objects": [RECT]}
+            with patch("gmc.utils.json.save_queue", queue):
+                queue.put(path, json.dumps(saved))
+                self.assertEqual(paste_into("a.png", path, [POINT]), (1, None))
+                queue.unblock.set()
+                queue.drain()
+            with open(path) as inp:
+                self.assertEqual(
+                    json.load(inp),
+                    {
+                        "size": [8, 4],
+                        "objects": [{**RECT, "data": [0, 0, 5, 5]}, POINT],
+                    },
+                )
+
+    def test_cancel(self):
+        job = PasteIntoFiles(["missing.png"], ["missing.png.json"], [POINT])
+        summaries = []
+        job.finished.connect(summaries.append)
+        job.cancel()
+        job.start()
+        job.wait()
+        qapplication.processEvents()
+        self.assertTrue(summaries[0].cancelled)
+        self.assertEqual(summaries[0].errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
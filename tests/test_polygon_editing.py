@@ -0,0 +1,152 @@
+from __future__ import annotations
+import unittest
+from random import Random
+
+from __init__ import qapplication
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from gmc.markup_objects.moveable_diamond import MoveableDiamond
+from gmc.markup_objects.polygon import (
+    EditableMarkupPolygon,
+    UndoPolygonDelPoints,
+    nearest_segment,
+    polygon_array,
+    polygon_from_array,
+)
+from gmc.views.image_view import MarkupScene
+
+QPointF = QtCore.QPointF
+
+
+class FakeImageView(QtWidgets.QWidget):
+    def __init__(self) -> None:
+        super().__init__()
+        self.delete_action = QtWidgets.QAction()
+        self.copy_action = QtWidgets.QAction()
+
+
+class FakeDoubleClick:
+    def __init__(self, pos: QPointF) -> None:
+        self._pos = pos
+
+    def scenePos(self) -> QPointF:
+        return self._pos
+
+
+def _nearest_segment_loop(
+    polygon: QtGui.QPolygonF, point: QPointF
+) -> tuple[int, QPointF]:
+    """straightforward version of `nearest_segment`"""
+    best = (float("inf"), -1, QPointF())
+    prev = polygon[-1]
+    for idx, a in enumerate(polygon):
+        ab = prev - a
+        l2 = QPointF.dotProduct(ab, ab)
+        u = QPointF.dotProduct(point - a, ab) / l2 if l2 else 0.0
+        nearest = a + max(0.0, min(1.0, u)) * ab
+        d = point - nearest
+        best = min(best, (QPointF.dotProduct(d, d), idx, nearest))
+        prev = a
+    return best[1], best[2]
+
+
+class PolygonEditingTest(unittest.TestCase):
+    def test_polygon_array(self):
+        polygon = QtGui.QPolygonF([QPointF(1, 2), QPointF(3.5, -4)])
+        self.assertEqual(polygon_array(polygon).tolist(), [[1, 2], [3.5, -4]])
+        self.assertEqual(polygon_array(QtGui.QPolygonF()).shape, (0, 2))
+
+    def test_polygon_from_array(self):
+        polygon = polygon_from_array([[1, 2], [3.5, -4]])
+        self.assertEqual(list(polygon), [QPointF(1, 2), QPointF(3.5, -4)])
+        self.assertTrue(polygon_from_array([]).isEmpty())
+        broken_vertices = (
+            [1, 2],
+            [[1, 2, 3]],
+            [[1, 2], [3]],
+            [["1", "2"]],
+            [[]],
+            [[[]]],
+        )
+        for broken in broken_vertices:
+            with self.assertRaises(ValueError, msg=repr(broken)):
+                polygon_from_array(broken)
+
+    def test_data(self):
+        polygon = EditableMarkupPolygon(
+            polygon_from_array([[1, 2], [3.5, -4]])
+        )
+        polygon.setPos(10, 20)
+        self.assertEqual(polygon.data(), [(11.0, 22.0), (13.5, 16.0)])
+
+    def test_delete_points(self):
+        parent = FakeImageView()
+        scene = MarkupScene(parent)
+        coordinates = [[float(i), float(i * i)] for i in range(10)]
+        polygon = EditableMarkupPolygon(polygon_from_array(coordinates))
+        scene.addItem(polygon)
+        scene.undo_stack.push(UndoPolygonDelPoints(polygon, [7, 0, 8, 3]))
+        expected = [tuple(xy) for xy in coordinates]
+        del expected[7:9], expected[3], expected[0]
+        self.assertEqual(polygon.data(), expected)
+        scene.undo_stack.undo()
+        self.assertEqual(polygon.data(), [tuple(xy) for xy in coordinates])
+        scene.undo_stack.redo()
+        self.assertEqual(polygon.data(), expected)
+
+    def test_nearest_segment(self):
+        random = Random(0)
+        polygon = QtGui.QPolygonF(
+            [
+                QPointF(random.uniform(0, 100), random.uniform(0, 100))
+                for _ in range(30)
+            ]
+        )
+        polygon.insert(5, QPointF(polygon[5]))  # zero length segment
+        vertices = polygon_array(polygon)
+        for _ in range(100):
+            point = QPointF(random.uniform(0, 100), random.uniform(0, 100))
+            idx, nearest = nearest_segment(vertices, point)
+            ref_idx, ref_nearest = _nearest_segment_loop(polygon, point)
+            self.assertEqual(idx, ref_idx)
+            self.assertAlmostEqual(nearest.x(), ref_nearest.x())
+            self.assertAlmostEqual(nearest.y(), ref_nearest.y())
+
+    def test_double_click_inserts_vertex(self):
+        parent = FakeImageView()
+        scene = MarkupScene(parent)
+        polygon = EditableMarkupPolygon(
+            QtGui.QPolygonF(
+                [QPointF(0, 0), QPointF(100, 0), QPointF(100, 100)]
+            )
+        )
+        scene.addItem(polygon)
+        polygon.start_edit_nodes()
+        diamonds = polygon.childItems()
+        polygon.mouseDoubleClickEvent(FakeDoubleClick(QPointF(50, 2)))
+        self.assertEqual(
+            list(polygon._polygon),
+            [
+                QPointF(0, 0),
+                QPointF(50, 0),
+                QPointF(100, 0),
+                QPointF(100, 100),
+            ],
+        )
+        new_diamonds = polygon.childItems()
+        self.assertEqual(len(new_diamonds), 4)
+        self.assertEqual(new_diamonds[0], diamonds[0])
+        self.assertEqual(new_diamonds[2:], diamonds[1:])
+        for idx, diamond in enumerate(new_diamonds):
+            self.assertIsInstance(diamond, MoveableDiamond)
+            self.assertEqual(diamond.idx, idx)
+            self.assertEqual(diamond.pos(), polygon._polygon[idx])
+        self.assertEqual(scene.selectedItems(), [new_diamonds[1]])
+
+        scene.undo_stack.undo()
+        self.assertFalse(polygon.in_edit_mode())
+        self.assertEqual(polygon._polygon.size(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
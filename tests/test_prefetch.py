@@ -0,0 +1,43 @@
+from __future__ import annotations
+import json
+import unittest
+from tempfile import TemporaryDirectory
+
+from __init__ import qapplication
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtTest import QTest
+
+from gmc.file_widgets.prefetch import Prefetcher
+from gmc.utils.image import image_cache
+from gmc.utils.json import load, _prefetched
+
+
+class PrefetcherTest(unittest.TestCase):
+    def test_neighbours_follow_direction(self):
+        self.assertEqual(list(Prefetcher.neighbours(5, 10, 1)), [6, 4, 7, 8])
+        self.assertEqual(list(Prefetcher.neighbours(5, 10, -1)), [4, 6, 3, 2])
+        self.assertEqual(list(Prefetcher.neighbours(0, 2, 1)), [1])
+
+    def test_image_and_markup_are_prefetched(self):
+        with TemporaryDirectory() as tmp:
+            qdir = QtCore.QDir(tmp)
+            image_path = qdir.filePath("a.png")
+            markup_path = qdir.filePath("a.png.json")
+            image = QtGui.QImage(32, 16, QtGui.QImage.Format.Format_RGB32)
+            image.fill(0)
+            image.save(image_path)
+            markup = {"objects": [], "size": [32, 16]}
+            with open(markup_path, "w") as out:
+                json.dump(markup, out)
+
+            prefetcher = Prefetcher(None)
+            prefetcher.schedule([(image_path, markup_path)])
+            for _ in range(100):
+                if image_path in image_cache:
+                    break
+                QTest.qWait(50)
+            self.assertIn(image_path, image_cache)
+            prefetched = _prefetched[markup_path][1]
+            self.assertEqual(prefetched, markup)
+            self.assertIs(load(markup_path, None), prefetched)
+            self.assertNotIn(markup_path, _prefetched)
@@ -0,0 +1,61 @@
+from __future__ import annotations
+import unittest
+from tempfile import TemporaryDirectory
+
+from __init__ import qapplication
+from PyQt5 import QtCore, QtGui
+from PyQt5.QtTest import QTest
+
+import gmc.utils.image
+from gmc.utils.image import image_cache
+from gmc.views.image_widget import ImageWidget
+
+
+class ProgressiveImageTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.path = QtCore.QDir(self._tmp.name).filePath("big.jpg")
+        image = QtGui.QImage(800, 600, QtGui.QImage.Format.Format_RGB32)
+        image.fill(QtGui.QColor(200, 100, 50))
+        image.save(self.path)
+        self._limits = (
+            gmc.utils.image.PREVIEW_MIN_PIXELS,
+            gmc.utils.image.PREVIEW_MAX_PIXELS,
+        )
+        gmc.utils.image.PREVIEW_MIN_PIXELS = 800 * 600
+        gmc.utils.image.PREVIEW_MAX_PIXELS = 100 * 100
+
+    def tearDown(self):
+        (
+            gmc.utils.image.PREVIEW_MIN_PIXELS,
+            gmc.utils.image.PREVIEW_MAX_PIXELS,
+        ) = self._limits
+        image_cache.clear()
+        self._tmp.cleanup()
+
+    def test_preview_is_replaced_with_full_image(self):
+        widget = ImageWidget([])
+        widget.view().get_zoom_actions()
+        size = widget.set_image(self.path)
+        self.assertEqual(size, QtCore.QSize(800, 600))
+        (item,) = widget.scene().items()
+        self.assertEqual(item.pixmap().width(), 100)
+        self.assertEqual(
+            item.sceneBoundingRect(), QtCore.QRectF(0, 0, 800, 600)
+        )
+        for _ in range(100):
+            if item.pixmap().width() == 800:
+                break
+            QTest.qWait(50)
+        self.assertEqual(item.pixmap().size(), QtCore.QSize(800, 600))
+        self.assertTrue(item.transform().isIdentity())
+        self.assertIn(self.path, image_cache)
+
+        # cached image is shown without preview
+        widget.set_image(self.path)
+        (item,) = widget.scene().items()
+        self.assertEqual(item.pixmap().width(), 800)
+
+
+if __name__ == "__main__":
+    unittest.main()
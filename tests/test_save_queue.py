@@ -0,0 +1,102 @@
+from __future__ import annotations
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from threading import Barrier, Event, Thread
+from time import sleep
+from unittest.mock import patch
+
+from __init__ import qapplication
+
+from gmc.utils.json import dump, load
+from gmc.utils.save_queue import SaveQueue, save_queue
+
+
+class BlockedSaveQueue(SaveQueue):
+    def __init__(self) -> None:
+        super().__init__()
+        self.unblock = Event()
+        self.written: list[tuple[str, str]] = []
+
+    def _write(self, path: str, text: str) -> None:
+        self.unblock.wait(5.0)
+        super()._write(path, text)
+        self.written.append((path, text))
+
+
+class SaveQueueTest(unittest.TestCase):
+    def test_writes_are_ordered_and_atomic(self):
+        queue = BlockedSaveQueue()
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sub", "a.json")
+            other = os.path.join(tmp, "b.json")
+            first = os.path.join(tmp, "0.json")
+            queue.put(first, "0")  # writer waits on it
+            queue.put(path, "1")
+            queue.put(other, "2")
+            queue.put(path, "3")
+            self.assertEqual(queue.pending(path), "3")
+            queue.unblock.set()
+            queue.drain()
+            self.assertIsNone(queue.pending(path))
+            with open(path) as inp:
+                self.assertEqual(inp.read(), "3")
+            self.assertEqual(
+                sorted(os.listdir(tmp)), ["0.json", "b.json", "sub"]
+            )
+            self.assertEqual(os.listdir(os.path.dirname(path)), ["a.json"])
+        # superseded "1" was never written
+        self.assertEqual(
+            queue.written, [(first, "0"), (other, "2"), (path, "3")]
+        )
+
+    def test_single_writer_thread_is_started(self):
+        queue = SaveQueue()
+        started: list[Thread] = []
+
+        def slow_thread(**kwargs) -> Thread:
+            sleep(0.05)  # widens the window between check and start
+            thread = Thread(**kwargs)
+            started.append(thread)
+            return thread
+
+        barrier = Barrier(4)
+
+        def put(idx: int) -> None:
+            barrier.wait()
+            queue.put(path, str(idx))
+
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.json")
+            with patch("gmc.utils.save_queue.Thread", slow_thread):
+                putters = [Thread(target=put, args=(i,)) for i in range(4)]
+                for putter in putters:
+                    putter.start()
+                for putter in putters:
+                    putter.join()
+            queue.drain()
+        self.assertEqual(len(started), 1)
+
+    def test_failure_is_reported(self):
+        queue = SaveQueue()
+        failures = []
+        queue.failed.connect(lambda path, msg: failures.append(path))
+        with TemporaryDirectory() as tmp:
+            blocker = os.path.join(tmp, "file")
+            open(blocker, "w").close()
+            bad_path = os.path.join(blocker, "a.json")
+            queue.put(bad_path, "{}")
+            queue.drain()
+        self.assertEqual(failures, [bad_path])
+
+    def test_load_sees_queued_markup(self):
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "a.json")
+            dump(path, {"objects": [], "size": [1, 2]})
+            self.assertEqual(load(path, None), {"objects": [], "size": [1, 2]})
+            save_queue.drain()
+            self.assertTrue(os.path.exists(path))
+
+
+if __name__ == "__main__":
+    unittest.main()
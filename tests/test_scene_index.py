@@ -0,0 +1,132 @@
+from __future__ import annotations
+import os
+import unittest
+from random import Random
+from statistics import median
+from time import perf_counter
+
+from __init__ import qapplication
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from gmc.markup_objects.point import MarkupPoint
+from gmc.markup_objects.polygon import (
+    EditableMarkupPolygon,
+    UndoPolygonPointMove,
+)
+from gmc.views.image_view import MarkupScene
+
+QPointF = QtCore.QPointF
+Method = QtWidgets.QGraphicsScene.ItemIndexMethod
+
+
+class FakeImageView(QtWidgets.QWidget):
+    def __init__(self) -> None:
+        super().__init__()
+        self.delete_action = QtWidgets.QAction()
+        self.copy_action = QtWidgets.QAction()
+
+
+def _fill(scene: MarkupScene, count: int, seed: int = 0) -> list[MarkupPoint]:
+    random = Random(seed)
+    points = []
+    for _ in range(count):
+        point = MarkupPoint()
+        point.setPos(random.uniform(0, 10000), random.uniform(0, 10000))
+        scene.addItem(point)
+        points.append(point)
+    return points
+
+
+class SceneIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.parent = FakeImageView()
+        self.scene = MarkupScene(self.parent)
+
+    def test_index_follows_item_count(self):
+        threshold = MarkupScene.INDEX_THRESHOLD
+        points = _fill(self.scene, threshold - 1)
+        self.assertEqual(self.scene.itemIndexMethod(), Method.NoIndex)
+        points += _fill(self.scene, 1)
+        self.assertEqual(self.scene.itemIndexMethod(), Method.BspTreeIndex)
+        for point in points[: threshold // 2]:
+            self.scene.removeItem(point)
+        self.assertEqual(self.scene.itemIndexMethod(), Method.BspTreeIndex)
+        self.scene.removeItem(points[-1])
+        self.assertEqual(self.scene.itemIndexMethod(), Method.NoIndex)
+        self.scene.clear()
+        _fill(self.scene, threshold // 2 + 1)
+        self.assertEqual(self.scene.itemIndexMethod(), Method.NoIndex)
+
+    def test_bulk_edit_suspends_index(self):
+        _fill(self.scene, MarkupScene.INDEX_THRESHOLD)
+        with self.scene.bulk_edit(MarkupScene.BULK_EDIT_ITEMS - 1):
+            self.assertEqual(self.scene.itemIndexMethod(), Method.BspTreeIndex)
+        with self.scene.bulk_edit(MarkupScene.BULK_EDIT_ITEMS):
+            self.assertEqual(self.scene.itemIndexMethod(), Method.NoIndex)
+        self.assertEqual(self.scene.itemIndexMethod(), Method.BspTreeIndex)
+
+    def test_changed_polygon_is_found(self):
+        _fill(self.scene, MarkupScene.INDEX_THRESHOLD)
+        polygon = EditableMarkupPolygon(
+            QtGui.QPolygonF([QPointF(-100, -100), QPointF(-90, -100)])
+        )
+        self.scene.addItem(polygon)
+        qapplication.processEvents()
+        moved = QPointF(-50, -20)
+        self.scene.undo_stack.push(UndoPolygonPointMove(polygon, 1, moved))
+        middle = QPointF(-75, -60)
+        self.assertIs(self.scene.itemAt(middle, QtGui.QTransform()), polygon)
+        self.scene.undo_stack.undo()
+        self.assertIsNone(self.scene.itemAt(middle, QtGui.QTransform()))
+
+    def _latency(self, count: int) -> tuple[float, float, float]:
+        """:returns: median seconds of hover, click and rubber band selection"""
+        scene = MarkupScene(self.parent)
+        _fill(scene, count)
+        qapplication.processEvents()  # index is updated in the event loop
+        random = Random(1)
+        transform = QtGui.QTransform()
+
+        def hover(pos: QPointF) -> None:
+            scene.items(pos)
+
+        def click(pos: QPointF) -> None:
+            scene.itemAt(pos, transform)
+
+        def select(pos: QPointF) -> None:
+            path = QtGui.QPainterPath()
+            path.addRect(QtCore.QRectF(pos, QtCore.QSizeF(100, 100)))
+            scene.setSelectionArea(path)
+
+        medians: list[float] = []
+        for action in (hover, click, select):
+            seconds = []
+            for _ in range(50):
+                pos = QPointF(
+                    random.uniform(0, 10000), random.uniform(0, 10000)
+                )
+                start = perf_counter()
+                action(pos)
+                seconds.append(perf_counter() - start)
+            medians.append(median(seconds))
+        return medians[0], medians[1], medians[2]
+
+    @unittest.skipUnless(
+        os.environ.get("GMC_BENCHMARK"), "set GMC_BENCHMARK=1 to run"
+    )
+    def test_benchmark(self):
+        small = self._latency(100)
+        for count in (10_000, 100_000):
+            large = self._latency(count)
+            print(
+                f"\n{count} objects: hover {large[0] * 1e3:.3f}ms, "
+                f"click {large[1] * 1e3:.3f}ms, "
+                f"selection {large[2] * 1e3:.3f}ms",
+                end=" ",
+            )
+            for small_s, large_s in zip(small, large):
+                self.assertLess(large_s, small_s * 10 + 0.0005)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+from __future__ import annotations
+import unittest
+
+from __init__ import qapplication
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from gmc.markup_objects.point import MarkupPoint
+from gmc.markup_objects.polygon import (
+    EditableMarkupPolygon,
+    UndoPolygonPointMove,
+)
+from gmc.markup_objects.rect import MarkupRect, UndoRectModification
+from gmc.views.image_view import MarkupScene
+
+QPointF = QtCore.QPointF
+QRectF = QtCore.QRectF
+
+
+class FakeImageView(QtWidgets.QWidget):
+    def __init__(self) -> None:
+        super().__init__()
+        self.delete_action = QtWidgets.QAction()
+        self.copy_action = QtWidgets.QAction()
+
+
+class ShapeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.parent = FakeImageView()
+        self.scene = MarkupScene(self.parent)
+
+    def test_polygon(self):
+        polygon = EditableMarkupPolygon(
+            QtGui.QPolygonF([QPointF(0, 0), QPointF(100, 0), QPointF(0, 100)])
+        )
+        self.scene.addItem(polygon)
+        shape = polygon.shape()
+        self.assertIs(polygon.shape(), shape)
+        self.assertTrue(shape.contains(QPointF(50, 3)))
+        self.assertFalse(polygon.shape(close=False).contains(QPointF(3, 50)))
+        self.assertTrue(polygon.shape().contains(QPointF(3, 50)))
+
+        self.scene.set_view_scale(2.0)  # stroke is thinner in image pixels
+        self.assertFalse(polygon.shape().contains(QPointF(50, 3)))
+
+        self.scene.undo_stack.push(
+            UndoPolygonPointMove(polygon, 1, QPointF(100, 100))
+        )
+        self.assertTrue(polygon.shape().contains(QPointF(70, 70)))
+        self.scene.undo_stack.undo()
+        self.assertFalse(polygon.shape().contains(QPointF(70, 70)))
+
+    def test_rect(self):
+        rect = MarkupRect(QRectF(0, 0, 100, 100))
+        self.scene.addItem(rect)
+        shape = rect.shape()
+        self.assertIs(rect.shape(), shape)
+        self.assertTrue(shape.contains(QPointF(50, 3)))
+        self.scene.set_view_scale(2.0)
+        self.assertFalse(rect.shape().contains(QPointF(50, 3)))
+
+        self.scene.undo_stack.push(
+            UndoRectModification(
+                rect, QRectF(rect._rect), QRectF(0, 0, 200, 200)
+            )
+        )
+        self.assertTrue(rect.shape().contains(QPointF(200, 100)))
+        self.scene.undo_stack.undo()
+        self.assertFalse(rect.shape().contains(QPointF(200, 100)))
+
+    def test_point(self):
+        point = MarkupPoint(QPointF(10, 10))
+        self.scene.addItem(point)
+        shape = point.shape()
+        self.assertIs(point.shape(), shape)
+        self.assertTrue(shape.contains(QPointF(3, 0)))
+        self.scene.set_view_scale(2.0)
+        self.assertFalse(point.shape().contains(QPointF(3, 0)))
+
+
+if __name__ == "__main__":
+    unittest.main()
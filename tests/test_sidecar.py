@@ -0,0 +1,92 @@
+from __future__ import annotations
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from __init__ import qapplication
+from PyQt5.QtTest import QTest
+
+import gmc.utils.read_properties
+from gmc.utils.read_properties import read_properties
+from gmc.utils.sidecar import sidecars
+
+NAME = ".gmc_properties.json"
+
+
+class SidecarCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        root = self._tmp.name
+        self.images = os.path.join(root, "images", "set")
+        self.markup = os.path.join(root, "markup", "set")
+        os.makedirs(self.images)
+        os.makedirs(self.markup)
+        self._write(
+            os.path.join(root, "images", NAME), {"tags": ["a"], "x": 1}
+        )
+        self._write(os.path.join(self.images, NAME), {"x": 2})
+        self.reads: list[str] = []
+        read_json = gmc.utils.read_properties._read_json
+
+        def counting_read(path: str):
+            self.reads.append(path)
+            return read_json(path)
+
+        self._patch = patch(
+            "gmc.utils.read_properties._read_json", counting_read
+        )
+        self._patch.start()
+
+    def tearDown(self):
+        self._patch.stop()
+        sidecars.clear()
+        self._tmp.cleanup()
+
+    @staticmethod
+    def _write(path: str, data) -> None:
+        with open(path, "w") as out:
+            json.dump(data, out)
+
+    def _read(self):
+        return read_properties(
+            [
+                os.path.join(self.images, "1.png"),
+                os.path.join(self.markup, "1.png.json"),
+            ],
+            None,
+        )
+
+    def _wait_for(self, condition) -> None:
+        for _ in range(100):
+            if condition():
+                return
+            QTest.qWait(20)
+        self.fail("file system change was not noticed")
+
+    def test_next_image_does_no_io(self):
+        self.assertEqual(self._read(), {"tags": ["a"], "x": 2})
+        self.assertEqual(len(self.reads), 2)
+        properties = self._read()
+        properties["tags"].append("modified by schema")
+        self.assertEqual(self._read(), {"tags": ["a"], "x": 2})
+        self.assertEqual(len(self.reads), 2)
+
+    def test_changes_invalidate_cache(self):
+        self._read()
+        # writing markup to a watched directory keeps the cache
+        with open(os.path.join(self.markup, "1.png.json"), "w") as out:
+            out.write("{}")
+        QTest.qWait(100)
+        self._read()
+        self.assertEqual(len(self.reads), 2)
+
+        self._write(os.path.join(self.markup, NAME), {"x": 3})
+        self._wait_for(lambda: self._read()["x"] == 3)
+        self._write(os.path.join(self.images, NAME), {"y": 4})
+        self._wait_for(lambda: self._read().get("y") == 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
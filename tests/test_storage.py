@@ -0,0 +1,183 @@
+from __future__ import annotations
+import json
+import os
+import unittest
+from tempfile import TemporaryDirectory
+from threading import Event, Thread
+from unittest.mock import patch
+
+from __init__ import qapplication
+
+from gmc.utils import storage as storage_module
+from gmc.utils.json import dump, exists, load
+from gmc.utils.markup_index import MarkupIndex
+from gmc.utils.save_queue import save_queue
+from gmc.utils.storage import (
+    FileStorage,
+    JsonLinesStorage,
+    convert,
+    set_storage,
+)
+
+MARKUP = {"objects": [{"data": [1.5, 2], "tags": ["a\nb", "ж"]}]}
+
+
+class JsonLinesStorageTest(unittest.TestCase):
+    def test_latest_record_wins_and_survives_reopen(self):
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sub", "1.png.json")
+            other = os.path.join(tmp, "sub", "2.png.json")
+            storage = JsonLinesStorage()
+            self.assertFalse(storage.exists(path))
+            storage.write(path, storage.serialize({"v": 1}))
+            storage.write(other, storage.serialize(MARKUP))
+            storage.write(path, storage.serialize({"v": 2}))
+            self.assertEqual(json.loads(storage.read(path)), {"v": 2})
+            self.assertEqual(json.loads(storage.read(other)), MARKUP)
+            self.assertEqual(
+                os.listdir(os.path.dirname(path)), [storage.STORE_NAME]
+            )
+            with self.assertRaises(OSError):
+                storage.read(os.path.join(tmp, "sub", "3.png.json"))
+            storage.close()  # saves offsets index
+
+            # append after the index was saved, it's read from the tail
+            JsonLinesStorage().write(other, storage.serialize({"v": 3}))
+            reopened = JsonLinesStorage()
+            self.assertEqual(json.loads(reopened.read(path)), {"v": 2})
+            self.assertEqual(json.loads(reopened.read(other)), {"v": 3})
+            self.assertEqual(
+                sorted(p for p, _version in reopened.scan(tmp)),
+                [path, other],
+            )
+
+    def test_compaction(self):
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "1.png.json")
+            storage = JsonLinesStorage()
+            big = {"objects": ["x" * 100_000]}
+            for i in range(30):
+                storage.write(path, storage.serialize({"i": i, **big}))
+            store_path = os.path.join(tmp, storage.STORE_NAME)
+            self.assertLess(os.path.getsize(store_path), 3_000_000)
+            self.assertEqual(json.loads(storage.read(path))["i"], 29)
+            storage.compact(tmp)
+            self.assertLess(os.path.getsize(store_path), 200_000)
+            self.assertEqual(
+                json.loads(JsonLinesStorage().read(path))["i"], 29
+            )
+
+    def test_versions_survive_compaction(self):
+        with TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "1.png.json")
+            other = os.path.join(tmp, "2.png.json")
+            storage = JsonLinesStorage()
+            storage.write(other, storage.serialize({"v": 1}))
+            storage.write(path, storage.serialize({"v": 1}))
+            storage.write(other, storage.serialize({"v": 2}))
+            version = storage.version(path)  # moves to the start
+            storage.compact(tmp)
+            self.assertEqual(storage.version(path), version)
+            self.assertEqual(JsonLinesStorage().version(path), version)
+            other_version = storage.version(other)
+            storage.write(other, storage.serialize({"v": 2}))
+            self.assertNotEqual(storage.version(other), other_version)
+            storage.close()
+            self.assertEqual(
+                dict(JsonLinesStorage().scan(tmp)),
+                {path: version, other: storage.version(other)},
+            )
+
+    def test_read_is_not_moved_by_compaction(self):
+        with TemporaryDirectory() as tmp:
+            storage = JsonLinesStorage()
+            path = os.path.join(tmp, "1.png.json")
+            other = os.path.join(tmp, "2.png.json")
+            storage.write(other, storage.serialize({"v": 1}))
+            storage.write(path, storage.serialize({"v": 1}))
+            storage.write(other, storage.serialize({"v": 2}))
+            compacted = Event()
+            compactors: list[Thread] = []
+
+            def compact_then_open(*args, **kwargs):
+                # writer thread compacts right before the reader opens
+                if not compacted.is_set():
+                    compacted.set()
+                    compactor = Thread(target=storage.compact, args=(tmp,))
+                    compactor.start()
+                    compactors.append(compactor)
+                    compactor.join(0.2)  # blocked by the reader's lock
+                return open(*args, **kwargs)
+
+            with patch.object(
+                storage_module, "open", compact_then_open, create=True
+            ):
+                self.assertEqual(json.loads(storage.read(path)), {"v": 1})
+            compactors[0].join()
+            self.assertEqual(json.loads(storage.read(path)), {"v": 1})
+
+
+class ConvertTest(unittest.TestCase):
+    def test_round_trip(self):
+        with TemporaryDirectory() as root:
+            files = FileStorage()
+            paths = [
+                os.path.join(root, "a", "1.png.json"),
+                os.path.join(root, "2.png.json"),
+            ]
+            for path in paths:
+                files.write(path, files.serialize(MARKUP))
+            self.assertEqual(convert(root, files, JsonLinesStorage()), 2)
+            for path in paths:
+                os.remove(path)  # only .jsonl stores are left
+            self.assertEqual(convert(root, JsonLinesStorage(), files), 2)
+            for path in paths:
+                with open(path) as inp:
+                    self.assertEqual(json.load(inp), MARKUP)
+
+    def test_sidecars_are_left_alone(self):
+        with TemporaryDirectory() as root:
+            files = FileStorage()
+            files.write(
+                os.path.join(root, "1.png.json"), files.serialize(MARKUP)
+            )
+            properties = os.path.join(root, ".gmc_properties.json")
+            with open(properties, "w") as out:
+                json.dump({"objects": []}, out)
+            jsonl = JsonLinesStorage()
+            self.assertEqual(convert(root, files, jsonl), 1)
+            self.assertTrue(os.path.exists(properties))
+            self.assertEqual(
+                [path for path, _version in jsonl.scan(root)],
+                [os.path.join(root, "1.png.json")],
+            )
+            # store written before hidden files were skipped
+            jsonl.write(properties, jsonl.serialize({"objects": []}))
+            self.assertEqual(len(list(jsonl.scan(root))), 1)
+            jsonl.close()
+
+
+class SessionStorageTest(unittest.TestCase):
+    def tearDown(self):
+        set_storage("files")
+
+    def test_json_helpers_use_session_storage(self):
+        self.assertIsInstance(storage_module.storage(), FileStorage)
+        with TemporaryDirectory() as tmp:
+            set_storage("jsonl")
+            index = MarkupIndex(tmp)
+            path = os.path.join(tmp, "1.png.json")
+            dump(path, MARKUP)
+            self.assertTrue(exists(path))
+            save_queue.drain()
+            self.assertFalse(os.path.exists(path))
+            self.assertEqual(load(path, None), MARKUP)
+            self.assertEqual(index.refresh(), 1)
+            self.assertEqual(index.tags_in_dir(tmp), {"a\nb", "ж"})
+            self.assertEqual(index.refresh(), 0)
+            index.close()
+            storage_module.storage().close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,15 +1,22 @@
 from __future__ import annotations
 from typing import Literal
+import json
+import os
 import unittest
+from tempfile import TemporaryDirectory
+from time import perf_counter, sleep
 from unittest.mock import patch
 
 from __init__ import qapplication
-from PyQt5 import QtCore, QtWidgets
+from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtTest import QTest
 
 Qt = QtCore.Qt
 
+from gmc.schemas import tagged_objects
 from gmc.schemas.tagged_objects import CustomPoint, TaggedObjects
+from gmc.utils.markup_index import MarkupIndex
+from gmc.utils.save_queue import save_queue
 
 
 class FakeMarkupWindow(QtWidgets.QWidget):
@@ -186,3 +193,153 @@ class TaggedObjectsTest(unittest.TestCase):
     @patch("PyQt5.QtCore.QElapsedTimer")
     def test_line(self, _timer):
         self._test_two_points(("line", "line"))
+
+
+class PropertiesTest(unittest.TestCase):
+    OBJECTS = [
+        {"properties": [{"type": "int", "name": "n", "value": 1}]},
+        {
+            "tags": ["car"],
+            "properties": [{"type": "str", "name": "plate"}],
+        },
+    ]
+
+    def setUp(self):
+        self.window = FakeMarkupWindow()
+        self.schema = TaggedObjects(self.window, [])
+        self.schema._properties = {"objects": self.OBJECTS}
+        self.schema._current_root_properties = None
+        self.view = self.schema._properties_view
+
+    def _point(self, tags: list[str], **properties):
+        return CustomPoint(self.schema, tags=tags, properties=properties)
+
+    def test_same_tags_reuse_schema_and_model(self):
+        car = self._point(["car"], plate="A1", n=5)
+        other_car = self._point(["car"])
+        with patch(
+            "gmc.schemas.tagged_objects.prop_schema_for_tags",
+            wraps=tagged_objects.prop_schema_for_tags,
+        ) as resolve:
+            self.schema._update_properties([car])
+            model = self.view.model()
+            rows = [model.root.children[0], model.root.children[1]]
+            self.assertEqual(
+                self.view.get_properties(), {"n": 5, "plate": "A1"}
+            )
+            self.schema._update_properties([other_car])
+            self.assertEqual(self.view.get_properties(), {"n": 1, "plate": ""})
+            self.assertEqual(model.root.children, rows)
+            self.assertEqual(resolve.call_count, 1)
+
+    def test_multiple_items_show_common_values(self):
+        a = self._point(["car", "red"], plate="A1", n=5)
+        b = self._point(["car"], plate="B2", n=5)
+        self.schema._update_properties([a, b])
+        self.assertEqual(self.view.get_properties(), {"n": 5, "plate": ""})
+        self.assertFalse(self.view.isEnabled())
+        self.schema._update_properties([a, self._point([])])
+        self.assertEqual(self.view.get_properties(), {"n": 1})
+
+
+class UniqueTagTest(unittest.TestCase):
+    def test_tags_of_not_scanned_directories_are_used(self):
+        with TemporaryDirectory() as tmp:
+            for name, tag in (("a/1.png.json", "A"), ("b/2.png.json", "B")):
+                path = os.path.join(tmp, name)
+                os.makedirs(os.path.dirname(path))
+                with open(path, "w") as out:
+                    json.dump(
+                        {"objects": [{"type": "point", "tags": [tag]}]}, out
+                    )
+            window = FakeMarkupWindow()
+            schema = TaggedObjects(window, [])
+            schema._dst_markup_path = os.path.join(tmp, "b", "3.png.json")
+            refresh = MarkupIndex.refresh
+
+            def slow_refresh(index, *args, **kwargs) -> int:
+                sleep(0.2)  # the scan is still running on unique tag
+                return refresh(index, *args, **kwargs)
+
+            with patch.object(MarkupIndex, "refresh", slow_refresh):
+                index = MarkupIndex.open(tmp)
+                schema._on_unique_tag()
+            self.assertFalse(index.is_refreshing())
+            self.assertEqual(schema._default_tags_edit.text(), "C")
+            index.close()
+
+
+class OpenMarkupTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.image_path = os.path.join(self._tmp.name, "a.png")
+        QtGui.QImage(640, 480, QtGui.QImage.Format_RGB32).save(self.image_path)
+        self.markup_path = self.image_path + ".json"
+        self.window = FakeMarkupWindow()
+        self.schema = TaggedObjects(self.window, [])
+
+    def tearDown(self):
+        self.schema.close_markup()
+        self._tmp.cleanup()
+
+    def _open(self, count: int) -> tuple[float, float]:
+        """:returns: seconds until the image is shown and until loaded"""
+        objects = [
+            {"type": "point", "data": [i % 640, i % 480], "tags": [str(i)]}
+            for i in range(count)
+        ]
+        with open(self.markup_path, "w") as out:
+            json.dump({"size": [640, 480], "objects": objects}, out)
+        start = perf_counter()
+        self.schema.open_markup(self.image_path, self.markup_path)
+        shown = perf_counter()
+        while self.schema._loading is not None:
+            qapplication.processEvents()
+        return shown - start, perf_counter() - start
+
+    def _points(self) -> int:
+        scene = self.schema._image_widget.scene()
+        return sum(isinstance(item, CustomPoint) for item in scene.items())
+
+    def test_objects_are_added_in_slices(self):
+        self._open(5)
+        self.assertEqual(self._points(), 5)
+        with patch.object(tagged_objects, "LOAD_TIME_SLICE", 0.0):
+            self.schema.open_markup(self.image_path, self.markup_path)
+        self.assertEqual(self._points(), 1)
+        markup = self.schema._get_markup()  # waits for all objects
+        self.assertEqual(len(markup["objects"]), 5)
+        self.assertEqual(self._points(), 5)
+        self.assertIsNone(self.schema._loading)
+
+    def test_pasted_objects_are_saved_on_navigation(self):
+        self._open(1)
+        view = self.schema._image_widget.view()
+        view.select_all_action.trigger()
+        view.copy_action.trigger()
+        other_path = os.path.join(self._tmp.name, "b.png")
+        QtGui.QImage(640, 480, QtGui.QImage.Format_RGB32).save(other_path)
+        with open(other_path + ".json", "w") as out:
+            json.dump({"size": [640, 480], "objects": []}, out)
+        self.schema.save_markup(force=False)  # navigation to b.png
+        self.schema.open_markup(other_path, other_path + ".json")
+        view.paste_action.trigger()
+        self.assertTrue(self.schema.markup_has_changes())
+        self.schema.save_markup(force=False)  # navigation back to a.png
+        self.schema.open_markup(self.image_path, self.markup_path)
+        save_queue.drain()
+        with open(other_path + ".json") as inp:
+            self.assertEqual(len(json.load(inp)["objects"]), 1)
+
+    @unittest.skipUnless(
+        os.environ.get("GMC_BENCHMARK"), "set GMC_BENCHMARK=1 to run"
+    )
+    def test_benchmark(self):
+        for count in (1000, 10_000, 100_000):
+            shown, loaded = self._open(count)
+            self.assertEqual(self._points(), count)
+            print(
+                f"\nopening {count} objects: shown in {shown:.3f}s, "
+                f"loaded in {loaded:.3f}s",
+                end=" ",
+            )
@@ -0,0 +1,133 @@
+from __future__ import annotations
+import unittest
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+from __init__ import qapplication
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtTest import QTest
+
+from gmc.utils.image import read_image
+from gmc.views.tiled_image import TiledImageItem, TileSource
+
+try:
+    import numpy as np
+    import tifffile
+except ImportError:
+    tifffile = None
+
+
+def gradient_image(width: int, height: int) -> QtGui.QImage:
+    image = QtGui.QImage(width, height, QtGui.QImage.Format.Format_RGB32)
+    painter = QtGui.QPainter(image)
+    gradient = QtGui.QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0.0, QtGui.QColor(255, 0, 0))
+    gradient.setColorAt(1.0, QtGui.QColor(0, 0, 255))
+    painter.fillRect(image.rect(), gradient)
+    painter.end()
+    return image
+
+
+class TiledImageTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = TemporaryDirectory()
+        self.image = gradient_image(1300, 700)
+        self.path = QtCore.QDir(self._tmp.name).filePath("huge.png")
+        self.image.save(self.path)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_tiles_cover_image(self):
+        source = TileSource(self.path, self.image.size())
+        self.assertEqual(source.max_level, 2)
+        tile = source.read_tile((0, 2, 1))
+        self.assertEqual(tile.size(), QtCore.QSize(276, 188))
+        self.assertEqual(
+            tile.pixel(10, 10), self.image.pixel(2 * 512 + 10, 512 + 10)
+        )
+        coarse = source.read_tile((2, 0, 0))
+        self.assertEqual(coarse.size(), QtCore.QSize(325, 175))
+
+    @unittest.skipIf(tifffile is None, "tifffile is not installed")
+    def test_tiff_regions_are_read(self):
+        pixels = np.random.RandomState(0).randint(0, 256, (700, 1300, 3))
+        pixels = pixels.astype(np.uint8)
+        for name, options in (
+            ("tiled.tif", {"tile": (256, 256)}),
+            ("stripped.tif", {"rowsperstrip": 64}),
+        ):
+            path = QtCore.QDir(self._tmp.name).filePath(name)
+            tifffile.imwrite(
+                path, pixels, photometric="rgb", compression="zlib", **options
+            )
+            source = TileSource(path, self.image.size())
+            tile = source.read_tile((0, 2, 1))
+            self.assertEqual(tile.size(), QtCore.QSize(276, 188))
+            for x, y in ((0, 0), (275, 187), (100, 50)):
+                r, g, b = pixels[512 + y, 1024 + x]
+                self.assertEqual(tile.pixelColor(x, y).getRgb()[:3], (r, g, b))
+            coarse = source.read_tile((2, 0, 0))
+            self.assertEqual(coarse.size(), QtCore.QSize(325, 175))
+            self.assertEqual(source._levels, {})  # never decoded whole
+
+    def test_errors_are_reported(self):
+        path = QtCore.QDir(self._tmp.name).filePath("broken.png")
+        with open(path, "wb") as out:
+            out.write(b"not an image")
+        scene = QtWidgets.QGraphicsScene()
+        item = TiledImageItem(path, self.image.size())
+        scene.addItem(item)
+        with patch("gmc.views.tiled_image.MB.warning") as warning:
+            self._render(scene, item, QtCore.QSize(650, 350))
+            warning.assert_called_once()
+        self.assertEqual(item._tiles, {})
+
+    def test_decompression_bomb_is_value_error(self):
+        try:
+            from PIL import Image
+        except ImportError:
+            self.skipTest("pillow is not installed")
+        path = QtCore.QDir(self._tmp.name).filePath("huge.pcx")
+        Image.new("L", (64, 64)).save(path)
+        self.assertEqual(read_image(path).size(), QtCore.QSize(64, 64))
+        with patch.object(Image, "MAX_IMAGE_PIXELS", 1000):
+            with self.assertRaises(ValueError):
+                read_image(path)
+
+    def _render(
+        self,
+        scene: QtWidgets.QGraphicsScene,
+        item: TiledImageItem,
+        size: QtCore.QSize,
+    ) -> QtGui.QImage:
+        target = QtGui.QImage(size, QtGui.QImage.Format.Format_RGB32)
+
+        def render() -> None:
+            target.fill(0)
+            painter = QtGui.QPainter(target)
+            scene.render(painter, QtCore.QRectF(target.rect()))
+            painter.end()
+
+        render()
+        for _ in range(100):
+            if not item._requested:
+                break
+            QTest.qWait(50)
+        render()
+        return target
+
+    def test_visible_tiles_are_drawn(self):
+        scene = QtWidgets.QGraphicsScene()
+        item = TiledImageItem(self.path, self.image.size())
+        scene.addItem(item)
+        target = self._render(scene, item, QtCore.QSize(650, 350))
+        self.assertEqual(set(item._tiles), {(1, 0, 0), (1, 1, 0)})
+        expected = self.image.pixelColor(600, 300)
+        actual = target.pixelColor(300, 150)
+        self.assertLessEqual(abs(expected.red() - actual.red()), 8)
+        self.assertLessEqual(abs(expected.blue() - actual.blue()), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()